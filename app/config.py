@@ -14,4 +14,124 @@ class Settings:
     GOOGLE_CLIENT_SECRET = os.getenv("GOOGLE_CLIENT_SECRET")
     DSN = f"dbname={DB_NAME} user={DB_USER} password={DB_PASSWORD} host={DB_HOST} port={DB_PORT}"
 
+    # Connection pool
+    DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "2"))
+    DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+    DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))  # seconds to wait for a free connection
+    DB_POOL_MAX_WAITING = int(os.getenv("DB_POOL_MAX_WAITING", "0"))  # 0 = unbounded queue
+    DB_POOL_MAX_IDLE = float(os.getenv("DB_POOL_MAX_IDLE", "600"))
+    DB_POOL_MAX_LIFETIME = float(os.getenv("DB_POOL_MAX_LIFETIME", "3600"))
+    DB_POOL_CHECK = os.getenv("DB_POOL_CHECK", "true").lower() == "true"  # ping connections on checkout
+
+    # Image processing pool
+    IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", str(min(os.cpu_count() or 1, 4))))
+    IMAGE_QUEUE_SIZE = int(os.getenv("IMAGE_QUEUE_SIZE", "16"))  # images queued or in flight per API process
+    IMAGE_QUEUE_TIMEOUT = float(os.getenv("IMAGE_QUEUE_TIMEOUT", "10"))  # seconds to wait for a slot before 503
+
+    # Media store
+    MEDIA_BACKEND = os.getenv("MEDIA_BACKEND", "local")
+    MEDIA_ROOT = os.getenv("MEDIA_ROOT", "uploads/media")
+    MEDIA_CACHE_MAX_AGE = int(os.getenv("MEDIA_CACHE_MAX_AGE", "31536000"))  # keys are immutable
+
+    # Streaming listings
+    STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", "200"))  # rows fetched per server-side cursor round trip
+
+    # Likes
+    LIKES_FLUSH_INTERVAL = float(os.getenv("LIKES_FLUSH_INTERVAL", "1"))  # seconds between batched counter writes
+
+    # Follow graph cache
+    FOLLOW_CACHE_SIZE = int(os.getenv("FOLLOW_CACHE_SIZE", "10000"))  # users per direction
+    FOLLOW_CACHE_TTL = float(os.getenv("FOLLOW_CACHE_TTL", "60"))
+
+    # Following feed
+    FEED_FANOUT_MAX_FOLLOWERS = int(os.getenv("FEED_FANOUT_MAX_FOLLOWERS", "10000"))  # above this, fan out on read
+    FEED_BACKFILL_POSTS = int(os.getenv("FEED_BACKFILL_POSTS", "50"))  # recent posts copied into a timeline on follow
+    FEED_CELEBRITY_TTL = float(os.getenv("FEED_CELEBRITY_TTL", "300"))
+
+    # OTP store
+    OTP_BACKEND = os.getenv("OTP_BACKEND", "postgres")  # "postgres" (shared by all workers) or "memory"
+    OTP_TTL = int(os.getenv("OTP_TTL", "300"))  # seconds an OTP stays valid
+    OTP_MAX_ATTEMPTS = int(os.getenv("OTP_MAX_ATTEMPTS", "5"))
+    OTP_RESEND_INTERVAL = int(os.getenv("OTP_RESEND_INTERVAL", "60"))  # min seconds between OTPs per email
+    OTP_EVICT_INTERVAL = float(os.getenv("OTP_EVICT_INTERVAL", "60"))
+    OTP_MAX_ENTRIES = int(os.getenv("OTP_MAX_ENTRIES", "100000"))  # memory backend only
+
+    # Password hashing
+    BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))  # hashes with another cost are rehashed on login
+    PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", str(os.cpu_count() or 1)))
+    PASSWORD_QUEUE_SIZE = int(os.getenv("PASSWORD_QUEUE_SIZE", "64"))  # hash/verify calls queued or running
+    PASSWORD_QUEUE_TIMEOUT = float(os.getenv("PASSWORD_QUEUE_TIMEOUT", "5"))  # seconds to wait before 503
+
+    # Authentication
+    AUTH_TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "10000"))  # verified tokens
+    AUTH_USER_CACHE_SIZE = int(os.getenv("AUTH_USER_CACHE_SIZE", "10000"))
+    AUTH_USER_CACHE_TTL = float(os.getenv("AUTH_USER_CACHE_TTL", "30"))  # seconds a user row may be stale
+
+    # Outgoing email
+    EMAIL_WORKERS = int(os.getenv("EMAIL_WORKERS", "2"))  # each keeps one SMTP connection open
+    EMAIL_QUEUE_SIZE = int(os.getenv("EMAIL_QUEUE_SIZE", "1000"))
+    EMAIL_BATCH_SIZE = int(os.getenv("EMAIL_BATCH_SIZE", "20"))  # messages sent per connection checkout
+    EMAIL_MAX_RETRIES = int(os.getenv("EMAIL_MAX_RETRIES", "5"))
+    EMAIL_RETRY_BACKOFF = float(os.getenv("EMAIL_RETRY_BACKOFF", "1"))  # seconds, doubled per attempt
+    EMAIL_IDLE_TIMEOUT = float(os.getenv("EMAIL_IDLE_TIMEOUT", "30"))  # close idle SMTP connections
+    EMAIL_DRAIN_TIMEOUT = float(os.getenv("EMAIL_DRAIN_TIMEOUT", "10"))  # on shutdown
+
+    # PDF documents
+    PDF_MAX_SIZE = int(os.getenv("PDF_MAX_SIZE", str(10 * 1024 * 1024)))  # bytes per upload
+    PDF_WORKERS = int(os.getenv("PDF_WORKERS", "1"))  # parser processes
+    PDF_QUEUE_SIZE = int(os.getenv("PDF_QUEUE_SIZE", "100"))  # documents waiting to be parsed
+    PDF_MAX_TEXT_CHARS = int(os.getenv("PDF_MAX_TEXT_CHARS", "1000000"))  # extracted text kept per document
+    PDF_SWEEP_INTERVAL = float(os.getenv("PDF_SWEEP_INTERVAL", "60"))  # seconds between scans for unparsed documents
+    PDF_PARSE_TIMEOUT = int(os.getenv("PDF_PARSE_TIMEOUT", "600"))  # seconds before a stuck parse is retried
+
+    # Geolocation
+    GEOCODER_BACKEND = os.getenv("GEOCODER_BACKEND", "none")  # "none" or "nominatim"
+    GEOCODER_URL = os.getenv("GEOCODER_URL", "https://nominatim.openstreetmap.org/search")
+    GEOCODER_USER_AGENT = os.getenv("GEOCODER_USER_AGENT", "travelpoint-server")
+    GEOCODER_TIMEOUT = float(os.getenv("GEOCODER_TIMEOUT", "5"))
+    GEOCODER_MIN_INTERVAL = float(os.getenv("GEOCODER_MIN_INTERVAL", "1"))  # seconds between requests (Nominatim policy)
+    GEOCODE_CACHE_SIZE = int(os.getenv("GEOCODE_CACHE_SIZE", "10000"))
+    NEARBY_MAX_RADIUS_KM = float(os.getenv("NEARBY_MAX_RADIUS_KM", "200"))
+
+    # Response cache
+    RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1024"))  # responses per process
+    RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "30"))  # bounds staleness across workers
+    RESPONSE_CACHE_MAX_BODY = int(os.getenv("RESPONSE_CACHE_MAX_BODY", str(2 * 1024 * 1024)))  # larger bodies are not cached
+
+    # Booking availability
+    AVAILABILITY_MAX_DAYS = int(os.getenv("AVAILABILITY_MAX_DAYS", "366"))  # longest /availability window
+    BOOKING_BULK_MAX = int(os.getenv("BOOKING_BULK_MAX", "50"))  # bookings per /book/bulk request
+
+    # Slow query log
+    SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))  # statements slower than this are logged
+    SLOW_QUERY_BUFFER_SIZE = int(os.getenv("SLOW_QUERY_BUFFER_SIZE", "100"))  # kept for /admin/slow-queries
+    SLOW_QUERY_EXPLAIN_RATE = float(os.getenv("SLOW_QUERY_EXPLAIN_RATE", "0"))  # fraction of slow SELECTs re-run under EXPLAIN ANALYZE
+    SLOW_QUERY_EXPLAIN_INTERVAL = float(os.getenv("SLOW_QUERY_EXPLAIN_INTERVAL", "10"))  # seconds between captured plans
+
+    # Admin endpoints
+    ADMIN_EMAILS = {email.strip().lower() for email in os.getenv("ADMIN_EMAILS", "").split(",") if email.strip()}
+
+    # Logging
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+    LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))  # records waiting to be written; more are dropped
+    LOG_SAMPLE_RATES = os.getenv("LOG_SAMPLE_RATES", "DEBUG=0.01")  # fraction of records kept per level
+
+    # Startup and shutdown
+    STARTUP_DB_TIMEOUT = float(os.getenv("STARTUP_DB_TIMEOUT", "10"))  # per attempt to reach the DB during warm-up
+    STARTUP_WARMUP_PATHS = [
+        path.strip()
+        for path in os.getenv("STARTUP_WARMUP_PATHS", "/vehicles/all,/equipment/all,/guides_all,/authorities/all,/get_all_posts").split(",")
+        if path.strip()
+    ]  # requested once before reporting ready, to prime caches
+    READINESS_DB_TIMEOUT = float(os.getenv("READINESS_DB_TIMEOUT", "2"))
+    SHUTDOWN_DRAIN_DELAY = float(os.getenv("SHUTDOWN_DRAIN_DELAY", "5"))  # seconds /readyz fails after SIGTERM before the server stops
+    SHUTDOWN_DRAIN_TIMEOUT = float(os.getenv("SHUTDOWN_DRAIN_TIMEOUT", "20"))  # longest wait for requests in flight
+
+    # Response compression (brotli and zstd only if their packages are installed)
+    COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))  # smaller bodies are sent as they are
+    COMPRESSION_THREAD_SIZE = int(os.getenv("COMPRESSION_THREAD_SIZE", "65536"))  # larger chunks are compressed off the event loop
+    COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+    COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+    COMPRESSION_ZSTD_LEVEL = int(os.getenv("COMPRESSION_ZSTD_LEVEL", "3"))
+
 settings = Settings()
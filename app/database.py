@@ -1,15 +1,35 @@
-import psycopg
 from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool
 import logging
 from app.config import settings
+from app.utils.query_log import TimedCursor
 
-DSN = f"dbname={settings.DB_NAME} user={settings.DB_USER} password={settings.DB_PASSWORD} host={settings.DB_HOST} port={settings.DB_PORT}"
+DSN = settings.DSN
 
-# Establishing connection
-try:
-    conn = psycopg.connect(DSN, row_factory=dict_row)
-    cur = conn.cursor()
-except Exception as e:
-    logging.error(f"Error connecting to DB:\n{e}")
-    conn, cur = None, None
+# Connection pool shared by all requests. It is created closed and opened
+# from the application lifespan, so importing this module never touches the DB.
+pool = AsyncConnectionPool(
+    DSN,
+    min_size=settings.DB_POOL_MIN_SIZE,
+    max_size=settings.DB_POOL_MAX_SIZE,
+    timeout=settings.DB_POOL_TIMEOUT,
+    max_waiting=settings.DB_POOL_MAX_WAITING,
+    max_idle=settings.DB_POOL_MAX_IDLE,
+    max_lifetime=settings.DB_POOL_MAX_LIFETIME,
+    check=AsyncConnectionPool.check_connection if settings.DB_POOL_CHECK else None,
+    kwargs={"row_factory": dict_row, "cursor_factory": TimedCursor},
+    name="travelpoint",
+    open=False,
+)
 
+
+async def open_pool() -> None:
+    try:
+        # Don't block startup on the DB; the pool keeps retrying in the background.
+        await pool.open(wait=False)
+    except Exception as e:
+        logging.error(f"Error opening DB pool:\n{e}")
+
+
+async def close_pool() -> None:
+    await pool.close()
@@ -0,0 +1,22 @@
+from typing import AsyncIterator
+from fastapi import Depends
+from psycopg import AsyncConnection, AsyncCursor
+from app.database import pool
+
+
+async def get_conn() -> AsyncIterator[AsyncConnection]:
+    """
+    Check a connection out of the pool for the duration of the request.
+    The transaction is committed on success and rolled back on error.
+    """
+    async with pool.connection() as conn:
+        yield conn
+
+
+async def get_cursor(conn: AsyncConnection = Depends(get_conn)) -> AsyncIterator[AsyncCursor]:
+    """
+    Cursor on the request's connection. Depending on both `get_conn` and
+    `get_cursor` in one handler gives the same connection.
+    """
+    async with conn.cursor() as cur:
+        yield cur
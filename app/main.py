@@ -1,11 +1,67 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from app.routers import auth, posts, profile, guides, equipments, authorities, vehicles, home, follow
+from app.routers import auth, posts, profile, guides, equipments, authorities, vehicles, home, follow, booking, media, feed, nearby, metrics, admin, health
 from starlette.middleware.sessions import SessionMiddleware
-from app.database import conn, cur
+from app.database import pool, open_pool, close_pool
+from app.utils.image_processing import shutdown_image_pool, warm_image_pool
+from app.utils.likes import like_counter
+from app.utils.otp_store import otp_evictor
+from app.utils.security import password_service
+from app.utils.email import email_queue
+from app.utils.pdf_processing import pdf_indexer
+from app.utils.geo import geo_locator
+from app.utils.metrics import MetricsMiddleware, registry
+from app.utils.query_log import slow_query_log
+from app.utils.log import RequestIdMiddleware, log_pipeline
+from app.utils.response_cache import response_cache
+from app.utils.lifecycle import lifecycle
+from app.utils.compression import CompressionMiddleware
+from app.config import settings
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    log_pipeline.start()
+    await open_pool()
+    like_counter.start()
+    otp_evictor.start()
+    email_queue.start()
+    pdf_indexer.start()
+    # Serve /healthz at once; /readyz turns ready after this finishes
+    lifecycle.start(app, [password_service.warm_up, pdf_indexer.warm_up, warm_image_pool])
+    yield
+    await lifecycle.drain()
+    await slow_query_log.stop()
+    await geo_locator.stop()
+    await pdf_indexer.stop()
+    await email_queue.stop(settings.EMAIL_DRAIN_TIMEOUT)
+    await otp_evictor.stop()
+    await like_counter.stop()
+    shutdown_image_pool()
+    password_service.shutdown()
+    await close_pool()
+    log_pipeline.stop()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(SessionMiddleware, secret_key="YOUR_SECRET_KEY")
+# Inside the metrics middleware, so response sizes are the compressed ones
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.COMPRESSION_MIN_SIZE,
+    thread_size=settings.COMPRESSION_THREAD_SIZE,
+)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(RequestIdMiddleware)
+
+# Pool and queue gauges, read when /metrics is scraped
+registry.collect("db", "Database connection pool", pool.get_stats)
+registry.collect("password_pool", "Password hashing pool", password_service.stats)
+registry.collect("email_queue", "Outgoing email queue", email_queue.stats)
+registry.collect("pdf_indexer", "PDF parsing queue", pdf_indexer.stats)
+registry.collect("response_cache", "Response cache", response_cache.stats)
+registry.collect("log", "Log queue", log_pipeline.stats)
 
 @app.get("/")
 async def root():
@@ -14,6 +70,7 @@ async def root():
 # Include Routers
 app.include_router(auth.router)
 app.include_router(home.router)
+app.include_router(feed.router)
 app.include_router(posts.router)
 app.include_router(profile.router)
 app.include_router(guides.router)
@@ -21,6 +78,12 @@ app.include_router(equipments.router)
 app.include_router(authorities.router)
 app.include_router(vehicles.router)
 app.include_router(follow.router)
+app.include_router(booking.router)
+app.include_router(media.router)
+app.include_router(nearby.router)
+app.include_router(metrics.router)
+app.include_router(admin.router)
+app.include_router(health.router)
 
 
 
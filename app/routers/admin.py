@@ -0,0 +1,17 @@
+from fastapi import APIRouter, Depends
+from typing import List
+from app.schemas.admin import SlowQuery
+from app.schemas.user import CurrentUser
+from app.utils.oauth2 import get_admin_user
+from app.utils.query_log import slow_query_log
+
+router = APIRouter()
+
+
+@router.get("/admin/slow-queries", response_model=List[SlowQuery])
+async def get_slow_queries(admin: CurrentUser = Depends(get_admin_user)):
+    """
+    Recent statements slower than SLOW_QUERY_MS in this process, newest
+    first, with an EXPLAIN (ANALYZE, BUFFERS) plan where one was captured.
+    """
+    return list(reversed(slow_query_log.entries()))
@@ -1,55 +1,95 @@
+import logging
 from fastapi import APIRouter, HTTPException, status, Depends, Body, Response, Request
-from app.utils.security import hash_password, verify_password
+from app.utils.security import password_service
 from app.schemas.auth import UserLogin, UserRegistration, OTPVerification
+from app.schemas.user import CurrentUser
 from app.schemas.error import SimpleErrorMessage
-from app.database import cur, conn
+from psycopg import AsyncConnection, AsyncCursor
+from app.dependencies.database import get_conn, get_cursor
 from datetime import timedelta
 from app.utils import token
 from fastapi.responses import JSONResponse
 from app.utils.oauth2 import get_current_user
 import app.utils.oauth as oauth
-from app.utils.email import generate_otp, send_otp_email, save_otp, validate_otp
+from app.utils.email import generate_otp, send_otp_email, EmailQueueFull
+from app.utils.otp_store import otp_store, OTPStatus, OTPThrottled
 
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 endpoint_errors = {
     500: {"model": SimpleErrorMessage, "description": "Database Error"},
 }
 
-user_data_storage = {}
+
+def _otp_throttled(retry_after: int) -> JSONResponse:
+    return JSONResponse(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        content={"message": "An OTP was sent recently. Please wait before requesting another."},
+        headers={"Retry-After": str(retry_after)},
+    )
 
 @router.post("/register", status_code=status.HTTP_201_CREATED, responses=endpoint_errors)
 async def register_user(payload: UserRegistration = Body(...)):
     
     otp = generate_otp()
 
-    save_otp(payload.email, otp)
-    
-    user_data_storage[payload.email] = payload
+    # Refuse throttled resends before spending a bcrypt hash on them
+    retry_after = await otp_store.retry_after(payload.email)
+    if retry_after:
+        return _otp_throttled(retry_after)
 
-    await send_otp_email(payload.email, otp)
+    # Keep the registration until the OTP is verified; never store the plain password
+    pending = payload.dict()
+    pending["password"] = await password_service.hash(payload.password)
+
+    try:
+        await otp_store.issue(payload.email, otp, pending)
+    except OTPThrottled as e:
+        return _otp_throttled(e.retry_after)
+
+    # Sent in the background. If it can't be delivered, drop the OTP so the
+    # user can retry right away instead of waiting out the throttle.
+    try:
+        await send_otp_email(payload.email, otp, on_failure=lambda: otp_store.discard(payload.email))
+    except EmailQueueFull:
+        await otp_store.discard(payload.email)
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"message": "Server is busy, please retry"},
+            headers={"Retry-After": "5"},
+        )
 
     return JSONResponse(content={"message": "OTP sent to your email. Please verify it."})
 
 @router.post("/verify-otp", status_code=status.HTTP_201_CREATED, responses=endpoint_errors)
-async def verify_otp(data: OTPVerification):
+async def verify_otp(
+    data: OTPVerification,
+    conn: AsyncConnection = Depends(get_conn),
+    cur: AsyncCursor = Depends(get_cursor),
+):
     email = data.email
     otp = data.otp
     
-    payload = user_data_storage.get(email)
+    # Consumed in this request's transaction: only used up once the user is inserted
+    otp_status, payload = await otp_store.verify(email, otp, conn)
     
-    print(f"Payload: {payload}")
-    
-    if payload is None:
+    if otp_status is OTPStatus.MISSING:
         return JSONResponse(
             status_code=status.HTTP_400_BAD_REQUEST,
             content={"message": "No user registration found for this email."},
         )
+    if otp_status is OTPStatus.TOO_MANY_ATTEMPTS:
+        return JSONResponse(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            content={"message": "Too many invalid attempts. Please register again."},
+        )
         
-    if validate_otp(email, otp):
-        # Hash password before saving
-        hashed_password = hash_password(payload.password)
+    if otp_status is OTPStatus.OK:
+        # Password was hashed when the registration was stored
+        hashed_password = payload["password"]
 
         # Insert user data into the database
         query = """
@@ -57,23 +97,23 @@ async def verify_otp(data: OTPVerification):
         VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
         """
         try:
-            cur.execute(
+            await cur.execute(
                 query,
                 (
-                    payload.first_name,
-                    payload.last_name,
-                    payload.first_name.lower() + payload.last_name.lower(),
-                    payload.phone_number,
-                    payload.location,
+                    payload["first_name"],
+                    payload["last_name"],
+                    payload["first_name"].lower() + payload["last_name"].lower(),
+                    payload["phone_number"],
+                    payload["location"],
                     hashed_password,
-                    payload.nic_passport,
-                    payload.email,
+                    payload["nic_passport"],
+                    payload["email"],
                 ),
             )
-            conn.commit()
+            await conn.commit()
 
-            cur.execute(b"SELECT * FROM users WHERE email = %s", (email,))
-            result = cur.fetchone()
+            await cur.execute(b"SELECT * FROM users WHERE email = %s", (email,))
+            result = await cur.fetchone()
             if result:
                 access_token_expires = timedelta(minutes=token.ACCESS_TOKEN_EXPIRE_MINUTES)
                 access_token = token.create_access_token(data={"sub": email})
@@ -92,7 +132,8 @@ async def verify_otp(data: OTPVerification):
                     status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                     content={"message": "Error retrieving user ID after registration."},
                 )
-        except Exception as e:
+        except Exception:
+            logger.exception("Error registering user")
             return JSONResponse(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 content={"message": "Error while registering the user."},
@@ -113,17 +154,24 @@ endpoint_status_codes = {
 
 @router.post("/login", responses=endpoint_status_codes)  # type: ignore
 async def login_user(
-    payload: UserLogin = Body(...), response: Response = Response()
+    payload: UserLogin = Body(...), response: Response = Response(),
+    conn: AsyncConnection = Depends(get_conn),
+    cur: AsyncCursor = Depends(get_cursor),
 ):
     email = payload.email
     password = payload.password
 
     query = b"SELECT * FROM users WHERE email = %s"
     try:
-        cur.execute(query, (email,))
-        result = cur.fetchone()
+        await cur.execute(query, (email,))
+        result = await cur.fetchone()
         if result:
-            if verify_password(password, result["password"]):  # type: ignore
+            valid, new_hash = await password_service.verify(password, result["password"])  # type: ignore
+            if valid:
+                if new_hash:
+                    # Stored hash used outdated bcrypt parameters; upgrade it
+                    await cur.execute(b"UPDATE users SET password = %s WHERE id = %s", (new_hash, result["id"]))
+                    await conn.commit()
                 access_token_expires = timedelta(
                     minutes=token.ACCESS_TOKEN_EXPIRE_MINUTES
                 )
@@ -147,8 +195,8 @@ async def login_user(
                 status_code=status.HTTP_404_NOT_FOUND,
                 content={"message": endpoint_status_codes[404]["description"]},
             )
-    except Exception as e:
-        print(f"ERROR - DB:\n{e}")
+    except Exception:
+        logger.exception("Database error")
         return JSONResponse(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             content={"message": endpoint_errors[500]["description"]},
@@ -182,11 +230,11 @@ async def auth_callback(request: Request):
             status_code=status.HTTP_200_OK,
             content={"access_token": access_token, "token_type": "bearer", "email": email},
         )
-    except Exception as e:
-        print(f"Error during Google authentication: {e}")
+    except Exception:
+        logger.exception("Google authentication failed")
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Authentication failed")
 
 # Protected endpoint that requires authentication
 @router.get("/secure-endpoint")
-async def secure_endpoint(current_user: UserLogin = Depends(get_current_user)):
+async def secure_endpoint(current_user: CurrentUser = Depends(get_current_user)):
     return {"message": f"Welcome {current_user.email}!"}
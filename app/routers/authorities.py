@@ -1,8 +1,16 @@
-from fastapi import APIRouter, UploadFile, Form, HTTPException, status, File
+import logging
+from fastapi import APIRouter, UploadFile, Form, HTTPException, status, File, Depends, Header
 from fastapi.responses import JSONResponse
 from typing import List, Optional
-from app.database import cur, conn
+from psycopg import AsyncConnection, AsyncCursor
+from app.dependencies.database import get_conn, get_cursor
 from app.schemas.services import AuthorityResponse, CreateAuthorityRequest
+from app.utils.pdf_processing import process_pdf
+from app.utils.streaming import stream_json_array
+from app.utils.geo import geo_locator, set_coordinates
+from app.utils.response_cache import response_cache
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -12,30 +20,50 @@ endpoint_errors = {
 }
 
 
+def row_to_authority(authority: dict) -> AuthorityResponse:
+    return AuthorityResponse(
+        id=authority["id"],
+        user_id=authority["user_id"],
+        name=authority["name"],
+        location=authority["location"],
+        description=authority["description"],
+        document_path=authority["document_path"],
+        photo_path=authority.get("photo_path"),
+        created_at=int(authority["created_at"].timestamp()),
+    )
+
+
 @router.post("/authority/create", response_model=AuthorityResponse, responses=endpoint_errors)
 async def create_authority(
     user_id: int = Form(...),
     name: str = Form(...),
     location: str = Form(...),
     description: Optional[str] = Form(None),
+    latitude: Optional[float] = Form(None, ge=-90, le=90),
+    longitude: Optional[float] = Form(None, ge=-180, le=180),
     document: Optional[UploadFile] = None,
+    conn: AsyncConnection = Depends(get_conn),
+    cur: AsyncCursor = Depends(get_cursor),
 ):
     try:
-        # Save uploaded files (if any)
+        # Store uploaded document (if any) in the media store
         document_path = None
         if document:
-            document_path = f"uploads/{document.filename}"
-            with open(document_path, "wb") as buffer:
-                buffer.write(await document.read())
+            document_path = await process_pdf(document)
 
         # Insert into the database
         query = """
         INSERT INTO authority (user_id, name, location, description, document_path)
         VALUES (%s, %s, %s, %s, %s) RETURNING id, created_at
         """
-        cur.execute(query, (name, location, description, document_path))
-        authority = cur.fetchone()
-        conn.commit()
+        await cur.execute(query, (user_id, name, location, description, document_path))
+        authority = await cur.fetchone()
+        if latitude is not None and longitude is not None:
+            await set_coordinates(cur, "authorities", authority["id"], latitude, longitude)
+        await conn.commit()
+        response_cache.invalidate("authorities")
+        if latitude is None or longitude is None:
+            geo_locator.locate_later("authorities", authority["id"], location)
 
         # Return response
         return AuthorityResponse(
@@ -47,63 +75,55 @@ async def create_authority(
             document_path=document_path,
             created_at=int(authority["created_at"].timestamp()),
         )
-    except Exception as e:
-        conn.rollback()
-        print(f"ERROR - DB:\n{e}")
+    except HTTPException:
+        raise
+    except Exception:
+        await conn.rollback()
+        logger.exception("Database error")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=endpoint_errors[500]["description"],
         )
 
 
-@router.get("/authorities/{authority_id}", response_model=AuthorityResponse, responses=endpoint_errors)
-async def get_authority(authority_id: int):
+@router.get("/authorities/all", response_model=List[AuthorityResponse], responses=endpoint_errors)
+async def get_all_authorities(if_none_match: Optional[str] = Header(None)):
+    """
+    Streamed from a server-side cursor, so the full table is never held in memory.
+    Repeat requests are served from the response cache until a write
+    invalidates it; those carry an ETag, and a matching If-None-Match
+    gets an empty 304.
+    """
+    key = response_cache.key("authorities", "all")
+    cached = response_cache.get(key, if_none_match)
+    if cached is not None:
+        return cached
+
     try:
-        query = "SELECT * FROM authority WHERE id = %s"
-        cur.execute(query, (authority_id,))
-        authority = cur.fetchone()
-        if not authority:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=endpoint_errors[404]["description"],
-            )
-        return AuthorityResponse(
-            id=authority["id"],
-            name=authority["name"],
-            location=authority["location"],
-            description=authority["description"],
-            document_path=authority["document_path"],
-            photo_path=authority["photo_path"],
-            created_at=int(authority["created_at"].timestamp()),
-        )
-    except Exception as e:
-        print(f"ERROR - DB:\n{e}")
+        query = "SELECT * FROM authority"
+        return response_cache.store_stream(key, await stream_json_array(query, serialize=row_to_authority))
+    except Exception:
+        logger.exception("Database error")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=endpoint_errors[500]["description"],
         )
 
 
-@router.get("/authorities/all", response_model=List[AuthorityResponse], responses=endpoint_errors)
-async def get_all_authorities():
+@router.get("/authorities/{authority_id}", response_model=AuthorityResponse, responses=endpoint_errors)
+async def get_authority(authority_id: int, cur: AsyncCursor = Depends(get_cursor)):
     try:
-        query = "SELECT * FROM authority"
-        cur.execute(query)
-        authorities = cur.fetchall()
-        return [
-            AuthorityResponse(
-                id=auth["id"],
-                name=auth["name"],
-                location=auth["location"],
-                description=auth["description"],
-                document_path=auth["document_path"],
-                photo_path=auth["photo_path"],
-                created_at=int(auth["created_at"].timestamp()),
+        query = "SELECT * FROM authority WHERE id = %s"
+        await cur.execute(query, (authority_id,))
+        authority = await cur.fetchone()
+        if not authority:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=endpoint_errors[404]["description"],
             )
-            for auth in authorities
-        ]
-    except Exception as e:
-        print(f"ERROR - DB:\n{e}")
+        return row_to_authority(authority)
+    except Exception:
+        logger.exception("Database error")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=endpoint_errors[500]["description"],
@@ -116,6 +136,8 @@ async def update_authority(
     name: Optional[str] = Form(None),
     location: Optional[str] = Form(None),
     description: Optional[str] = Form(None),
+    conn: AsyncConnection = Depends(get_conn),
+    cur: AsyncCursor = Depends(get_cursor),
 ):
     try:
         updates = []
@@ -139,15 +161,19 @@ async def update_authority(
 
         params.append(authority_id)
         query = f"UPDATE authority SET {', '.join(updates)} WHERE id = %s"
-        cur.execute(query, params)
-        conn.commit()
+        await cur.execute(query, params)
+        await conn.commit()
+        response_cache.invalidate("authorities", authority_id)
+        if location:
+            # Coordinates follow the new location once it is geocoded
+            geo_locator.locate_later("authorities", authority_id, location)
 
         return JSONResponse(
             status_code=status.HTTP_200_OK, content={"message": "Authority updated successfully"}
         )
-    except Exception as e:
-        conn.rollback()
-        print(f"ERROR - DB:\n{e}")
+    except Exception:
+        await conn.rollback()
+        logger.exception("Database error")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=endpoint_errors[500]["description"],
@@ -155,17 +181,22 @@ async def update_authority(
 
 
 @router.delete("/authorities/{authority_id}", responses=endpoint_errors)
-async def delete_authority(authority_id: int):
+async def delete_authority(
+    authority_id: int,
+    conn: AsyncConnection = Depends(get_conn),
+    cur: AsyncCursor = Depends(get_cursor),
+):
     try:
         query = "DELETE FROM authority WHERE id = %s"
-        cur.execute(query, (authority_id,))
-        conn.commit()
+        await cur.execute(query, (authority_id,))
+        await conn.commit()
+        response_cache.invalidate("authorities", authority_id)
         return JSONResponse(
             status_code=status.HTTP_200_OK, content={"message": "Authority deleted successfully"}
         )
-    except Exception as e:
-        conn.rollback()
-        print(f"ERROR - DB:\n{e}")
+    except Exception:
+        await conn.rollback()
+        logger.exception("Database error")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=endpoint_errors[500]["description"],
@@ -1,9 +1,18 @@
-from fastapi import APIRouter, status, HTTPException
-from app.database import cur, conn
+import logging
+from datetime import date
+from fastapi import APIRouter, status, HTTPException, Depends, Query, Body
+import psycopg
+from psycopg import AsyncConnection, AsyncCursor
+from app.config import settings
+from app.dependencies.database import get_conn, get_cursor
 from fastapi.responses import JSONResponse
 from app.schemas.error import SimpleErrorMessage
-from app.schemas.booking import BookingRequest, BookingResponse
+from app.schemas.booking import Availability, BookedInterval, BookingRequest, BookingResponse, DateInterval
 from typing import List
+from app.utils.availability import booked_intervals, first_overlap, free_intervals, parse_dates
+from app.utils.streaming import stream_json_array
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -12,37 +21,63 @@ endpoint_errors = {
     400: {"model": SimpleErrorMessage, "description": "Invalid Input"},
 }
 
-@router.post("/book", response_model=BookingResponse, responses=endpoint_errors)
-async def book_item(booking: BookingRequest):
-    """
-    Book a vehicle, equipment, or guide.
-    """
-    query = b"""
+booking_errors = {
+    **endpoint_errors,
+    409: {"model": SimpleErrorMessage, "description": "Item already booked for these dates"},
+}
+
+INSERT_BOOKING = b"""
     INSERT INTO booking (
         type, provider_id, customer_id, item_id, book_date, book_time, service_date, service_time, deliver_date, deliver_time, quantity, status
-    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)   
+    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
     RETURNING id, type, provider_id, customer_id, item_id, book_date, book_time, service_date, service_time, deliver_date, deliver_time, quantity, status
+"""
+
+
+def booking_params(booking: BookingRequest) -> tuple:
+    return (
+        booking.type,
+        booking.provider_id,
+        booking.customer_id,
+        booking.item_id,
+        booking.book_date,
+        booking.book_time,
+        booking.service_date,
+        booking.service_time,
+        booking.deliver_date,
+        booking.deliver_time,
+        booking.quantity,
+        booking.status,
+    )
+
+
+def row_to_booking(row: dict) -> BookingResponse:
+    # Dates and times come back from Postgres as date/time objects
+    values = {
+        key: value.isoformat() if hasattr(value, "isoformat") else value
+        for key, value in row.items()
+    }
+    return BookingResponse(**values)
+
+
+@router.post("/book", response_model=BookingResponse, responses=booking_errors)
+async def book_item(
+    booking: BookingRequest,
+    conn: AsyncConnection = Depends(get_conn),
+    cur: AsyncCursor = Depends(get_cursor),
+):
     """
+    Book a vehicle, equipment, or guide.
+
+    The item is held from service_date through deliver_date. Overlapping
+    bookings of the same item are rejected with a 409 by the booking_no_overlap
+    constraint, which also settles concurrent attempts: exactly one wins.
+    """
+    dates = parse_dates(booking.service_date, booking.deliver_date)
     try:
-        cur.execute(
-            query,
-            (
-                booking.type,
-                booking.provider_id,
-                booking.customer_id,
-                booking.item_id,
-                booking.book_date,
-                booking.book_time,
-                booking.service_date,
-                booking.service_time,
-                booking.deliver_date,
-                booking.deliver_time,
-                booking.quantity,
-                booking.status,
-            ),
-        )
-        conn.commit()
-        result = cur.fetchone()
+        await cur.execute(INSERT_BOOKING, booking_params(booking))
+        result = await cur.fetchone()
+        await conn.commit()
 
         if not result:
             raise HTTPException(
@@ -52,32 +87,119 @@ async def book_item(booking: BookingRequest):
 
         return JSONResponse(
             status_code=status.HTTP_201_CREATED,
-            content={
-                "id": result["id"],
-                "type": result["type"],
-                "provider_id": result["provider_id"],
-                "customer_id": result["customer_id"],
-                "item_id": result["item_id"],
-                "book_date": result["book_date"],
-                "book_time": result["book_time"],
-                "service_date": result["service_date"],
-                "service_time": result["service_time"],
-                "deliver_date": result["deliver_date"],
-                "deliver_time": result["deliver_time"],
-                "quantity": result["quantity"],
-            },
+            content=row_to_booking(result).model_dump(),
         )
-    except Exception as e:
-        print(f"ERROR - DB:\n{e}")
+    except psycopg.errors.ExclusionViolation:
+        await conn.rollback()
+        start, end = dates
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"{booking.type} {booking.item_id} is already booked between {start} and {end}.",
+        )
+    except HTTPException:
+        raise
+    except Exception:
+        logger.exception("Database error")
         return JSONResponse(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             content={"message": endpoint_errors[500]["description"]},
         )
-        
+
+
+@router.post("/book/bulk", response_model=List[BookingResponse], responses=booking_errors)
+async def book_items(
+    bookings: List[BookingRequest] = Body(..., min_length=1, max_length=settings.BOOKING_BULK_MAX),
+    conn: AsyncConnection = Depends(get_conn),
+    cur: AsyncCursor = Depends(get_cursor),
+):
+    """
+    Book several items at once, e.g. a vehicle, a guide and equipment for a
+    tour. All bookings are made or none: they are inserted in one pipelined
+    batch and committed together, and any invalid or overlapping booking
+    rejects the whole request. Bookings are returned in request order.
+    """
+    holds = [
+        (booking.type, booking.item_id, parse_dates(booking.service_date, booking.deliver_date))
+        for booking in bookings
+    ]
+    overlap = first_overlap(holds)
+    if overlap is not None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Bookings {overlap[0]} and {overlap[1]} book the same item on overlapping dates.",
+        )
+
+    try:
+        await cur.executemany(INSERT_BOOKING, [booking_params(booking) for booking in bookings], returning=True)
+        results = []
+        while True:
+            results.append(await cur.fetchone())
+            if not cur.nextset():
+                break
+        await conn.commit()
+
+        return JSONResponse(
+            status_code=status.HTTP_201_CREATED,
+            content=[row_to_booking(result).model_dump() for result in results],
+        )
+    except psycopg.errors.ExclusionViolation:
+        await conn.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="An item is already booked for some of these dates.",
+        )
+    except Exception:
+        await conn.rollback()
+        logger.exception("Database error")
+        return JSONResponse(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            content={"message": endpoint_errors[500]["description"]},
+        )
+
+
+@router.get("/availability/{item_type}/{item_id}", response_model=Availability, responses=endpoint_errors)
+async def get_availability(
+    item_type: str,
+    item_id: int,
+    start: date = Query(..., alias="from"),
+    end: date = Query(..., alias="to"),
+    cur: AsyncCursor = Depends(get_cursor),
+):
+    """
+    Booking calendar of an item between `from` and `to` (inclusive): its
+    live bookings and the free days around them.
+    """
+    if end < start or (end - start).days >= settings.AVAILABILITY_MAX_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"'to' must be on or after 'from', at most {settings.AVAILABILITY_MAX_DAYS} days apart",
+        )
+
+    try:
+        booked = await booked_intervals(cur, item_type, item_id, start, end)
+    except Exception:
+        logger.exception("Database error")
+        return JSONResponse(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            content={"message": endpoint_errors[500]["description"]},
+        )
+
+    return Availability(
+        type=item_type,
+        item_id=item_id,
+        start=start,
+        end=end,
+        booked=[
+            BookedInterval(booking_id=row["id"], start=row["service_date"], end=row["deliver_date"])
+            for row in booked
+        ],
+        free=[DateInterval(start=a, end=b) for a, b in free_intervals(booked, start, end)],
+    )
+
 @router.get("/bookings", response_model=List[BookingResponse], responses=endpoint_errors)  # type: ignore
 async def get_booking_all():
     """
-    Retrieve all bookings.
+    Retrieve all bookings, streamed from a server-side cursor.
     """
     query = b"""
     SELECT 
@@ -85,38 +207,16 @@ async def get_booking_all():
     FROM booking
     """
     try:
-        cur.execute(query)
-        results = cur.fetchall()
-
-        bookings = [
-            BookingResponse(
-                id=row["id"],
-                type=row["type"],
-                provider_id=row["provider_id"],
-                customer_id=row["customer_id"],
-                item_id=row["item_id"],
-                book_date=row["bookdate"],
-                book_time=row["booktime"],
-                service_date=row["service_date"],
-                service_time=row["service_time"],
-                deliver_date=row["deliver_date"],
-                deliver_time=row["deliver_time"],
-                quantity=row["quantity"],
-                status=row["status"],
-            )
-            for row in results
-        ]
-
-        return JSONResponse(content=[booking.dict() for booking in bookings])
-    except Exception as e:
-        print(f"ERROR - DB:\n{e}")
+        return await stream_json_array(query, serialize=row_to_booking)
+    except Exception:
+        logger.exception("Database error")
         return JSONResponse(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             content={"message": endpoint_errors[500]["description"]},
         )
         
 @router.get("/bookings/{booking_id}", response_model=BookingResponse, responses=endpoint_errors)  # type: ignore
-async def get_booking(booking_id: int):
+async def get_booking(booking_id: int, cur: AsyncCursor = Depends(get_cursor)):
     """
     Retrieve booking details by ID.
     """
@@ -127,8 +227,8 @@ async def get_booking(booking_id: int):
     WHERE id = %s
     """
     try:
-        cur.execute(query, (booking_id,))
-        result = cur.fetchone()
+        await cur.execute(query, (booking_id,))
+        result = await cur.fetchone()
 
         if not result:
             raise HTTPException(
@@ -136,25 +236,11 @@ async def get_booking(booking_id: int):
                 detail=f"Booking with ID {booking_id} not found.",
             )
 
-        booking = BookingResponse(
-            id=result["id"],
-            type=result["type"],
-            provider_id=result["provider_id"],
-            customer_id=result["customer_id"],
-            item_id=result["item_id"],
-            book_date=result["book_date"],
-            book_time=result["book_time"],
-            service_date=result["service_date"],
-            service_time=result["service_time"],
-            deliver_date=result["deliver_date"],
-            deliver_time=result["deliver_time"],
-            quantity=result["quantity"],
-            status=result["status"],
-        )
+        booking = row_to_booking(result)
 
         return JSONResponse(content=booking.dict())
-    except Exception as e:
-        print(f"ERROR - DB:\n{e}")
+    except Exception:
+        logger.exception("Database error")
         return JSONResponse(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             content={"message": endpoint_errors[500]["description"]},
@@ -1,26 +1,112 @@
-from fastapi import APIRouter, UploadFile, Form, HTTPException, File, status
-from app.database import cur, conn
+import logging
+from fastapi import APIRouter, UploadFile, Form, HTTPException, File, Query, status, Depends, Header
+from psycopg import AsyncConnection, AsyncCursor
+from app.dependencies.database import get_conn, get_cursor
 from fastapi.responses import JSONResponse
 from typing import List, Optional
-from app.schemas.services import EquipmentResponse, CreateEquipmentRequest
+from app.schemas.services import EquipmentResponse, EquipmentPage, CreateEquipmentRequest
 import datetime
 from app.utils.image_processing import process_images
+from app.utils.streaming import stream_json_array
+from app.utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from app.utils.search import SortOption, build_search_query, fetch_search_page, sort_fields
+from app.utils.projection import Projection, reference
+from app.utils.geo import geo_locator, set_coordinates
+from app.utils.response_cache import response_cache
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 endpoint_errors = {
     500: {"description": "Database Error"},
     404: {"description": "Equipment not found"},
+    400: {"description": "Invalid cursor or sort"},
+}
+
+
+EQUIPMENT_FROM = "FROM equipments JOIN users ON equipments.owner_id = users.id"
+
+EQUIPMENT_SELECT = f"""
+    SELECT 
+        equipments.id,
+        equipments.owner_id,
+        equipments.type,
+        equipments.quantity,
+        equipments.location,
+        equipments.description,
+        equipments.price_per_day,
+        equipments.wishlist,
+        equipments.availability,
+        equipments.photo_path,
+        users.first_name,
+        users.last_name,
+        users.email,
+        users.phone_number
+    {EQUIPMENT_FROM}
+"""
+
+# Listing fields, for `fields=` and the lean default (blobs only when they
+# are media keys or URLs; see app/utils/projection.py).
+EQUIPMENT_FIELDS = Projection(
+    columns={
+        "id": "equipments.id",
+        "owner_id": "equipments.owner_id",
+        "type": "equipments.type",
+        "quantity": "equipments.quantity",
+        "location": "equipments.location",
+        "description": "equipments.description",
+        "price_per_day": "equipments.price_per_day",
+        "wishlist": "equipments.wishlist",
+        "availability": "equipments.availability",
+        "photo_path": "equipments.photo_path",
+        "name": "users.first_name || ' ' || users.last_name",
+        "email": "users.email",
+        "phone_number": "users.phone_number",
+    },
+    references={
+        "photo_path": reference("equipments.photo_path"),
+    },
+)
+
+# Served by the (location, price_per_day, id), (type, price_per_day, id) and
+# (price_per_day, id) indexes from migrations/006_service_search.sql.
+EQUIPMENT_SORTS = {
+    "newest": SortOption(None, descending=True),
+    "price_asc": SortOption("equipments.price_per_day", descending=False),
+    "price_desc": SortOption("equipments.price_per_day", descending=True),
 }
 
 
+def row_to_equipment(equipment: dict) -> EquipmentResponse:
+    return EquipmentResponse(
+        id=equipment["id"],
+        owner_id=equipment["owner_id"],
+        type=equipment["type"],
+        description=equipment["description"],
+        price_per_day=equipment["price_per_day"],
+        photo_path=equipment["photo_path"],
+        quantity=equipment["quantity"],
+        wishlist=equipment["wishlist"],
+        email=equipment["email"],
+        phone_number=equipment["phone_number"],
+        name=equipment["first_name"] + " " + equipment["last_name"],
+        availability=equipment["availability"],
+        location=equipment["location"],
+    )
+
+
 @router.post("/equipment/create")
 async def create_equipment(
     owner_id: int = Form(...),
     type: str = Form(...),
     location: str = Form(...),
     description: Optional[str] = Form(None),
+    latitude: Optional[float] = Form(None, ge=-90, le=90),
+    longitude: Optional[float] = Form(None, ge=-180, le=180),
     photo: Optional[UploadFile] = None,
+    conn: AsyncConnection = Depends(get_conn),
+    cur: AsyncCursor = Depends(get_cursor),
 ):
     photo_path = None
     if photo:
@@ -35,7 +121,7 @@ async def create_equipment(
     """
     
     try:
-        cur.execute(
+        await cur.execute(
             query,
             (
                 owner_id,
@@ -45,8 +131,13 @@ async def create_equipment(
                 location,
             ),
         )
-        equipment_id = cur.fetchone()
-        conn.commit()
+        equipment_id = await cur.fetchone()
+        if latitude is not None and longitude is not None:
+            await set_coordinates(cur, "equipments", equipment_id["id"], latitude, longitude)
+        await conn.commit()
+        response_cache.invalidate("equipments")
+        if latitude is None or longitude is None:
+            geo_locator.locate_later("equipments", equipment_id["id"], location)
         
         return JSONResponse(
             content={
@@ -54,69 +145,94 @@ async def create_equipment(
                 "equipment_id": equipment_id,
             },
         )
-    except Exception as e:
-        conn.rollback()
-        print(f"ERROR - DB:\n{e}")
+    except Exception:
+        await conn.rollback()
+        logger.exception("Database error")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=endpoint_errors[500]["description"],
         )
 
 
-@router.get("/equipment/{equipment_id}", response_model=EquipmentResponse, responses=endpoint_errors)
-async def get_equipment(equipment_id: int):
+@router.get("/equipment/all", response_model=List[EquipmentResponse], responses=endpoint_errors)
+async def get_all_equipment(fields: Optional[str] = None, if_none_match: Optional[str] = Header(None)):
+    """
+    Streamed from a server-side cursor, so the full table is never held in memory.
+    Repeat requests are served from the response cache until a write
+    invalidates it; those carry an ETag, and a matching If-None-Match
+    gets an empty 304.
+
+    `fields` is a comma-separated list of fields to return; only those
+    columns are read. By default all fields are returned, with images only
+    when they are stored as media keys.
+    """
+    selection = EQUIPMENT_FIELDS.select(fields)
+    key = response_cache.key("equipments", "all", fields=fields)
+    cached = response_cache.get(key, if_none_match)
+    if cached is not None:
+        return cached
+
     try:
-        query = """
-            SELECT 
-                equipments.id,
-                equipments.owner_id,
-                equipments.type,
-                equipments.quantity,
-                equipments.location,
-                equipments.description,
-                equipments.price_per_day,
-                equipments.wishlist,
-                equipments.availability,
-                equipments.photo_path,
-                users.first_name,
-                users.last_name,
-                users.email,
-                users.phone_number
-            FROM equipments JOIN users ON equipments.owner_id = users.id
-            WHERE id = %s
-        """
-        cur.execute(query, (equipment_id,))
-        equipment = cur.fetchone()
-        if not equipment:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=endpoint_errors[404]["description"],
-            )
-        return EquipmentResponse(
-            id=equipment["id"],
-                owner_id=equipment["owner_id"],
-                type=equipment["type"],
-                description=equipment["description"],
-                price_per_day=equipment["price_per_day"],
-                photo_path=equipment["photo_path"],
-                quantity=equipment["quantity"],
-                wishlist=equipment["wishlist"],
-                phone_number=equipment["phone_number"],
-                email=equipment["email"],
-                name=equipment["first_name"] + " " + equipment["last_name"],
-                availability=equipment["availability"],
-                location=equipment["location"],
+        query = f"SELECT {selection.columns} {EQUIPMENT_FROM}"
+        return response_cache.store_stream(key, await stream_json_array(query, serialize=selection.pick))
+    except Exception:
+        logger.exception("Database error")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=endpoint_errors[500]["description"],
         )
-    except Exception as e:
-        print(f"ERROR - DB:\n{e}")
+
+
+@router.get("/equipment/search", response_model=EquipmentPage, responses=endpoint_errors)
+async def search_equipment(
+    location: Optional[str] = None,
+    type: Optional[str] = None,
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    available: Optional[bool] = None,
+    sort: str = "newest",
+    fields: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    cur: AsyncCursor = Depends(get_cursor),
+):
+    """
+    Equipment matching all given filters, one page at a time. `sort` is one
+    of newest, price_asc or price_desc (by price per day); pass the returned
+    `next_cursor` back with the same filters and sort for the next page.
+    `fields` selects the returned fields, as for the full listing.
+    """
+    try:
+        selection = EQUIPMENT_FIELDS.select(fields, required=sort_fields(EQUIPMENT_SORTS, sort))
+        query, params = build_search_query(
+            f"SELECT {selection.columns} {EQUIPMENT_FROM}",
+            "equipments.id",
+            [
+                ("equipments.location = %s", location),
+                ("equipments.type = %s", type),
+                ("equipments.price_per_day >= %s", min_price),
+                ("equipments.price_per_day <= %s", max_price),
+                ("equipments.availability = %s", available),
+            ],
+            EQUIPMENT_SORTS,
+            sort,
+            cursor,
+            limit,
+        )
+        rows, next_cursor = await fetch_search_page(cur, query, params, limit, EQUIPMENT_SORTS, sort)
+        return selection.page("equipments", rows, next_cursor)
+    except HTTPException:
+        raise
+    except Exception:
+        logger.exception("Database error")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=endpoint_errors[500]["description"],
         )
 
 
-@router.get("/equipment/all", response_model=List[EquipmentResponse], responses=endpoint_errors)
-async def get_all_equipment():
+@router.get("/equipment/{equipment_id}", response_model=EquipmentResponse, responses=endpoint_errors)
+async def get_equipment(equipment_id: int, cur: AsyncCursor = Depends(get_cursor)):
     try:
         query = """
             SELECT 
@@ -135,29 +251,18 @@ async def get_all_equipment():
                 users.email,
                 users.phone_number
             FROM equipments JOIN users ON equipments.owner_id = users.id
+            WHERE id = %s
         """
-        cur.execute(query)
-        equipments = cur.fetchall()
-        return [
-            EquipmentResponse(
-                id=equipment["id"],
-                owner_id=equipment["owner_id"],
-                type=equipment["type"],
-                description=equipment["description"],
-                price_per_day=equipment["price_per_day"],
-                photo_path=equipment["photo_path"],
-                quantity=equipment["quantity"],
-                wishlist=equipment["wishlist"],
-                email=equipment["email"],
-                phone_number=equipment["phone_number"],
-                name=equipment["first_name"] + " " + equipment["last_name"],
-                availability=equipment["availability"],
-                location=equipment["location"],
+        await cur.execute(query, (equipment_id,))
+        equipment = await cur.fetchone()
+        if not equipment:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=endpoint_errors[404]["description"],
             )
-            for equipment in equipments
-        ]
-    except Exception as e:
-        print(f"ERROR - DB:\n{e}")
+        return row_to_equipment(equipment)
+    except Exception:
+        logger.exception("Database error")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=endpoint_errors[500]["description"],
@@ -171,6 +276,8 @@ async def update_equipment(
     type: Optional[str] = Form(None),
     condition: Optional[str] = Form(None),
     description: Optional[str] = Form(None),
+    conn: AsyncConnection = Depends(get_conn),
+    cur: AsyncCursor = Depends(get_cursor),
 ):
     try:
         updates = []
@@ -196,15 +303,16 @@ async def update_equipment(
 
         params.append(equipment_id)
         query = f"UPDATE equipment SET {', '.join(updates)} WHERE id = %s"
-        cur.execute(query, params)
-        conn.commit()
+        await cur.execute(query, params)
+        await conn.commit()
+        response_cache.invalidate("equipments", equipment_id)
 
         return JSONResponse(
             status_code=status.HTTP_200_OK, content={"message": "Equipment updated successfully"}
         )
-    except Exception as e:
-        conn.rollback()
-        print(f"ERROR - DB:\n{e}")
+    except Exception:
+        await conn.rollback()
+        logger.exception("Database error")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=endpoint_errors[500]["description"],
@@ -212,17 +320,22 @@ async def update_equipment(
 
 
 @router.delete("/equipment/{equipment_id}", responses=endpoint_errors)
-async def delete_equipment(equipment_id: int):
+async def delete_equipment(
+    equipment_id: int,
+    conn: AsyncConnection = Depends(get_conn),
+    cur: AsyncCursor = Depends(get_cursor),
+):
     try:
         query = "DELETE FROM equipment WHERE id = %s"
-        cur.execute(query, (equipment_id,))
-        conn.commit()
+        await cur.execute(query, (equipment_id,))
+        await conn.commit()
+        response_cache.invalidate("equipments", equipment_id)
         return JSONResponse(
             status_code=status.HTTP_200_OK, content={"message": "Equipment deleted successfully"}
         )
-    except Exception as e:
-        conn.rollback()
-        print(f"ERROR - DB:\n{e}")
+    except Exception:
+        await conn.rollback()
+        logger.exception("Database error")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=endpoint_errors[500]["description"],
@@ -230,7 +343,7 @@ async def delete_equipment(equipment_id: int):
 
 
 @router.get("/equipment/status/{owner_id}", responses=endpoint_errors)
-async def get_equipment_status(owner_id: int):
+async def get_equipment_status(owner_id: int, cur: AsyncCursor = Depends(get_cursor)):
     try:
         query = """
         SELECT status FROM equipments
@@ -238,15 +351,15 @@ async def get_equipment_status(owner_id: int):
         ORDER BY created_at DESC
         LIMIT 1;
         """
-        cur.execute(query, (owner_id,))
-        result = cur.fetchone()
+        await cur.execute(query, (owner_id,))
+        result = await cur.fetchone()
 
         if not result:
             return {"status": 0}
 
         return {"status": result["status"]}
-    except Exception as e:
-        print(f"ERROR - DB:\n{e}")
+    except Exception:
+        logger.exception("Database error")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=endpoint_errors[500]["description"],
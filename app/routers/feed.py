@@ -0,0 +1,43 @@
+import logging
+from fastapi import APIRouter, HTTPException, Query, status, Depends
+from psycopg import AsyncCursor
+from app.dependencies.database import get_cursor
+from fastapi.responses import JSONResponse
+from app.schemas.error import SimpleErrorMessage
+from typing import Optional
+from app.schemas.post import PostPage
+from app.utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from app.utils.timeline import fetch_feed_page
+
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+endpoint_errors = {
+    500: {"model": SimpleErrorMessage, "description": "Database Error"},
+    400: {"model": SimpleErrorMessage, "description": "Invalid cursor"},
+}
+
+@router.get("/feed/{user_id}", response_model=PostPage, responses=endpoint_errors)  # type: ignore
+async def get_feed(
+    user_id: int,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    cur: AsyncCursor = Depends(get_cursor),
+):
+    """
+    Posts from the users `user_id` follows (and their own), newest first.
+    Pass the returned `next_cursor` back as `cursor` for the next page.
+    """
+    try:
+        page = await fetch_feed_page(cur, user_id, limit, cursor)
+        return JSONResponse(content=page.dict())
+    except HTTPException:
+        raise
+    except Exception:
+        logger.exception("Database error")
+        return JSONResponse(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            content={"message": endpoint_errors[500]["description"]},
+        )
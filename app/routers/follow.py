@@ -1,9 +1,20 @@
-from fastapi import APIRouter, HTTPException, status
+import logging
+from fastapi import APIRouter, HTTPException, status, Depends
 from typing import List
-from app.database import conn, cur
-from app.schemas.follow import FollowRequest, UserListResponse
+from psycopg import AsyncConnection, AsyncCursor
+from app.dependencies.database import get_conn, get_cursor
+from app.schemas.follow import (
+    FollowRequest,
+    UserListResponse,
+    FollowCountsResponse,
+    FollowCheckRequest,
+    FollowCheckResponse,
+)
+from app.utils.follow_graph import follow_graph
+from app.utils.timeline import backfill_timeline, remove_followee
 from fastapi.responses import JSONResponse
-import traceback
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -13,16 +24,20 @@ endpoint_errors = {
 }
 
 @router.post("/follow", status_code=status.HTTP_201_CREATED)
-async def follow_user(request: FollowRequest):
-    print(f"User ID: {request.user_id}, Follower ID: {request.follower_id}")
+async def follow_user(
+    request: FollowRequest,
+    conn: AsyncConnection = Depends(get_conn),
+    cur: AsyncCursor = Depends(get_cursor),
+):
+    logger.debug("Follow request", extra={"user_id": request.user_id, "follower_id": request.follower_id})
     try:
         # Step 1: Check if a follow record already exists
         check_query = """
         SELECT * FROM follow 
         WHERE user_id = %s AND follower_id = %s
         """
-        cur.execute(check_query, (request.user_id, request.follower_id))
-        existing_follow = cur.fetchone()
+        await cur.execute(check_query, (request.user_id, request.follower_id))
+        existing_follow = await cur.fetchone()
 
         if existing_follow:
             # Step 2: If a record exists, update the 'is_followed' field to True (if not already True)
@@ -31,8 +46,10 @@ async def follow_user(request: FollowRequest):
             SET is_followed = true
             WHERE user_id = %s AND follower_id = %s
             """
-            cur.execute(update_query, (request.user_id, request.follower_id))
-            conn.commit()  # Don't forget to commit changes to the database
+            await cur.execute(update_query, (request.user_id, request.follower_id))
+            await backfill_timeline(cur, request.user_id, request.follower_id)
+            await conn.commit()  # Don't forget to commit changes to the database
+            follow_graph.invalidate(request.user_id, request.follower_id)
 
             return JSONResponse(
                 content={"message": "Follow status updated."},
@@ -44,15 +61,17 @@ async def follow_user(request: FollowRequest):
             INSERT INTO follow (user_id, follower_id, is_followed) 
             VALUES (%s, %s, true)
             """
-            cur.execute(insert_query, (request.user_id, request.follower_id))
-            conn.commit()  # Commit the new follow relationship
+            await cur.execute(insert_query, (request.user_id, request.follower_id))
+            await backfill_timeline(cur, request.user_id, request.follower_id)
+            await conn.commit()  # Commit the new follow relationship
+            follow_graph.invalidate(request.user_id, request.follower_id)
 
             return JSONResponse(
                 content={"message": "User followed successfully."},
                 status_code=status.HTTP_201_CREATED
             )
-    except Exception as e:
-        print(f"ERROR - DB:\n{e}")
+    except Exception:
+        logger.exception("Database error")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Database error",
@@ -60,7 +79,11 @@ async def follow_user(request: FollowRequest):
 
 
 @router.post("/unfollow", responses=endpoint_errors)
-async def unfollow_user(request: FollowRequest):
+async def unfollow_user(
+    request: FollowRequest,
+    conn: AsyncConnection = Depends(get_conn),
+    cur: AsyncCursor = Depends(get_cursor),
+):
     query = """
     UPDATE follow
     SET is_followed = FALSE
@@ -68,72 +91,96 @@ async def unfollow_user(request: FollowRequest):
     RETURNING user_id;
     """
     try:
-        cur.execute(query, (request.user_id, request.follower_id))
+        await cur.execute(query, (request.user_id, request.follower_id))
         if cur.rowcount == 0:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Follow relationship does not exist or is already inactive",
             )
-        user_id = cur.fetchone()
-        conn.commit()
+        user_id = await cur.fetchone()
+        await remove_followee(cur, request.user_id, request.follower_id)
+        await conn.commit()
+        follow_graph.invalidate(request.user_id, request.follower_id)
         return JSONResponse(
             content={
                 "message": "Unfollowed successfully",
                 "user_id": user_id,
             },
         )
-    except Exception as e:
-        conn.rollback()
-        print(f"ERROR - DB:\n{e}")
+    except Exception:
+        await conn.rollback()
+        logger.exception("Database error")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Database error",
         )
 
 @router.get("/following/{id}", response_model=UserListResponse, responses=endpoint_errors)
-async def get_following(id: int):
+async def get_following(id: int, cur: AsyncCursor = Depends(get_cursor)):
     try:
         # Fetch the list of following user IDs for the given user_id
-        query = "SELECT follower_id FROM follow WHERE user_id = %s AND is_followed = TRUE"
-        cur.execute(query, (id,))
-        followings = [row['follower_id'] for row in cur.fetchall()]
-        print(followings)
+        followings = sorted(await follow_graph.following(cur, id))
         return JSONResponse(
             content={"users": followings},
             status_code=status.HTTP_200_OK,
         )
     
-    except Exception as e:
+    except Exception:
         # Log the full exception traceback for better debugging
-        print(f"ERROR - DB:\n{traceback.format_exc()}")
+        logger.exception("Database error")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Database error",
         )
 
 @router.get("/followers/{id}", response_model=UserListResponse, responses=endpoint_errors)
-async def get_followers(id: int):
+async def get_followers(id: int, cur: AsyncCursor = Depends(get_cursor)):
     """
     Retrieves a list of active followers for the specified user.
     """
-    query = """
-    SELECT user_id
-    FROM follow
-    WHERE follower_id = %s AND is_followed = TRUE;
-    """
     try:
-        cur.execute(query, (id,))
-        followers = [row['user_id'] for row in cur.fetchall()]
-        print(followers)
+        followers = sorted(await follow_graph.followers(cur, id))
         return JSONResponse(
             content={"users": followers},
             status_code=status.HTTP_200_OK,
         )
-    except Exception as e:
+    except Exception:
         # Log the error for debugging
-        print(f"ERROR - DB:\n{e}")
+        logger.exception("Database error")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Database error",
+        )
+
+
+@router.get("/follow/counts/{id}", response_model=FollowCountsResponse, responses=endpoint_errors)
+async def get_follow_counts(id: int, cur: AsyncCursor = Depends(get_cursor)):
+    """
+    Number of users the specified user follows and is followed by.
+    """
+    try:
+        following = await follow_graph.following(cur, id)
+        followers = await follow_graph.followers(cur, id)
+        return FollowCountsResponse(user_id=id, following=len(following), followers=len(followers))
+    except Exception:
+        logger.exception("Database error")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Database error",
         )
 
+
+@router.post("/follow/check", response_model=FollowCheckResponse, responses=endpoint_errors)
+async def check_following(request: FollowCheckRequest, cur: AsyncCursor = Depends(get_cursor)):
+    """
+    Whether `user_id` follows each of `target_ids`, answered in one call.
+    """
+    try:
+        following = await follow_graph.is_following_many(cur, request.user_id, request.target_ids)
+        return FollowCheckResponse(user_id=request.user_id, following=following)
+    except Exception:
+        logger.exception("Database error")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Database error",
+        )
@@ -1,19 +1,100 @@
-from fastapi import APIRouter, UploadFile, Form, HTTPException, File, status
-from app.database import cur, conn
+import logging
+from fastapi import APIRouter, UploadFile, Form, HTTPException, File, Query, status, Depends, Header
+from psycopg import AsyncConnection, AsyncCursor
+from app.dependencies.database import get_conn, get_cursor
 from fastapi.responses import JSONResponse
 from typing import List, Optional
-from app.schemas.services import GuideResponse, CreateGuideRequest
+from app.schemas.services import GuideResponse, GuidePage, CreateGuideRequest
 import datetime
 from app.utils.image_processing import process_images
 from app.utils.pdf_processing import process_pdf
+from app.utils.streaming import stream_json_array
+from app.utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from app.utils.search import SortOption, build_search_query, fetch_search_page, sort_fields
+from app.utils.projection import Projection, reference
+from app.utils.geo import geo_locator, set_coordinates
+from app.utils.response_cache import response_cache
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 endpoint_errors = {
     500: {"description": "Database Error"},
     404: {"description": "Guide not found"},
+    400: {"description": "Invalid cursor or sort"},
+}
+
+GUIDE_FROM = "FROM guides JOIN users ON guides.user_id = users.id"
+
+GUIDE_SELECT = f"""
+    SELECT 
+        guides.id,
+        guides.language,
+        guides.location,
+        guides.preference,
+        guides.about,
+        guides.price,
+        guides.wishlist,
+        guides.availability,
+        users.id as user_id,
+        users.first_name,
+        users.last_name,
+        users.profile_pic,
+        users.email,
+        users.phone_number
+    {GUIDE_FROM}
+"""
+
+# Listing fields, for `fields=` and the lean default (blobs only when they
+# are media keys or URLs; see app/utils/projection.py).
+GUIDE_FIELDS = Projection(
+    columns={
+        "id": "guides.id",
+        "language": "guides.language",
+        "location": "guides.location",
+        "preference": "guides.preference",
+        "about": "guides.about",
+        "price": "guides.price",
+        "wishlist": "guides.wishlist",
+        "availability": "guides.availability",
+        "user_id": "users.id",
+        "name": "users.first_name || ' ' || users.last_name",
+        "profile_pic": "users.profile_pic",
+        "email": "users.email",
+        "phone_number": "users.phone_number",
+    },
+    references={
+        "profile_pic": reference("users.profile_pic"),
+    },
+)
+
+# Served by the (location, price, id), (language, price, id) and (price, id)
+# indexes from migrations/006_service_search.sql.
+GUIDE_SORTS = {
+    "newest": SortOption(None, descending=True),
+    "price_asc": SortOption("guides.price", descending=False),
+    "price_desc": SortOption("guides.price", descending=True),
 }
 
+def row_to_guide(guide: dict) -> GuideResponse:
+    return GuideResponse(
+        id=guide["id"],
+        language=guide["language"],
+        location=guide["location"],
+        preference=guide["preference"],
+        about=guide["about"],
+        price=guide["price"],
+        wishlist=guide["wishlist"],
+        user_id=guide["user_id"],
+        name=guide["first_name"] + " " + guide["last_name"],
+        profile_pic=guide["profile_pic"],
+        email=guide["email"],
+        phone_number=guide["phone_number"],
+        availability=guide["availability"],
+    )
+
+
 @router.post("/guide/create")
 async def create_guide(
     user_id: int = Form(...),
@@ -21,8 +102,12 @@ async def create_guide(
     location: str = Form(...),
     preference: str = Form(...),
     description: Optional[str] = Form(None),
+    latitude: Optional[float] = Form(None, ge=-90, le=90),
+    longitude: Optional[float] = Form(None, ge=-180, le=180),
     document: Optional[UploadFile] = None,
     photo: Optional[UploadFile] = None,
+    conn: AsyncConnection = Depends(get_conn),
+    cur: AsyncCursor = Depends(get_cursor),
 ):
     
     document_path = None
@@ -44,7 +129,7 @@ async def create_guide(
     """
     try:
         
-        cur.execute(
+        await cur.execute(
             query,
             (
                 user_id,
@@ -56,8 +141,13 @@ async def create_guide(
                 photo_path,
             ),
         )
-        guide_id = cur.fetchone()
-        conn.commit()
+        guide_id = await cur.fetchone()
+        if latitude is not None and longitude is not None:
+            await set_coordinates(cur, "guides", guide_id["id"], latitude, longitude)
+        await conn.commit()
+        response_cache.invalidate("guides")
+        if latitude is None or longitude is None:
+            geo_locator.locate_later("guides", guide_id["id"], location)
 
         return JSONResponse(
             content={
@@ -65,9 +155,56 @@ async def create_guide(
                 "guide_id": guide_id,
             },
         )
-    except Exception as e:
-        conn.rollback()
-        print(f"ERROR - DB:\n{e}")
+    except Exception:
+        await conn.rollback()
+        logger.exception("Database error")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=endpoint_errors[500]["description"],
+        )
+
+
+@router.get("/guides/search", response_model=GuidePage, responses=endpoint_errors)
+async def search_guides(
+    location: Optional[str] = None,
+    language: Optional[str] = None,
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    available: Optional[bool] = None,
+    sort: str = "newest",
+    fields: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    cur: AsyncCursor = Depends(get_cursor),
+):
+    """
+    Guides matching all given filters, one page at a time. `sort` is one of
+    newest, price_asc or price_desc; pass the returned `next_cursor` back
+    with the same filters and sort for the next page.
+    """
+    try:
+        selection = GUIDE_FIELDS.select(fields, required=sort_fields(GUIDE_SORTS, sort))
+        query, params = build_search_query(
+            f"SELECT {selection.columns} {GUIDE_FROM}",
+            "guides.id",
+            [
+                ("guides.location = %s", location),
+                ("guides.language = %s", language),
+                ("guides.price >= %s", min_price),
+                ("guides.price <= %s", max_price),
+                ("guides.availability = %s", available),
+            ],
+            GUIDE_SORTS,
+            sort,
+            cursor,
+            limit,
+        )
+        rows, next_cursor = await fetch_search_page(cur, query, params, limit, GUIDE_SORTS, sort)
+        return selection.page("guides", rows, next_cursor)
+    except HTTPException:
+        raise
+    except Exception:
+        logger.exception("Database error")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=endpoint_errors[500]["description"],
@@ -75,7 +212,7 @@ async def create_guide(
 
 
 @router.get("/guides/{guide_id}", response_model=GuideResponse, responses=endpoint_errors)
-async def get_guide(guide_id: int):
+async def get_guide(guide_id: int, cur: AsyncCursor = Depends(get_cursor)):
     try:
         query = """
             SELECT 
@@ -97,31 +234,17 @@ async def get_guide(guide_id: int):
             JOIN users ON guides.user_id = users.id
             WHERE guides.id = %s
         """
-        cur.execute(query, (guide_id,))
-        guide = cur.fetchone()
+        await cur.execute(query, (guide_id,))
+        guide = await cur.fetchone()
         if not guide:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=endpoint_errors[404]["description"],
             )   
         
-        return GuideResponse(
-            id=guide["id"],
-            language=guide["language"],
-            location=guide["location"],
-            preference=guide["preference"],
-            about=guide["about"],
-            price=guide["price"],
-            wishlist=guide["wishlist"],
-            user_id=guide["user_id"],
-            name=guide["first_name"] + " " + guide["last_name"],
-            profile_pic=guide["profile_pic"],
-            email=guide["email"],
-            phone_number=guide["phone_number"],
-            availability=guide["availability"],
-        )
-    except Exception as e:
-        print(f"ERROR - DB:\n{e}")
+        return row_to_guide(guide)
+    except Exception:
+        logger.exception("Database error")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=endpoint_errors[500]["description"],
@@ -129,52 +252,28 @@ async def get_guide(guide_id: int):
 
 
 @router.get("/guides_all", response_model=List[GuideResponse], responses=endpoint_errors)
-async def get_all_guides():
+async def get_all_guides(fields: Optional[str] = None, if_none_match: Optional[str] = Header(None)):
+    """
+    Streamed from a server-side cursor, so the full table is never held in memory.
+    Repeat requests are served from the response cache until a write
+    invalidates it; those carry an ETag, and a matching If-None-Match
+    gets an empty 304.
+
+    `fields` is a comma-separated list of fields to return; only those
+    columns are read. By default all fields are returned, with images only
+    when they are stored as media keys.
+    """
+    selection = GUIDE_FIELDS.select(fields)
+    key = response_cache.key("guides", "all", fields=fields)
+    cached = response_cache.get(key, if_none_match)
+    if cached is not None:
+        return cached
+
     try:
-        query = """
-            SELECT 
-                guides.id,
-                guides.language,
-                guides.location,
-                guides.preference,
-                guides.about,
-                guides.price,
-                guides.wishlist,
-                guides.availability,
-                users.id as user_id,
-                users.first_name,
-                users.last_name,
-                users.profile_pic,
-                users.email,
-                users.phone_number
-            FROM guides JOIN users ON guides.user_id = users.id
-        """
-        # WHERE g.language = %s AND g.price BETWEEN %s AND %s AND g.availability = TRUE
-        # language: str, min_price: float, max_price: float
-        
-        # cur.execute(query, (language, min_price, max_price))
-        cur.execute(query)
-        guides = cur.fetchall()
-        return [
-            GuideResponse(
-                id=guide["id"],
-                language=guide["language"],
-                location=guide["location"],
-                preference=guide["preference"],
-                about=guide["about"],
-                price=guide["price"],
-                wishlist=guide["wishlist"],
-                user_id=guide["user_id"],
-                name=guide["first_name"] + " " + guide["last_name"],
-                profile_pic=guide["profile_pic"],
-                email=guide["email"],
-                phone_number=guide["phone_number"],
-                availability=guide["availability"],
-            )
-            for guide in guides
-        ]
-    except Exception as e:
-        print(f"ERROR - DB:\n{e}")
+        query = f"SELECT {selection.columns} {GUIDE_FROM}"
+        return response_cache.store_stream(key, await stream_json_array(query, serialize=selection.pick))
+    except Exception:
+        logger.exception("Database error")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=endpoint_errors[500]["description"],
@@ -189,6 +288,8 @@ async def update_guide(
     preference: Optional[str] = Form(None),
     about: Optional[str] = Form(None),
     availability: Optional[bool] = Form(None),
+    conn: AsyncConnection = Depends(get_conn),
+    cur: AsyncCursor = Depends(get_cursor),
 ):
     try:
         updates = []
@@ -217,15 +318,19 @@ async def update_guide(
 
         params.append(guide_id)
         query = f"UPDATE guides SET {', '.join(updates)} WHERE id = %s"
-        cur.execute(query, params)
-        conn.commit()
+        await cur.execute(query, params)
+        await conn.commit()
+        response_cache.invalidate("guides", guide_id)
+        if location:
+            # Coordinates follow the new location once it is geocoded
+            geo_locator.locate_later("guides", guide_id, location)
 
         return JSONResponse(
             status_code=status.HTTP_200_OK, content={"message": "Guide updated successfully"}
         )
-    except Exception as e:
-        conn.rollback()
-        print(f"ERROR - DB:\n{e}")
+    except Exception:
+        await conn.rollback()
+        logger.exception("Database error")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=endpoint_errors[500]["description"],
@@ -233,34 +338,39 @@ async def update_guide(
 
 
 @router.delete("/guides/{guide_id}", responses=endpoint_errors)
-async def delete_guide(guide_id: int):
+async def delete_guide(
+    guide_id: int,
+    conn: AsyncConnection = Depends(get_conn),
+    cur: AsyncCursor = Depends(get_cursor),
+):
     try:
         query = "DELETE FROM guides WHERE id = %s"
-        cur.execute(query, (guide_id,))
-        conn.commit()
+        await cur.execute(query, (guide_id,))
+        await conn.commit()
+        response_cache.invalidate("guides", guide_id)
         return JSONResponse(
             status_code=status.HTTP_200_OK, content={"message": "Guide deleted successfully"}
         )
-    except Exception as e:
-        conn.rollback()
-        print(f"ERROR - DB:\n{e}")
+    except Exception:
+        await conn.rollback()
+        logger.exception("Database error")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=endpoint_errors[500]["description"],
         )
     
 @router.get("/guides/status/{user_id}", responses=endpoint_errors)
-async def get_guide_status(user_id: int):
+async def get_guide_status(user_id: int, cur: AsyncCursor = Depends(get_cursor)):
     try:
         query = "SELECT status FROM guides WHERE user_id = %s ORDER BY created_at DESC LIMIT 1"
-        cur.execute(query, (user_id,))
-        guide = cur.fetchone()
+        await cur.execute(query, (user_id,))
+        guide = await cur.fetchone()
         if not guide:
             return {"status": 0}  # User has no vehicle records
 
         return {"status": guide["status"]}
-    except Exception as e:
-        print(f"ERROR - DB:\n{e}")
+    except Exception:
+        logger.exception("Database error")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=endpoint_errors[500]["description"],
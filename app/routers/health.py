@@ -0,0 +1,23 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from app.utils.lifecycle import lifecycle
+
+router = APIRouter()
+
+
+@router.get("/healthz", include_in_schema=False)
+async def healthz():
+    """
+    Liveness: the process is up and serving. Never touches the database.
+    """
+    return {"status": "ok"}
+
+
+@router.get("/readyz", include_in_schema=False)
+async def readyz():
+    """
+    Readiness: 200 once warm-up has finished and the database answers,
+    503 while starting, draining or when the database is unreachable.
+    """
+    readiness = await lifecycle.readiness()
+    return JSONResponse(readiness, status_code=200 if readiness["ready"] else 503)
@@ -1,74 +1,45 @@
-from fastapi import APIRouter, status
-from app.database import cur, conn
+import logging
+from fastapi import APIRouter, HTTPException, Header, Query, status, Depends
+from psycopg import AsyncCursor
+from app.dependencies.database import get_cursor
 from fastapi.responses import JSONResponse
 from app.schemas.error import SimpleErrorMessage
-from typing import List, Optional
-from app.schemas.post import PostResponse
-import datetime
+from typing import Optional
+from app.schemas.post import PostPage
+from app.utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from app.utils.posts import fetch_posts_page
+from app.utils.etag import json_response
 
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 endpoint_errors = {
     500: {"model": SimpleErrorMessage, "description": "Database Error"},
+    400: {"model": SimpleErrorMessage, "description": "Invalid cursor"},
 }
 
-@router.get("/get_all_posts", response_model=List[PostResponse], responses=endpoint_errors)  # type: ignore
-async def get_all_posts():
-    query = b"""
-    SELECT 
-        posts.id, 
-        posts.poster_id, 
-        posts.caption, 
-        posts.images, 
-        posts.video_url, 
-        posts.location, 
-        posts.tagged_users, 
-        posts.created_at, 
-        posts.likes,
-        users.username, 
-        users.profile_pic
-    FROM posts
-    JOIN users ON posts.poster_id = users.id
+@router.get("/get_all_posts", response_model=PostPage, responses=endpoint_errors)  # type: ignore
+async def get_all_posts(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    cur: AsyncCursor = Depends(get_cursor),
+):
+    """
+    Newest posts first, one page at a time. Pass the returned `next_cursor`
+    back as `cursor` to get the following page; it is null on the last page.
+    Pages carry an ETag; an unchanged page is answered with an empty 304.
     """
     try:
-        cur.execute(query)
-        result = cur.fetchall()
-
-        processed_result = []
-        for row in result:
-            # Decode images if present
-            images = row["images"]
-            if images:
-                images = [img.decode("utf-8") if isinstance(img, bytes) else img for img in images]
-            else:
-                images = []
-                
-            created_at = row["created_at"]
-            # Convert created_at to ISO string format
-            created_at_str = created_at.isoformat() if created_at else None
-
-            # Create PostResponse object for each row
-            post_data = PostResponse(
-                id=row["id"],
-                poster_id=row["poster_id"],
-                username=row["username"],
-                profile_pic=row["profile_pic"],
-                caption=row["caption"],
-                images=images,
-                video_url=row.get("video_url"),
-                location=row.get("location"),
-                created_at=created_at_str,
-                likes=row.get("likes", 0)
-            )
-            processed_result.append(post_data)
-
-        return JSONResponse(
-            content=[post.dict() for post in processed_result]
-        )
-    except Exception as e:
-        print(f"ERROR - DB:\n{e}")
+        page = await fetch_posts_page(cur, limit, cursor)
+        return json_response(page.model_dump_json().encode("utf-8"), if_none_match)
+    except HTTPException:
+        raise
+    except Exception:
+        logger.exception("Database error")
         return JSONResponse(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             content={"message": endpoint_errors[500]["description"]},
-        )
\ No newline at end of file
+        )
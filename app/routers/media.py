@@ -0,0 +1,123 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from fastapi.responses import StreamingResponse
+from typing import Optional, Tuple
+from app.config import settings
+from app.schemas.services import DocumentInfo
+from app.schemas.user import CurrentUser
+from app.utils.etag import etag_matches
+from app.utils.media import media_store, is_media_key
+from app.utils.oauth2 import get_admin_user
+from app.utils.pdf_processing import pdf_indexer
+
+router = APIRouter()
+
+endpoint_errors = {
+    404: {"description": "Media not found"},
+    416: {"description": "Requested range not satisfiable"},
+}
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single `bytes=` range into inclusive (start, end) offsets.
+    Returns None when the header should be ignored (multiple ranges or other
+    units) and raises 416 when the range lies outside the blob.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+
+    first, _, last = spec.strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+        else:
+            # Suffix range: the last N bytes
+            start = max(size - int(last), 0)
+            end = size - 1
+    except ValueError:
+        return None
+
+    if start >= size or start > end or start < 0:
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            detail=endpoint_errors[416]["description"],
+            headers={"Content-Range": f"bytes */{size}"},
+        )
+    return start, min(end, size - 1)
+
+
+@router.api_route("/media/{key}", methods=["GET", "HEAD"], responses=endpoint_errors)
+async def get_media(key: str, request: Request):
+    """
+    Stream a stored image or document. Keys are content hashes, so responses
+    are cacheable forever and the key doubles as a strong ETag.
+    """
+    info = await media_store.stat(key) if is_media_key(key) else None
+    if info is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=endpoint_errors[404]["description"],
+        )
+
+    etag = f'"{key.split(".")[0]}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={settings.MEDIA_CACHE_MAX_AGE}, immutable",
+        "Accept-Ranges": "bytes",
+    }
+
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    byte_range = None
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (if_range is None or if_range.strip() == etag):
+        byte_range = parse_range(range_header, info.size)
+
+    if byte_range:
+        start, end = byte_range
+        status_code = status.HTTP_206_PARTIAL_CONTENT
+        headers["Content-Range"] = f"bytes {start}-{end}/{info.size}"
+    else:
+        start, end = 0, info.size - 1
+        status_code = status.HTTP_200_OK
+    headers["Content-Length"] = str(end - start + 1)
+
+    if request.method == "HEAD" or info.size == 0:
+        return Response(status_code=status_code, headers=headers, media_type=info.content_type)
+
+    return StreamingResponse(
+        media_store.iter_range(key, start, end),
+        status_code=status_code,
+        headers=headers,
+        media_type=info.content_type,
+    )
+
+
+@router.get("/media/{key}/document", response_model=DocumentInfo, responses=endpoint_errors)
+async def get_document_info(key: str, admin: CurrentUser = Depends(get_admin_user)):
+    """
+    Page count and text of an uploaded PDF. `status` is "pending" or
+    "parsing" until the background parse has finished.
+
+    Admins only: these are verification documents, and their keys are
+    public in the guide and authority listings.
+    """
+    document = await pdf_indexer.info(key) if is_media_key(key) else None
+    if document is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=endpoint_errors[404]["description"],
+        )
+
+    return DocumentInfo(
+        key=document["media_key"],
+        size=document["size"],
+        status=document["status"],
+        page_count=document["page_count"],
+        text=document["text"],
+        parsed_at=int(document["parsed_at"].timestamp()) if document["parsed_at"] else None,
+    )
@@ -0,0 +1,89 @@
+import heapq
+import logging
+from fastapi import APIRouter, HTTPException, Query, status, Depends
+from psycopg import AsyncCursor
+from app.dependencies.database import get_cursor
+from typing import Callable, Dict, List, Tuple
+from app.config import settings
+from app.schemas.nearby import NearbyResult
+from app.utils.geo import KINDS, find_nearby
+from app.utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from app.utils.posts import row_to_post
+from app.utils.timeline import POST_COLUMNS
+from app.routers.authorities import row_to_authority
+from app.routers.equipments import EQUIPMENT_SELECT, row_to_equipment
+from app.routers.guides import GUIDE_SELECT, row_to_guide
+from app.routers.vehicles import VEHICLE_SELECT, row_to_vehicle
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+endpoint_errors = {
+    500: {"description": "Database Error"},
+    400: {"description": "Unknown kind"},
+}
+
+# How to load the full rows for each kind, given their ids
+LOADERS: Dict[str, Tuple[str, Callable]] = {
+    "vehicles": (f"{VEHICLE_SELECT} WHERE vehicles.id = ANY(%s)", row_to_vehicle),
+    "equipments": (f"{EQUIPMENT_SELECT} WHERE equipments.id = ANY(%s)", row_to_equipment),
+    "guides": (f"{GUIDE_SELECT} WHERE guides.id = ANY(%s)", row_to_guide),
+    "authorities": ("SELECT * FROM authority WHERE id = ANY(%s)", row_to_authority),
+    "posts": (
+        f"SELECT {POST_COLUMNS} FROM posts JOIN users ON posts.poster_id = users.id WHERE posts.id = ANY(%s)",
+        row_to_post,
+    ),
+}
+
+
+@router.get("/nearby", response_model=List[NearbyResult], responses=endpoint_errors)
+async def get_nearby(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    radius_km: float = Query(10, gt=0, le=settings.NEARBY_MAX_RADIUS_KM),
+    kinds: List[str] = Query(["vehicles", "equipments", "guides"]),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cur: AsyncCursor = Depends(get_cursor),
+):
+    """
+    The `limit` nearest services (and/or posts, authorities) within
+    `radius_km` of (lat, lon), closest first. Pick what to search with
+    repeated `kinds` parameters. Only rows with coordinates are found.
+    """
+    unknown = [kind for kind in kinds if kind not in KINDS]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown kind {unknown[0]!r}, expected one of: {', '.join(KINDS)}",
+        )
+
+    try:
+        # Each kind is an index-ordered scan of at most `limit` rows; keep
+        # the overall nearest `limit`.
+        candidates = []
+        for kind in dict.fromkeys(kinds):
+            for row_id, distance in await find_nearby(cur, kind, lat, lon, radius_km * 1000, limit):
+                candidates.append((distance, kind, row_id))
+        nearest = heapq.nsmallest(limit, candidates)
+
+        items = {}
+        for kind in {kind for _, kind, _ in nearest}:
+            query, serialize = LOADERS[kind]
+            await cur.execute(query, ([row_id for _, k, row_id in nearest if k == kind],))
+            for row in await cur.fetchall():
+                items[kind, row["id"]] = serialize(row)
+
+        return [
+            NearbyResult(kind=kind, id=row_id, distance_m=distance, item=items[kind, row_id])
+            for distance, kind, row_id in nearest
+            if (kind, row_id) in items
+        ]
+    except HTTPException:
+        raise
+    except Exception:
+        logger.exception("Database error")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=endpoint_errors[500]["description"],
+        )
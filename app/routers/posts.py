@@ -1,13 +1,23 @@
-from fastapi import APIRouter, UploadFile, Form, HTTPException, File, status
-from app.database import cur, conn
+import logging
+from fastapi import APIRouter, UploadFile, Form, HTTPException, File, Query, status, Depends
+from psycopg import AsyncConnection, AsyncCursor
+from app.dependencies.database import get_conn, get_cursor
 from app.utils.image_processing import process_images
 from fastapi.responses import JSONResponse
 from app.schemas.error import SimpleErrorMessage
 from typing import List, Optional
-from app.schemas.post import PostResponse
+from app.schemas.post import PostResponse, PostPage, LikeRequest
+from app.utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from app.utils.posts import fetch_posts_page
+from app.utils.likes import like_counter
+from app.utils.timeline import fan_out_post
+from app.utils.geo import geo_locator, set_coordinates
+import psycopg
 import datetime
 
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 endpoint_errors = {
@@ -20,7 +30,11 @@ async def create_post(
     caption: Optional[str] = Form(None),
     video_url: Optional[str] = Form(None),
     location: Optional[str] = Form(None),
+    latitude: Optional[float] = Form(None, ge=-90, le=90),
+    longitude: Optional[float] = Form(None, ge=-180, le=180),
     images: List[UploadFile] = File(...),
+    conn: AsyncConnection = Depends(get_conn),
+    cur: AsyncCursor = Depends(get_cursor),
 ):
 
     # Process images
@@ -31,7 +45,7 @@ async def create_post(
     try:
         # Use the resized image in the query
         # images_array = "{" + ",".join([f'"{img}"' for img in processed_images]) + "}"
-        cur.execute(
+        await cur.execute(
             query,
             (
                 poster_id,
@@ -41,17 +55,24 @@ async def create_post(
                 location,
             ),
         )
-        post_id = cur.fetchone()  # type: ignore
-        conn.commit()
+        post_id = await cur.fetchone()  # type: ignore
+
+        # Push the post into followers' timelines in the same transaction
+        await fan_out_post(cur, post_id["id"], poster_id)
+        if latitude is not None and longitude is not None:
+            await set_coordinates(cur, "posts", post_id["id"], latitude, longitude)
+        await conn.commit()
+        if latitude is None or longitude is None:
+            geo_locator.locate_later("posts", post_id["id"], location)
         return JSONResponse(
             content={
                 "message": "Post created successfully",
                 "post_id": post_id,
             },
         )
-    except Exception as e:
-        conn.rollback()  # Rollback in case of any exception
-        print(f"ERROR - DB:\n{e}")
+    except Exception:
+        await conn.rollback()  # Rollback in case of any exception
+        logger.exception("Database error")
         return JSONResponse(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             content={"message": endpoint_errors[500]["description"]},
@@ -65,83 +86,128 @@ endpoint_status_codes = {
 }
 
 
-@router.put("/posts/like/{post_id}", responses=endpoint_status_codes)  # type: ignore
-async def like_post(post_id: int):
-    query = b"SELECT * FROM posts WHERE id = %s"
+async def current_likes(cur: AsyncCursor, post_id: int) -> Optional[int]:
+    """
+    Like count as seen by this worker: the stored counter plus deltas that
+    haven't been flushed yet. None if the post doesn't exist.
+    """
+    await cur.execute(b"SELECT likes FROM posts WHERE id = %s", (post_id,))
+    result = await cur.fetchone()
+    if not result:
+        return None
+    return (result["likes"] or 0) + like_counter.pending(post_id)
+
+
+@router.post("/posts/like", responses=endpoint_status_codes)  # type: ignore
+async def like_post(
+    request: LikeRequest,
+    conn: AsyncConnection = Depends(get_conn),
+    cur: AsyncCursor = Depends(get_cursor),
+):
+    """
+    Like a post as `user_id`. Idempotent: liking twice counts once.
+    """
+    query = b"""
+    INSERT INTO post_likes (post_id, user_id) VALUES (%s, %s)
+    ON CONFLICT (post_id, user_id) DO NOTHING
+    """
     try:
-        cur.execute(query, (post_id,))
-        result = cur.fetchone()
-        if result:
-            likes = result["likes"] + 1  # type: ignore
-            query = b"UPDATE posts SET likes = %s WHERE id = %s"
-            cur.execute(query, (likes, post_id))
-            conn.commit()
-            return JSONResponse(
-                status_code=status.HTTP_200_OK,
-                content={
-                    "message": endpoint_status_codes[200]["description"],
-                    "likes": likes,
-                },
-            )
-        else:
+        await cur.execute(query, (request.post_id, request.user_id))
+        liked = cur.rowcount == 1
+        await conn.commit()
+        if liked:
+            like_counter.add(request.post_id, 1)
+
+        return JSONResponse(
+            status_code=status.HTTP_200_OK,
+            content={
+                "message": endpoint_status_codes[200]["description"],
+                "liked": True,
+                "likes": await current_likes(cur, request.post_id),
+            },
+        )
+    except psycopg.errors.ForeignKeyViolation:
+        await conn.rollback()
+        return JSONResponse(
+            status_code=status.HTTP_404_NOT_FOUND,
+            content={"message": endpoint_status_codes[404]["description"]},
+        )
+    except Exception:
+        await conn.rollback()
+        logger.exception("Database error")
+        return JSONResponse(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            content={"message": endpoint_errors[500]["description"]},
+        )
+
+
+@router.post("/posts/unlike", responses=endpoint_status_codes)  # type: ignore
+async def unlike_post(
+    request: LikeRequest,
+    conn: AsyncConnection = Depends(get_conn),
+    cur: AsyncCursor = Depends(get_cursor),
+):
+    """
+    Remove `user_id`'s like from a post. Idempotent: unliking a post that
+    isn't liked is a no-op.
+    """
+    query = b"DELETE FROM post_likes WHERE post_id = %s AND user_id = %s"
+    try:
+        await cur.execute(query, (request.post_id, request.user_id))
+        unliked = cur.rowcount == 1
+        await conn.commit()
+        if unliked:
+            like_counter.add(request.post_id, -1)
+
+        likes = await current_likes(cur, request.post_id)
+        if likes is None:
             return JSONResponse(
                 status_code=status.HTTP_404_NOT_FOUND,
                 content={"message": endpoint_status_codes[404]["description"]},
             )
-    except Exception as e:
-        print(f"ERROR - DB:\n{e}")
+        return JSONResponse(
+            status_code=status.HTTP_200_OK,
+            content={"message": "Post unliked", "liked": False, "likes": likes},
+        )
+    except Exception:
+        await conn.rollback()
+        logger.exception("Database error")
         return JSONResponse(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             content={"message": endpoint_errors[500]["description"]},
         )
 
 
+@router.put("/posts/like/{post_id}", responses=endpoint_status_codes)  # type: ignore
+async def like_post_legacy(
+    post_id: int,
+    user_id: int = Query(...),
+    conn: AsyncConnection = Depends(get_conn),
+    cur: AsyncCursor = Depends(get_cursor),
+):
+    """
+    Legacy path of POST /posts/like, kept for older app versions. Likes are
+    per user here too, so `user_id` is required.
+    """
+    return await like_post(LikeRequest(post_id=post_id, user_id=user_id), conn, cur)
 
-@router.get("/posts/get_all", response_model=List[PostResponse], responses=endpoint_errors)  # type: ignore
-async def get_all_posts():
-    query = b"SELECT * FROM posts"
-    try:
-        cur.execute(query)
-        result = cur.fetchall()
-        processed_result = []
-        if result:
-            for row in result:
-                # Decode images if present
-                images = row["images"]
-                if images:
-                    images = [img.decode("utf-8") if isinstance(img, bytes) else img for img in images]
-                else:
-                    images = []
-                    
-                created_at = row["created_at"]
-                # Convert created_at to ISO string format
-                created_at_str = created_at.isoformat() if created_at else None
-
-                # Create PostResponse object for each row
-                post_data = PostResponse(
-                    id=row["id"],
-                    poster_id=row["poster_id"],
-                    caption=row["caption"],
-                    images=images,
-                    video_url=row.get("video_url"),
-                    location=row.get("location"),
-                    tagged_users=row.get("tagged_users", []),
-                    created_at=created_at_str,
-                    likes=row.get("likes", 0)
-                )
-                processed_result.append(post_data)
-                print(processed_result)
 
-            return JSONResponse(
-                content=[post.dict() for post in processed_result]
-            )
-        else:
-            return JSONResponse(
-                status_code=status.HTTP_200_OK,
-                content={"message": "No posts found"},
-            )
-    except Exception as e:
-        print(f"ERROR - DB:\n{e}")
+@router.get("/posts/get_all", response_model=PostPage, responses=endpoint_errors)  # type: ignore
+async def get_all_posts(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    cur: AsyncCursor = Depends(get_cursor),
+):
+    """
+    Keyset-paginated listing of all posts, newest first.
+    """
+    try:
+        page = await fetch_posts_page(cur, limit, cursor)
+        return JSONResponse(content=page.dict())
+    except HTTPException:
+        raise
+    except Exception:
+        logger.exception("Database error")
         return JSONResponse(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             content={"message": endpoint_errors[500]["description"]},
@@ -149,11 +215,11 @@ async def get_all_posts():
 
 
 @router.get("/posts/{post_id}", response_model=PostResponse, responses=endpoint_errors)  # type: ignore
-async def get_post(post_id: int):
+async def get_post(post_id: int, cur: AsyncCursor = Depends(get_cursor)):
     query = b"SELECT * FROM posts WHERE id = %s"
     try:
-        cur.execute(query, (post_id,))
-        result = cur.fetchone()
+        await cur.execute(query, (post_id,))
+        result = await cur.fetchone()
 
         if result:
             # Decode images if present
@@ -186,8 +252,8 @@ async def get_post(post_id: int):
                 status_code=status.HTTP_200_OK,
                 detail="Post not found"
             )
-    except Exception as e:
-        print(f"ERROR - DB:\n{e}")
+    except Exception:
+        logger.exception("Database error")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=endpoint_errors[500]["description"]
@@ -1,5 +1,7 @@
-from fastapi import APIRouter, HTTPException, Form, File, UploadFile, status
-from app.database import cur, conn
+import logging
+from fastapi import APIRouter, HTTPException, Header, Form, File, UploadFile, status, Depends
+from psycopg import AsyncConnection, AsyncCursor
+from app.dependencies.database import get_conn, get_cursor
 from app.schemas.user import Profile
 from fastapi.responses import JSONResponse
 from app.schemas.error import SimpleErrorMessage
@@ -10,8 +12,15 @@ import io
 import psycopg
 from app.utils.image_processing import process_images
 from app.schemas.post import PostResponse
+from app.utils.posts import POST_FIELDS
+from app.utils.streaming import stream_json_array
+from app.utils.oauth2 import invalidate_user
+from app.utils.response_cache import response_cache
+from app.utils.etag import json_response
 from typing import List, Optional
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 endpoint_errors = {
@@ -26,12 +35,12 @@ endpoint_errors = {
     },
     response_model= Profile,  # Specify that the response will be of type Profile
 )
-async def get_profile(user_id: int ):
+async def get_profile(user_id: int, if_none_match: Optional[str] = Header(None), cur: AsyncCursor = Depends(get_cursor)):
     query = "SELECT * FROM users WHERE id = %s"
     try:
         # Check if the database connection and cursor are set up correctly
-        cur.execute(query, (user_id,))
-        result = cur.fetchone()
+        await cur.execute(query, (user_id,))
+        result = await cur.fetchone()
 
         date_of_birth_str = (
             result["date_of_birth"].strftime("%Y-%m-%d")
@@ -56,20 +65,19 @@ async def get_profile(user_id: int ):
                 bio=result["bio"],
                 type=result["type"]
             )
-            return JSONResponse(
-                content=profile.dict()
-            )  # Convert Profile instance to a dict for JSON response
+            # With an ETag, so an unchanged profile costs an empty 304
+            return json_response(profile.model_dump_json().encode("utf-8"), if_none_match)
         else:
             raise HTTPException(status_code=404, detail="Profile not found")
 
-    except psycopg.Error as db_error:
-        print(f"Database Error: {db_error}")
+    except psycopg.Error:
+        logger.exception("Database error")
         raise HTTPException(
             status_code=500,
             detail="Database query failed. Please check logs for details.",
         )
-    except Exception as e:
-        print(f"Unexpected Error: {e}")
+    except Exception:
+        logger.exception("Unexpected error")
         raise HTTPException(status_code=500, detail="An unexpected error occurred.")
 
 
@@ -82,8 +90,14 @@ async def update_profile(
     dateOfBirth: Optional[str] = Form(None),
     profilePic: Optional[UploadFile] = File(None),
     bio: Optional[str] = Form(None),
+    conn: AsyncConnection = Depends(get_conn),
+    cur: AsyncCursor = Depends(get_cursor),
 ):
     try:
+        # The user cache is keyed by email, which this update may change
+        await cur.execute(b"SELECT email FROM users WHERE id = %s FOR UPDATE", (id,))
+        current = await cur.fetchone()
+
         # Update the profile picture if provided
         if profilePic:
             processed_images = await process_images([profilePic])
@@ -94,7 +108,7 @@ async def update_profile(
             query = b"""UPDATE users
                         SET username = %s, email = %s, phone_number = %s, date_of_birth = %s, profile_pic = %s, bio =%s
                         WHERE id = %s"""
-            cur.execute(
+            await cur.execute(
                 query,
                 (
                     username,
@@ -111,7 +125,7 @@ async def update_profile(
             query = b"""UPDATE users
                         SET username = %s, email = %s, phone_number = %s, date_of_birth = %s, bio =%s
                         WHERE id = %s"""
-            cur.execute(
+            await cur.execute(
                 query,
                 (
                     username,
@@ -123,83 +137,40 @@ async def update_profile(
                 ),
             )
 
-        conn.commit()
+        await conn.commit()
+        if current:
+            invalidate_user(current["email"])
+        invalidate_user(email)
+        # Catalog responses embed the owner's contact details
+        response_cache.clear()
         return JSONResponse(content={"message": "Profile updated successfully"})
-    except Exception as e:
-        conn.rollback()  # Rollback in case of any exception
-        print(f"ERROR - DB:\n{e}")
+    except Exception:
+        await conn.rollback()  # Rollback in case of any exception
+        logger.exception("Database error")
         return JSONResponse(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             content={"message": endpoint_errors[500]["description"]},
         )
         
 @router.get("/profile/posts/{poster_id}", response_model=List[PostResponse], responses=endpoint_errors)
-async def get_posts_by_user(poster_id: int):
+async def get_posts_by_user(poster_id: int, fields: Optional[str] = None):
     """
-    Retrieve all posts created by a specific user.
+    Retrieve all posts created by a specific user, streamed from a server-side cursor.
+
+    `fields` is a comma-separated list of fields to return; only those
+    columns are read. By default all fields are returned, with images only
+    when they are stored as media keys.
     """
-    query = b"""SELECT 
-        posts.id, 
-        posts.poster_id, 
-        posts.caption, 
-        posts.images, 
-        posts.video_url, 
-        posts.location, 
-        posts.tagged_users, 
-        posts.created_at, 
-        posts.likes,
-        users.username, 
-        users.profile_pic
+    selection = POST_FIELDS.select(fields)
+    query = f"""SELECT {selection.columns}
     FROM posts
-    JOIN users ON posts.poster_id = users.id WHERE poster_id = %s"""
+    JOIN users ON posts.poster_id = users.id WHERE poster_id = %s
+    ORDER BY posts.created_at DESC, posts.id DESC"""
     try:
-        cur.execute(query, (poster_id,))
-        result = cur.fetchall()
-
-        if not result:
-            return JSONResponse(
-                status_code=status.HTTP_404_NOT_FOUND,
-                content={"message": "No posts found for this user"},
-            )
-
-        processed_result = []
-        for row in result:
-            # Decode images if present
-            images = row["images"]
-            if images:
-                images = [img.decode("utf-8") if isinstance(img, bytes) else img for img in images]
-            else:
-                images = []
-
-            created_at = row["created_at"]
-            # Convert created_at to ISO string format
-            created_at_str = created_at.isoformat() if created_at else None
-            
-            # Create PostResponse object for each row
-            post_data = PostResponse(
-                id=row["id"],
-                poster_id=row["poster_id"],
-                username=row["username"],
-                profile_pic=row["profile_pic"],
-                caption=row["caption"],
-                images=images,
-                video_url=row.get("video_url"),
-                location=row.get("location"),
-                created_at=created_at_str,
-                likes=row.get("likes", 0)
-            )
-            processed_result.append(post_data)
-
-        return JSONResponse(
-            content=[post.dict() for post in processed_result],
-            status_code=status.HTTP_200_OK,
-        )
-
-    except Exception as e:
-        print(f"ERROR - DB:\n{e}")
+        return await stream_json_array(query, (poster_id,), serialize=selection.pick)
+    except Exception:
+        logger.exception("Database error")
         return JSONResponse(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             content={"message": endpoint_errors[500]["description"]},
-        )    
-
-
+        )
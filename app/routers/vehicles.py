@@ -1,20 +1,103 @@
-from fastapi import APIRouter, UploadFile, Form, HTTPException, File, status
-from app.database import cur, conn
+import logging
+from fastapi import APIRouter, UploadFile, Form, HTTPException, File, Query, status, Depends, Header
+from psycopg import AsyncConnection, AsyncCursor
+from app.dependencies.database import get_conn, get_cursor
+from app.database import pool
 from fastapi.responses import JSONResponse
 from typing import List, Optional
-from app.schemas.services import VehicleResponse, CreateVehicleRequest
+from app.schemas.services import VehicleResponse, VehiclePage, CreateVehicleRequest
 import os
 from app.utils.image_processing import process_images
 from app.utils.pdf_processing import process_pdf
+from app.utils.streaming import stream_json_array
+from app.utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from app.utils.search import SortOption, build_search_query, fetch_search_page, sort_fields
+from app.utils.projection import Projection, reference
+from app.utils.geo import geo_locator, set_coordinates
+from app.utils.response_cache import response_cache
 
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 endpoint_errors = {
     500: {"description": "Database Error"},
     404: {"description": "Vehicle not found"},
+    400: {"description": "Invalid cursor or sort"},
+}
+
+VEHICLE_FROM = "FROM vehicles JOIN users ON vehicles.owner_id = users.id"
+
+VEHICLE_SELECT = f"""
+    SELECT 
+        vehicles.id,
+        vehicles.owner_id,
+        vehicles.type,
+        vehicles.capacity,
+        vehicles.milage,
+        vehicles.location,
+        vehicles.description,
+        vehicles.price,
+        vehicles.wishlist,
+        vehicles.photo_path,
+        users.first_name,
+        users.last_name,
+        users.email,
+        users.phone_number
+    {VEHICLE_FROM}
+"""
+
+# Listing fields, for `fields=` and the lean default (blobs only when they
+# are media keys or URLs; see app/utils/projection.py).
+VEHICLE_FIELDS = Projection(
+    columns={
+        "id": "vehicles.id",
+        "owner_id": "vehicles.owner_id",
+        "type": "vehicles.type",
+        "capacity": "vehicles.capacity",
+        "milage": "vehicles.milage",
+        "location": "vehicles.location",
+        "description": "vehicles.description",
+        "price": "vehicles.price",
+        "wishlist": "vehicles.wishlist",
+        "photo_path": "vehicles.photo_path",
+        "name": "users.first_name || ' ' || users.last_name",
+        "email": "users.email",
+        "phone_number": "users.phone_number",
+    },
+    references={
+        "photo_path": reference("vehicles.photo_path"),
+    },
+)
+
+# Served by the (location, price, id), (type, price, id), (price, id) and
+# (capacity, id) indexes from migrations/006_service_search.sql.
+VEHICLE_SORTS = {
+    "newest": SortOption(None, descending=True),
+    "price_asc": SortOption("vehicles.price", descending=False),
+    "price_desc": SortOption("vehicles.price", descending=True),
+    "capacity_desc": SortOption("vehicles.capacity", descending=True, type=int),
 }
 
+def row_to_vehicle(vehicle: dict) -> VehicleResponse:
+    return VehicleResponse(
+        id=vehicle["id"],
+        owner_id=vehicle["owner_id"],
+        type=vehicle["type"],
+        capacity=vehicle["capacity"],
+        milage=vehicle["milage"],
+        location=vehicle["location"],
+        price=vehicle["price"],
+        description=vehicle["description"],
+        wishlist=vehicle["wishlist"],
+        photo_path=vehicle["photo_path"], 
+        email=vehicle["email"],
+        phone_number=vehicle["phone_number"],           
+        name=vehicle["first_name"] + " " + vehicle["last_name"],
+    )
+
+
 @router.post("/vehicle/create")
 async def create_vehicle(
     owner_id: int = Form(...),
@@ -24,8 +107,12 @@ async def create_vehicle(
     milage: float = Form(...),
     price: float = Form(...),
     description: Optional[str] = Form(None),
+    latitude: Optional[float] = Form(None, ge=-90, le=90),
+    longitude: Optional[float] = Form(None, ge=-180, le=180),
     document: Optional[UploadFile] = None,
     photo: Optional[UploadFile] = None,
+    conn: AsyncConnection = Depends(get_conn),
+    cur: AsyncCursor = Depends(get_cursor),
 ):
     os.makedirs("uploads", exist_ok=True)
     
@@ -48,7 +135,7 @@ async def create_vehicle(
     """
     
     try:
-        cur.execute(
+        await cur.execute(
             query,
             (
                 owner_id,
@@ -59,10 +146,16 @@ async def create_vehicle(
                 description or None,
                 document_path or None,
                 photo_path or None,
+                location,
             ),
         )
-        vehicle_id = cur.fetchone()
-        conn.commit()
+        vehicle_id = await cur.fetchone()
+        if latitude is not None and longitude is not None:
+            await set_coordinates(cur, "vehicles", vehicle_id["id"], latitude, longitude)
+        await conn.commit()
+        response_cache.invalidate("vehicles")
+        if latitude is None or longitude is None:
+            geo_locator.locate_later("vehicles", vehicle_id["id"], location)
 
         return JSONResponse(
             content={
@@ -70,112 +163,117 @@ async def create_vehicle(
                 "vehicle_id": vehicle_id,
             },
         )
-    except Exception as e:
-        conn.rollback()
-        print(f"ERROR - DB:\n{e}")
+    except Exception:
+        await conn.rollback()
+        logger.exception("Database error")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=endpoint_errors[500]["description"],
         )
 
 
-@router.get("/vehicles/{vehicle_id}", response_model=VehicleResponse, responses=endpoint_errors)
-async def get_vehicle(vehicle_id: int):
+@router.get("/vehicles/all", response_model=List[VehicleResponse], responses=endpoint_errors)
+async def get_all_vehicles(fields: Optional[str] = None, if_none_match: Optional[str] = Header(None)):
+    """
+    Streamed from a server-side cursor, so the full table is never held in memory.
+    Repeat requests are served from the response cache until a write
+    invalidates it; those carry an ETag, and a matching If-None-Match
+    gets an empty 304.
+
+    `fields` is a comma-separated list of fields to return; only those
+    columns are read. By default all fields are returned, with images only
+    when they are stored as media keys.
+    """
+    selection = VEHICLE_FIELDS.select(fields)
+    key = response_cache.key("vehicles", "all", fields=fields)
+    cached = response_cache.get(key, if_none_match)
+    if cached is not None:
+        return cached
+
     try:
-        query = """
-            SELECT 
-                vehicles.id,
-                vehicles.owner_id,
-                vehicles.type,
-                vehicles.capacity,
-                vehicles.milage,
-                vehicles.location,
-                vehicles.description,
-                vehicles.price,
-                vehicles.wishlist,
-                vehicles.photo_path,
-                users.first_name,
-                users.last_name,
-                users.email,
-                users.phone_number
-            FROM vehicles
-            JOIN users ON vehicles.owner_id = users.id
-            WHERE vehicles.id = %s
-        """
-        cur.execute(query, (vehicle_id,))
-        vehicle = cur.fetchone()
-        if not vehicle:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=endpoint_errors[404]["description"],
-            )
-        return VehicleResponse(
-            id=vehicle["id"],
-            owner_id=vehicle["owner_id"],
-            type=vehicle["type"],
-            capacity=vehicle["capacity"],
-            milage=vehicle["milage"],
-            location=vehicle["location"],
-            price=vehicle["price"],
-            description=vehicle["description"],
-            wishlist=vehicle["wishlist"],
-            photo_path=vehicle["photo_path"], 
-            email=vehicle["email"],
-            phone_number=vehicle["phone_number"],           
-            name=vehicle["first_name"] + " " + vehicle["last_name"],
+        query = f"SELECT {selection.columns} {VEHICLE_FROM}"
+        return response_cache.store_stream(key, await stream_json_array(query, serialize=selection.pick))
+    except Exception:
+        logger.exception("Database error")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=endpoint_errors[500]["description"],
+        )
 
+
+@router.get("/vehicles/search", response_model=VehiclePage, responses=endpoint_errors)
+async def search_vehicles(
+    location: Optional[str] = None,
+    type: Optional[str] = None,
+    min_capacity: Optional[int] = Query(None, ge=0),
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    sort: str = "newest",
+    fields: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    cur: AsyncCursor = Depends(get_cursor),
+):
+    """
+    Vehicles matching all given filters, one page at a time. `sort` is one
+    of newest, price_asc, price_desc or capacity_desc; pass the returned
+    `next_cursor` back with the same filters and sort for the next page.
+    `fields` selects the returned fields, as for the full listing.
+    """
+    try:
+        selection = VEHICLE_FIELDS.select(fields, required=sort_fields(VEHICLE_SORTS, sort))
+        query, params = build_search_query(
+            f"SELECT {selection.columns} {VEHICLE_FROM}",
+            "vehicles.id",
+            [
+                ("vehicles.location = %s", location),
+                ("vehicles.type = %s", type),
+                ("vehicles.capacity >= %s", min_capacity),
+                ("vehicles.price >= %s", min_price),
+                ("vehicles.price <= %s", max_price),
+            ],
+            VEHICLE_SORTS,
+            sort,
+            cursor,
+            limit,
         )
-    except Exception as e:
-        print(f"ERROR - DB:\n{e}")
+        rows, next_cursor = await fetch_search_page(cur, query, params, limit, VEHICLE_SORTS, sort)
+        return selection.page("vehicles", rows, next_cursor)
+    except HTTPException:
+        raise
+    except Exception:
+        logger.exception("Database error")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=endpoint_errors[500]["description"],
         )
 
 
-@router.get("/vehicles/all", response_model=List[VehicleResponse], responses=endpoint_errors)
-async def get_all_vehicles():
+@router.get("/vehicles/{vehicle_id}", response_model=VehicleResponse, responses=endpoint_errors)
+async def get_vehicle(vehicle_id: int):
+    """
+    Served from the response cache when possible; only a miss checks out a
+    DB connection.
+    """
+    key = response_cache.key("vehicles", "get_vehicle", vehicle_id)
+    cached = response_cache.get(key)
+    if cached is not None:
+        return cached
+
     try:
-        query = """
-            SELECT 
-                vehicles.id,
-                vehicles.owner_id,
-                vehicles.type,
-                vehicles.capacity,
-                vehicles.milage,
-                vehicles.location,
-                vehicles.description,
-                vehicles.price,
-                vehicles.wishlist,
-                vehicles.photo_path,
-                users.first_name,
-                users.last_name,
-                users.email,
-                users.phone_number
-            FROM vehicles JOIN users ON vehicles.owner_id = users.id
-        """
-        cur.execute(query)
-        vehicles = cur.fetchall()
-        return [
-            VehicleResponse(
-                id=vehicle["id"],
-                owner_id=vehicle["owner_id"],
-                type=vehicle["type"],
-                capacity=vehicle["capacity"],
-                milage=vehicle["milage"],
-                location=vehicle["location"],
-                price=vehicle["price"],
-                description=vehicle["description"],
-                wishlist=vehicle["wishlist"],
-                photo_path=vehicle["photo_path"], 
-                email=vehicle["email"],
-                phone_number=vehicle["phone_number"],           
-                name=vehicle["first_name"] + " " + vehicle["last_name"],
+        async with pool.connection() as conn:
+            cur = await conn.execute(f"{VEHICLE_SELECT} WHERE vehicles.id = %s", (vehicle_id,))
+            vehicle = await cur.fetchone()
+        if not vehicle:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=endpoint_errors[404]["description"],
             )
-            for vehicle in vehicles
-        ]
-    except Exception as e:
-        print(f"ERROR - DB:\n{e}")
+        return response_cache.store(key, row_to_vehicle(vehicle).model_dump_json().encode("utf-8"))
+    except HTTPException:
+        raise
+    except Exception:
+        logger.exception("Database error")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=endpoint_errors[500]["description"],
@@ -190,6 +288,8 @@ async def update_vehicle(
     milage: Optional[float] = Form(None),
     price: Optional[float] = Form(None),
     description: Optional[str] = Form(None),
+    conn: AsyncConnection = Depends(get_conn),
+    cur: AsyncCursor = Depends(get_cursor),
 ):
     try:
         updates = []
@@ -218,15 +318,16 @@ async def update_vehicle(
 
         params.append(vehicle_id)
         query = f"UPDATE vehicles SET {', '.join(updates)} WHERE id = %s"
-        cur.execute(query, params)
-        conn.commit()
+        await cur.execute(query, params)
+        await conn.commit()
+        response_cache.invalidate("vehicles", vehicle_id)
 
         return JSONResponse(
             status_code=status.HTTP_200_OK, content={"message": "Vehicle updated successfully"}
         )
-    except Exception as e:
-        conn.rollback()
-        print(f"ERROR - DB:\n{e}")
+    except Exception:
+        await conn.rollback()
+        logger.exception("Database error")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=endpoint_errors[500]["description"],
@@ -234,39 +335,44 @@ async def update_vehicle(
 
 
 @router.delete("/vehicles/{vehicle_id}", responses=endpoint_errors)
-async def delete_vehicle(vehicle_id: int):
+async def delete_vehicle(
+    vehicle_id: int,
+    conn: AsyncConnection = Depends(get_conn),
+    cur: AsyncCursor = Depends(get_cursor),
+):
     try:
         query = "DELETE FROM vehicles WHERE id = %s"
-        cur.execute(query, (vehicle_id,))
-        conn.commit()
+        await cur.execute(query, (vehicle_id,))
+        await conn.commit()
+        response_cache.invalidate("vehicles", vehicle_id)
         return JSONResponse(
             status_code=status.HTTP_200_OK, content={"message": "Vehicle deleted successfully"}
         )
-    except Exception as e:
-        conn.rollback()
-        print(f"ERROR - DB:\n{e}")
+    except Exception:
+        await conn.rollback()
+        logger.exception("Database error")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=endpoint_errors[500]["description"],
         )
     
 @router.get("/vehicles/status/{owner_id}", responses=endpoint_errors)
-async def check_vehicle_status(owner_id: int):
+async def check_vehicle_status(owner_id: int, cur: AsyncCursor = Depends(get_cursor)):
     try:
         query = """
         SELECT status FROM vehicles
         WHERE owner_id = %s
         ORDER BY created_at DESC LIMIT 1
         """
-        cur.execute(query, (owner_id,))
-        result = cur.fetchone()
+        await cur.execute(query, (owner_id,))
+        result = await cur.fetchone()
 
         if not result:
             return {"status": 0} 
 
         return {"status": result["status"]}
-    except Exception as e:
-        print(f"ERROR - DB:\n{e}")
+    except Exception:
+        logger.exception("Database error")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=endpoint_errors[500]["description"],
@@ -0,0 +1,9 @@
+from pydantic import BaseModel
+from typing import Optional
+
+class SlowQuery(BaseModel):
+    at: str
+    duration_ms: float
+    query: str  # normalized: literals replaced by ?
+    params: str  # parameter types only
+    plan: Optional[str] = None
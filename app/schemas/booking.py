@@ -1,5 +1,6 @@
 from pydantic import BaseModel
-from typing import Optional
+from datetime import date
+from typing import List, Optional
 
 class BookingRequest(BaseModel):
     type: str
@@ -17,3 +18,20 @@ class BookingRequest(BaseModel):
 
 class BookingResponse(BookingRequest):
     id: int
+
+class BookedInterval(BaseModel):
+    booking_id: int
+    start: date
+    end: date
+
+class DateInterval(BaseModel):
+    start: date
+    end: date
+
+class Availability(BaseModel):
+    type: str
+    item_id: int
+    start: date
+    end: date
+    booked: List[BookedInterval]
+    free: List[DateInterval]
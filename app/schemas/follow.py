@@ -1,9 +1,22 @@
-from pydantic import BaseModel
-from typing import List
+from pydantic import BaseModel, Field
+from typing import Dict, List
 
 class FollowRequest(BaseModel):
     user_id: int
     follower_id: int
 
 class UserListResponse(BaseModel):
-    users: List[int]
\ No newline at end of file
+    users: List[int]
+
+class FollowCountsResponse(BaseModel):
+    user_id: int
+    following: int
+    followers: int
+
+class FollowCheckRequest(BaseModel):
+    user_id: int
+    target_ids: List[int] = Field(..., max_length=1000)
+
+class FollowCheckResponse(BaseModel):
+    user_id: int
+    following: Dict[int, bool]
@@ -0,0 +1,10 @@
+from pydantic import BaseModel
+from typing import Union
+from app.schemas.post import PostResponse
+from app.schemas.services import AuthorityResponse, EquipmentResponse, GuideResponse, VehicleResponse
+
+class NearbyResult(BaseModel):
+    kind: str
+    id: int
+    distance_m: float
+    item: Union[VehicleResponse, EquipmentResponse, GuideResponse, AuthorityResponse, PostResponse]
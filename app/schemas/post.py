@@ -24,3 +24,11 @@ class PostResponse(BaseModel):
     profile_pic: Optional[str]
 
 
+class PostPage(BaseModel):
+    posts: List[PostResponse]
+    next_cursor: Optional[str] = None
+
+
+class LikeRequest(BaseModel):
+    post_id: int
+    user_id: int
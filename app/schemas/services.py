@@ -6,6 +6,14 @@ class DocumentResponse(BaseModel):
     text: Optional[str]
     base64_pdf: Optional[str]
 
+class DocumentInfo(BaseModel):
+    key: str
+    size: int
+    status: str  # pending, parsing, parsed or failed
+    page_count: Optional[int] = None
+    text: Optional[str] = None
+    parsed_at: Optional[int] = None
+
 class GuideResponse(BaseModel):
     id: int
     user_id: int
@@ -21,6 +29,10 @@ class GuideResponse(BaseModel):
     phone_number: Optional[int]
     availability: Optional[bool]
 
+class GuidePage(BaseModel):
+    guides: List[GuideResponse]
+    next_cursor: Optional[str] = None
+
 class CreateGuideRequest(BaseModel):
     name: str
     language: str
@@ -33,10 +45,21 @@ class EquipmentResponse(BaseModel):
     owner_id: int
     type: str
     description: Optional[str]
-    price_per_day: float
-    condition: str
+    price_per_day: Optional[float] = None
+    condition: Optional[str] = None
     photo_path: Optional[str]
-    created_at: int
+    quantity: Optional[int] = None
+    location: Optional[str] = None
+    wishlist: Optional[List[int]] = None
+    availability: Optional[bool] = None
+    name: Optional[str] = None
+    email: Optional[EmailStr] = None
+    phone_number: Optional[int] = None
+    created_at: Optional[int] = None
+
+class EquipmentPage(BaseModel):
+    equipments: List[EquipmentResponse]
+    next_cursor: Optional[str] = None
 
 class CreateEquipmentRequest(BaseModel):
     name: str
@@ -52,10 +75,19 @@ class VehicleResponse(BaseModel):
     capacity: int
     milage: float
     price: float
+    location: Optional[str] = None
     description: Optional[str]
-    document_path: Optional[DocumentResponse]
+    document_path: Optional[str] = None  # media key
     photo_path: Optional[str]
-    created_at: int
+    wishlist: Optional[List[int]] = None
+    name: Optional[str] = None
+    email: Optional[EmailStr] = None
+    phone_number: Optional[int] = None
+    created_at: Optional[int] = None
+
+class VehiclePage(BaseModel):
+    vehicles: List[VehicleResponse]
+    next_cursor: Optional[str] = None
 
 class CreateVehicleRequest(BaseModel):
     type: str
@@ -70,8 +102,8 @@ class AuthorityResponse(BaseModel):
     name: str
     location: str
     description: Optional[str]
-    document_path: Optional[DocumentResponse]
-    photo_path: Optional[str]
+    document_path: Optional[str] = None  # media key
+    photo_path: Optional[str] = None
     created_at: int
 
 class CreateAuthorityRequest(BaseModel):
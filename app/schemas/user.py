@@ -10,4 +10,11 @@ class Profile(BaseModel):
     dateOfBirth: Optional[str]
     profilePic: Optional[str]
     bio: Optional[str]
-    type: Optional[int]
\ No newline at end of file
+    type: Optional[int]
+
+class CurrentUser(BaseModel):
+    id: int
+    email: EmailStr
+    username: Optional[str] = None
+    type: Optional[str] = None
+    profile_pic: Optional[str] = None
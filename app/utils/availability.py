@@ -0,0 +1,89 @@
+from datetime import date, timedelta
+from typing import List, Optional, Tuple
+from fastapi import HTTPException, status
+from psycopg import AsyncCursor
+
+# Bookings in these states no longer hold their item. Must match the
+# predicate of the booking_no_overlap constraint
+# (migrations/008_booking_availability.sql), which is also what lets the
+# queries below use its index.
+HOLDS_ITEM = "service_date IS NOT NULL AND COALESCE(status, '') NOT IN ('cancelled', 'rejected')"
+
+BOOKED_RANGE = "daterange(service_date, COALESCE(deliver_date, service_date), '[]')"
+
+BOOKED_QUERY = f"""
+    SELECT id, service_date, COALESCE(deliver_date, service_date) AS deliver_date
+    FROM booking
+    WHERE type = %(type)s AND item_id = %(item_id)s
+      AND {BOOKED_RANGE} && daterange(%(start)s, %(end)s, '[]')
+      AND {HOLDS_ITEM}
+    ORDER BY service_date, id
+"""
+
+Interval = Tuple[date, date]  # first and last day, inclusive
+
+
+def parse_dates(service_date: Optional[str], deliver_date: Optional[str]) -> Optional[Interval]:
+    """
+    The days a booking holds its item, or None for a booking without
+    dates. Rejects malformed dates and a delivery before the service date.
+    """
+    if service_date is None:
+        if deliver_date is not None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="deliver_date requires a service_date",
+            )
+        return None
+    try:
+        start = date.fromisoformat(service_date)
+        end = date.fromisoformat(deliver_date) if deliver_date is not None else start
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Dates must be in YYYY-MM-DD format",
+        )
+    if end < start:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="deliver_date must not be before service_date",
+        )
+    return start, end
+
+
+async def booked_intervals(
+    cur: AsyncCursor, item_type: str, item_id: int, start: date, end: date
+) -> List[dict]:
+    """Live bookings of the item overlapping [start, end], earliest first."""
+    await cur.execute(BOOKED_QUERY, {"type": item_type, "item_id": item_id, "start": start, "end": end})
+    return await cur.fetchall()
+
+
+def free_intervals(booked: List[dict], start: date, end: date) -> List[Interval]:
+    """The gaps in [start, end] between `booked` (sorted by service_date)."""
+    free, cursor = [], start
+    for row in booked:
+        if row["service_date"] > cursor:
+            free.append((cursor, min(row["service_date"] - timedelta(days=1), end)))
+        cursor = max(cursor, row["deliver_date"] + timedelta(days=1))
+        if cursor > end:
+            return free
+    free.append((cursor, end))
+    return free
+
+
+def first_overlap(holds: List[Tuple[str, int, Optional[Interval]]]) -> Optional[Tuple[int, int]]:
+    """
+    Positions of two entries in `holds` ((type, item_id, days) per booking)
+    that book the same item on overlapping days, or None.
+    """
+    by_item = {}
+    for position, (item_type, item_id, days) in enumerate(holds):
+        if days is not None:
+            by_item.setdefault((item_type, item_id), []).append((days, position))
+    for intervals in by_item.values():
+        intervals.sort()
+        for (previous, i), (current, j) in zip(intervals, intervals[1:]):
+            if current[0] <= previous[1]:
+                return i, j
+    return None
@@ -0,0 +1,233 @@
+import asyncio
+import zlib
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple
+from starlette.datastructures import Headers, MutableHeaders
+from app.config import settings
+
+try:
+    import brotli
+except ImportError:  # optional: `pip install brotli`
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional: `pip install zstandard`
+    zstandard = None
+
+# Response compression negotiated from Accept-Encoding. Bodies below
+# COMPRESSION_MIN_SIZE go out as they are; larger ones, including streamed
+# listings, are compressed chunk by chunk with a flush after each, so a
+# streamed response still reaches the client as it is produced.
+#
+# A compressed body is a different representation, so its strong ETag gets
+# the coding appended ("abc" -> "abc-gzip"). The suffix is taken off
+# If-None-Match on the way in, so endpoints only ever see their own ETags.
+
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "application/xml", "image/svg+xml")
+
+
+class GzipEncoder:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # gzip container, mtime 0
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_FINISH)
+
+
+class BrotliEncoder:
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.process(data) + self._compressor.finish()
+
+
+class ZstdEncoder:
+    def __init__(self, level: int):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush()
+
+
+def available_encoders() -> Dict[str, Callable[[], GzipEncoder]]:
+    """Encoder factories by coding, in order of preference when the client has none."""
+    encoders = {}
+    if zstandard is not None:
+        encoders["zstd"] = lambda: ZstdEncoder(settings.COMPRESSION_ZSTD_LEVEL)
+    if brotli is not None:
+        encoders["br"] = lambda: BrotliEncoder(settings.COMPRESSION_BROTLI_QUALITY)
+    encoders["gzip"] = lambda: GzipEncoder(settings.COMPRESSION_GZIP_LEVEL)
+    return encoders
+
+
+@lru_cache(maxsize=256)
+def negotiate(accept_encoding: str, codings: Tuple[str, ...]) -> Optional[str]:
+    """
+    The coding to use for an Accept-Encoding value, or None for identity:
+    the client's highest q-value among `codings`, ties going to the earlier.
+    """
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            weights[name.strip()] = q
+
+    best, best_q = None, 0.0
+    for coding in codings:
+        q = weights.get(coding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def _suffixed(etag: str, coding: str) -> str:
+    return etag[:-1] + f'-{coding}"' if etag.endswith('"') else etag
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing compressible responses with the best coding
+    the client accepts (zstd, br, gzip; the first two if installed). Large
+    chunks are compressed in a worker thread, off the event loop.
+    """
+
+    def __init__(self, app, minimum_size: int = 1024, thread_size: int = 65536):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.thread_size = thread_size
+        self.encoders = available_encoders()
+        self.codings = tuple(self.encoders)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        coding = negotiate(headers.get("accept-encoding", ""), self.codings)
+        matched: Dict[str, str] = {}
+        if coding is not None and "if-none-match" in headers:
+            scope = dict(scope)
+            scope["headers"] = self._strip_suffixes(scope["headers"], coding, matched)
+        await _Responder(self, coding, matched, send).run(scope, receive)
+
+    @staticmethod
+    def _strip_suffixes(raw: List[Tuple[bytes, bytes]], coding: str, matched: Dict[str, str]) -> List[Tuple[bytes, bytes]]:
+        suffix = f'-{coding}"'
+        stripped = []
+        for name, value in raw:
+            if name == b"if-none-match":
+                tags = []
+                for tag in value.decode("latin-1").split(","):
+                    tag = tag.strip()
+                    if tag.endswith(suffix):
+                        base = tag[: -len(suffix)] + '"'
+                        matched[base.removeprefix("W/")] = tag.removeprefix("W/")
+                        tag = base
+                    tags.append(tag)
+                value = ", ".join(tags).encode("latin-1")
+            stripped.append((name, value))
+        return stripped
+
+
+class _Responder:
+    def __init__(self, middleware: CompressionMiddleware, coding: Optional[str], matched: Dict[str, str], send):
+        self.middleware = middleware
+        self.coding = coding
+        self.matched = matched
+        self.send = send
+        self.start: Optional[dict] = None
+        self.pending: List[bytes] = []
+        self.pending_size = 0
+        self.encoder = None
+        self.passthrough = False
+
+    async def run(self, scope, receive) -> None:
+        await self.middleware.app(scope, receive, self.send_wrapper)
+
+    async def _encode(self, data: bytes, final: bool) -> bytes:
+        method = self.encoder.finish if final else self.encoder.compress
+        if len(data) >= self.middleware.thread_size:
+            return await asyncio.to_thread(method, data)
+        return method(data)
+
+    async def send_wrapper(self, message) -> None:
+        if message["type"] == "http.response.start":
+            await self._on_start(message)
+        elif message["type"] == "http.response.body" and not self.passthrough:
+            await self._on_body(message)
+        else:
+            await self.send(message)
+
+    async def _on_start(self, message) -> None:
+        headers = MutableHeaders(raw=message.setdefault("headers", []))
+        content_type = headers.get("content-type", "")
+        compressible = content_type.startswith(COMPRESSIBLE_TYPES)
+        if compressible or message["status"] == 304:
+            headers.add_vary_header("Accept-Encoding")
+
+        if message["status"] == 304 and headers.get("etag") in self.matched:
+            headers["ETag"] = self.matched[headers["etag"]]
+
+        if (
+            self.coding is None
+            or not compressible
+            or message["status"] < 200
+            or message["status"] in (204, 304)
+            or "content-encoding" in headers
+            or "no-transform" in headers.get("cache-control", "")
+        ):
+            self.passthrough = True
+            await self.send(message)
+            return
+        self.start = message
+
+    async def _on_body(self, message) -> None:
+        body, more = message.get("body", b""), message.get("more_body", False)
+
+        if self.encoder is None:
+            self.pending.append(body)
+            self.pending_size += len(body)
+            if more and self.pending_size < self.middleware.minimum_size:
+                return  # not enough yet to decide
+            body, self.pending = b"".join(self.pending), []
+            if not more and len(body) < self.middleware.minimum_size:
+                self.passthrough = True
+                await self.send(self.start)
+                await self.send({"type": "http.response.body", "body": body, "more_body": False})
+                return
+
+            self.encoder = self.middleware.encoders[self.coding]()
+            headers = MutableHeaders(raw=self.start["headers"])
+            headers["Content-Encoding"] = self.coding
+            if "etag" in headers:
+                headers["ETag"] = _suffixed(headers["etag"], self.coding)
+            del headers["content-length"]
+            if not more:
+                body = await self._encode(body, final=True)
+                headers["Content-Length"] = str(len(body))
+                await self.send(self.start)
+                await self.send({"type": "http.response.body", "body": body, "more_body": False})
+                return
+            await self.send(self.start)
+
+        body = await self._encode(body, final=not more)
+        await self.send({"type": "http.response.body", "body": body, "more_body": more})
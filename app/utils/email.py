@@ -1,6 +1,15 @@
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig
-from pydantic import EmailStr
+import asyncio
+import logging
 import random
+from dataclasses import dataclass
+from email.message import EmailMessage
+from email.utils import formataddr
+from typing import Awaitable, Callable, List, Optional, Set
+import aiosmtplib
+from fastapi_mail import ConnectionConfig
+from pydantic import EmailStr
+import secrets
+from app.config import settings
 
 # Email configuration
 conf = ConnectionConfig(
@@ -15,30 +24,243 @@ conf = ConnectionConfig(
     VALIDATE_CERTS=True,
 )
 
+
+class EmailQueueFull(Exception):
+    pass
+
+
+@dataclass
+class _Job:
+    message: EmailMessage
+    on_failure: Optional[Callable[[], Awaitable[None]]] = None
+    attempts: int = 0
+
+
+class EmailQueue:
+    """
+    In-process outgoing mail queue.
+
+    `workers` tasks each keep one SMTP connection open and reuse it for
+    every message they send, closing it after `idle_timeout` seconds
+    without work. A worker takes up to `batch_size` queued messages at a
+    time and sends them back to back on its connection.
+
+    Failed sends are retried with exponential backoff and jitter, up to
+    `max_retries` times; permanent (5xx) rejections are not retried. When a
+    message is given up on, its `on_failure` callback runs.
+
+    The SMTP server comes from `conf`, so the queue can be pointed at a
+    local stand-in such as `aiosmtpd` (MAIL_STARTTLS=False,
+    USE_CREDENTIALS=False).
+    """
+
+    def __init__(
+        self,
+        conf: ConnectionConfig,
+        workers: int,
+        queue_size: int,
+        batch_size: int,
+        max_retries: int,
+        retry_backoff: float,
+        idle_timeout: float,
+    ):
+        self.conf = conf
+        self.workers = workers
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.idle_timeout = idle_timeout
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._retries: Set[asyncio.Task] = set()
+        self._in_flight = 0
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+
+    def _get_queue(self) -> asyncio.Queue:
+        if self._queue is None:
+            self._queue = asyncio.Queue(self.queue_size)
+        return self._queue
+
+    def build_message(self, recipients: List[str], subject: str, body: str, subtype: str = "plain") -> EmailMessage:
+        message = EmailMessage()
+        message["From"] = formataddr((self.conf.MAIL_FROM_NAME or "", self.conf.MAIL_FROM))
+        message["To"] = ", ".join(recipients)
+        message["Subject"] = subject
+        message.set_content(body, subtype=subtype)
+        return message
+
+    def enqueue(self, message: EmailMessage, on_failure: Optional[Callable[[], Awaitable[None]]] = None) -> None:
+        """Queue a message without waiting for it to be sent. Raises EmailQueueFull."""
+        try:
+            self._get_queue().put_nowait(_Job(message, on_failure))
+        except asyncio.QueueFull:
+            raise EmailQueueFull()
+
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def stats(self) -> dict:
+        return {
+            "queued": self.depth(),
+            "in_flight": self._in_flight,
+            "retrying": len(self._retries),
+            "sent": self.sent,
+            "retried": self.retried,
+            "failed": self.failed,
+        }
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        conf = self.conf
+        smtp = aiosmtplib.SMTP(
+            hostname=conf.MAIL_SERVER,
+            port=conf.MAIL_PORT,
+            username=conf.MAIL_USERNAME if conf.USE_CREDENTIALS else None,
+            password=conf.MAIL_PASSWORD.get_secret_value() if conf.USE_CREDENTIALS else None,
+            use_tls=conf.MAIL_SSL_TLS,
+            start_tls=conf.MAIL_STARTTLS,
+            validate_certs=conf.VALIDATE_CERTS,
+            timeout=conf.TIMEOUT,
+        )
+        await smtp.connect()
+        return smtp
+
+    @staticmethod
+    async def _close(smtp: aiosmtplib.SMTP) -> None:
+        try:
+            await smtp.quit()
+        except Exception:
+            smtp.close()
+
+    async def _send_batch(self, smtp: Optional[aiosmtplib.SMTP], batch: List[_Job]) -> Optional[aiosmtplib.SMTP]:
+        for job in batch:
+            try:
+                if smtp is None:
+                    smtp = await self._connect()
+                await smtp.send_message(job.message)
+                self.sent += 1
+            except (aiosmtplib.SMTPRecipientsRefused, aiosmtplib.SMTPResponseException) as e:
+                code = getattr(e, "code", 550)
+                if code >= 500 and smtp is not None and smtp.is_connected:
+                    # Rejected for good; the connection is still usable
+                    await self._give_up(job, e)
+                    continue
+                smtp = await self._reset(smtp)
+                self._retry(job, e)
+            except Exception as e:
+                smtp = await self._reset(smtp)
+                self._retry(job, e)
+        return smtp
+
+    async def _reset(self, smtp: Optional[aiosmtplib.SMTP]) -> None:
+        """Close a connection that may be broken; the next send reconnects."""
+        if smtp is not None:
+            await self._close(smtp)
+        return None
+
+    def _retry(self, job: _Job, error: Exception) -> None:
+        job.attempts += 1
+        if job.attempts > self.max_retries:
+            self._spawn(self._give_up(job, error))
+            return
+
+        self.retried += 1
+        delay = self.retry_backoff * 2 ** (job.attempts - 1)
+        delay += random.uniform(0, self.retry_backoff)
+        self._spawn(self._requeue(job, delay))
+
+    def _spawn(self, coro: Awaitable[None]) -> None:
+        task = asyncio.ensure_future(coro)
+        self._retries.add(task)
+        task.add_done_callback(self._retries.discard)
+
+    async def _requeue(self, job: _Job, delay: float) -> None:
+        await asyncio.sleep(delay)
+        await self._get_queue().put(job)
+
+    async def _give_up(self, job: _Job, error: Exception) -> None:
+        self.failed += 1
+        logging.error(f"Giving up on email to {job.message['To']} after {job.attempts} attempt(s):\n{error}")
+        if job.on_failure is not None:
+            try:
+                await job.on_failure()
+            except Exception as e:
+                logging.error(f"Error in email failure callback:\n{e}")
+
+    async def _worker(self) -> None:
+        queue = self._get_queue()
+        smtp: Optional[aiosmtplib.SMTP] = None
+        try:
+            while True:
+                try:
+                    job = await asyncio.wait_for(queue.get(), timeout=self.idle_timeout)
+                except asyncio.TimeoutError:
+                    smtp = await self._reset(smtp)
+                    continue
+
+                batch = [job]
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(queue.get_nowait())
+                    except asyncio.QueueEmpty:
+                        break
+
+                self._in_flight += len(batch)
+                try:
+                    smtp = await self._send_batch(smtp, batch)
+                finally:
+                    self._in_flight -= len(batch)
+                    for _ in batch:
+                        queue.task_done()
+        finally:
+            if smtp is not None:
+                await self._close(smtp)
+
+    def start(self) -> None:
+        if not self._tasks:
+            self._get_queue()
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self, drain_timeout: float = 0) -> None:
+        """Wait up to `drain_timeout` seconds for queued mail, then stop the workers."""
+        if self._tasks and drain_timeout > 0:
+            try:
+                await asyncio.wait_for(self._get_queue().join(), timeout=drain_timeout)
+            except asyncio.TimeoutError:
+                logging.error(f"Email queue not drained on shutdown, {self.depth()} message(s) dropped")
+
+        for task in [*self._tasks, *self._retries]:
+            task.cancel()
+        await asyncio.gather(*self._tasks, *self._retries, return_exceptions=True)
+        self._tasks, self._retries = [], set()
+
+
+email_queue = EmailQueue(
+    conf,
+    workers=settings.EMAIL_WORKERS,
+    queue_size=settings.EMAIL_QUEUE_SIZE,
+    batch_size=settings.EMAIL_BATCH_SIZE,
+    max_retries=settings.EMAIL_MAX_RETRIES,
+    retry_backoff=settings.EMAIL_RETRY_BACKOFF,
+    idle_timeout=settings.EMAIL_IDLE_TIMEOUT,
+)
+
 # OTP generator
 def generate_otp() -> str:
-    otp = f"{random.randint(100000, 999999)}"
+    otp = f"{secrets.randbelow(900000) + 100000}"
     return otp
 
 # Send OTP function
-async def send_otp_email(email: EmailStr, otp: str) -> None:
-    message = MessageSchema(
-        subject="Your OTP Code",
+async def send_otp_email(
+    email: EmailStr, otp: str, on_failure: Optional[Callable[[], Awaitable[None]]] = None
+) -> None:
+    """Queue the OTP email; returns as soon as it is queued. Raises EmailQueueFull."""
+    message = email_queue.build_message(
         recipients=[email],
+        subject="Your OTP Code",
         body=f"Your OTP code is: {otp}",
         subtype="html",
     )
-    fm = FastMail(conf)
-    await fm.send_message(message)
-
-# Store OTP in memory (or database/cache in real-world scenarios)
-otp_storage = {}  # In-memory storage for demo purposes
-
-# Function to save OTP
-def save_otp(email: str, otp: str) -> None:
-    otp_storage[email] = otp
-
-# Function to validate OTP
-def validate_otp(email: str, otp: str) -> bool:
-    stored_otp = otp_storage.get(email)
-    return stored_otp == otp
+    email_queue.enqueue(message, on_failure)
@@ -0,0 +1,42 @@
+import hashlib
+from typing import Dict, Optional
+from fastapi import Response
+
+# Strong validators for JSON responses: the ETag is a hash of the exact body,
+# so clients revalidating with If-None-Match get an empty 304 when nothing
+# changed. `Cache-Control: no-cache` lets them store the response but makes
+# them revalidate before each reuse.
+
+CACHE_CONTROL = "no-cache"
+
+
+def strong_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match uses the weak comparison (RFC 9110 13.1.2), so W/ prefixes are ignored."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+def conditional_response(
+    body: bytes,
+    etag: str,
+    if_none_match: Optional[str],
+    media_type: str = "application/json",
+    headers: Optional[Dict[str, str]] = None,
+) -> Response:
+    """`body` with its ETag, or an empty 304 if the client already has it."""
+    headers = {**(headers or {}), "ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
+def json_response(body: bytes, if_none_match: Optional[str]) -> Response:
+    """A rendered JSON body as a conditional response."""
+    return conditional_response(body, strong_etag(body), if_none_match)
@@ -0,0 +1,57 @@
+from typing import FrozenSet, Iterable, Dict
+from psycopg import AsyncCursor
+from app.config import settings
+from app.utils.cache import TTLCache
+
+# A follow row (user_id=A, follower_id=B, is_followed) means "A follows B".
+FOLLOWING_QUERY = b"SELECT follower_id FROM follow WHERE user_id = %s AND is_followed = TRUE"
+FOLLOWERS_QUERY = b"SELECT user_id FROM follow WHERE follower_id = %s AND is_followed = TRUE"
+
+
+class FollowGraph:
+    """
+    In-process adjacency cache of the follow table.
+
+    Each user's outgoing ("following") and incoming ("followers") edges are
+    loaded on first use and kept as frozensets, so membership checks and
+    counts are O(1). /follow and /unfollow invalidate both endpoints of the
+    edge in this worker; the TTL bounds staleness for changes made through
+    other workers.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._following: TTLCache[FrozenSet[int]] = TTLCache(maxsize, ttl)
+        self._followers: TTLCache[FrozenSet[int]] = TTLCache(maxsize, ttl)
+        # Bumped on every invalidation; a load that raced with a write is
+        # returned to its caller but not cached.
+        self._generation = 0
+
+    async def _load(self, cache: TTLCache, query: bytes, cur: AsyncCursor, user_id: int) -> FrozenSet[int]:
+        edges = cache.get(user_id)
+        if edges is not None:
+            return edges
+
+        generation = self._generation
+        await cur.execute(query, (user_id,))
+        edges = frozenset(next(iter(row.values())) for row in await cur.fetchall())
+        if generation == self._generation:
+            cache.set(user_id, edges)
+        return edges
+
+    async def following(self, cur: AsyncCursor, user_id: int) -> FrozenSet[int]:
+        return await self._load(self._following, FOLLOWING_QUERY, cur, user_id)
+
+    async def followers(self, cur: AsyncCursor, user_id: int) -> FrozenSet[int]:
+        return await self._load(self._followers, FOLLOWERS_QUERY, cur, user_id)
+
+    async def is_following_many(self, cur: AsyncCursor, user_id: int, targets: Iterable[int]) -> Dict[int, bool]:
+        following = await self.following(cur, user_id)
+        return {target: target in following for target in targets}
+
+    def invalidate(self, user_id: int, followed_id: int) -> None:
+        self._generation += 1
+        self._following.pop(user_id)
+        self._followers.pop(followed_id)
+
+
+follow_graph = FollowGraph(settings.FOLLOW_CACHE_SIZE, settings.FOLLOW_CACHE_TTL)
@@ -0,0 +1,191 @@
+import asyncio
+import logging
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Set, Tuple
+import httpx
+from psycopg import AsyncCursor
+from app.config import settings
+from app.database import pool
+from app.utils.cache import TTLCache
+
+# Things that can be found with /nearby, by the name used in the API.
+# Coordinates live in latitude/longitude columns (migrations/007_geo.sql).
+KINDS: Dict[str, str] = {
+    "vehicles": "vehicles",
+    "equipments": "equipments",
+    "guides": "guides",
+    "authorities": "authority",
+    "posts": "posts",
+}
+
+# Nearest first, within `radius` metres. earth_box narrows the GiST scan to
+# a bounding cube; earth_distance drops the cube's corners.
+NEARBY_QUERY = """
+    SELECT id, earth_distance(ll_to_earth(latitude, longitude), ll_to_earth(%(lat)s, %(lon)s)) AS distance
+    FROM {table}
+    WHERE earth_box(ll_to_earth(%(lat)s, %(lon)s), %(radius)s) @> ll_to_earth(latitude, longitude)
+      AND earth_distance(ll_to_earth(latitude, longitude), ll_to_earth(%(lat)s, %(lon)s)) <= %(radius)s
+    ORDER BY ll_to_earth(latitude, longitude) <-> ll_to_earth(%(lat)s, %(lon)s)
+    LIMIT %(limit)s
+"""
+
+SET_COORDINATES_QUERY = "UPDATE {table} SET latitude = %s, longitude = %s WHERE id = %s"
+
+CACHE_LOOKUP_QUERY = b"SELECT latitude, longitude FROM geocode_cache WHERE query = %s"
+
+CACHE_STORE_QUERY = b"""
+    INSERT INTO geocode_cache (query, latitude, longitude) VALUES (%s, %s, %s)
+    ON CONFLICT (query) DO UPDATE SET latitude = EXCLUDED.latitude, longitude = EXCLUDED.longitude
+"""
+
+Coordinates = Tuple[float, float]
+
+
+async def find_nearby(
+    cur: AsyncCursor, kind: str, lat: float, lon: float, radius_m: float, limit: int
+) -> List[Tuple[int, float]]:
+    """(id, distance in metres) of the `limit` nearest rows of `kind` within `radius_m`."""
+    query = NEARBY_QUERY.format(table=KINDS[kind])
+    await cur.execute(query, {"lat": lat, "lon": lon, "radius": radius_m, "limit": limit})
+    return [(row["id"], row["distance"]) for row in await cur.fetchall()]
+
+
+async def set_coordinates(cur: AsyncCursor, kind: str, row_id: int, lat: float, lon: float) -> None:
+    await cur.execute(SET_COORDINATES_QUERY.format(table=KINDS[kind]), (lat, lon, row_id))
+
+
+class Geocoder(ABC):
+    @abstractmethod
+    async def lookup(self, location: str) -> Optional[Coordinates]:
+        ...
+
+    async def close(self) -> None:
+        pass
+
+
+class NullGeocoder(Geocoder):
+    """Geocoding switched off: only coordinates sent by clients are used."""
+
+    async def lookup(self, location: str) -> Optional[Coordinates]:
+        return None
+
+
+class NominatimGeocoder(Geocoder):
+    """
+    OpenStreetMap Nominatim (or a self-hosted instance). Requests are spaced
+    `min_interval` seconds apart, as the public service requires.
+    """
+
+    def __init__(self, url: str, user_agent: str, timeout: float, min_interval: float):
+        self.url = url
+        self.user_agent = user_agent
+        self.timeout = timeout
+        self.min_interval = min_interval
+        self._client: Optional[httpx.AsyncClient] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._last_request = 0.0
+
+    async def lookup(self, location: str) -> Optional[Coordinates]:
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=self.timeout, headers={"User-Agent": self.user_agent})
+            self._lock = asyncio.Lock()
+
+        async with self._lock:
+            wait = self._last_request + self.min_interval - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            try:
+                response = await self._client.get(self.url, params={"q": location, "format": "jsonv2", "limit": 1})
+            finally:
+                self._last_request = time.monotonic()
+
+        response.raise_for_status()
+        results = response.json()
+        if not results:
+            return None
+        return float(results[0]["lat"]), float(results[0]["lon"])
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class GeoLocator:
+    """
+    Resolves free-text locations to coordinates, through an in-process
+    cache and the geocode_cache table, so each distinct place is looked up
+    once. Rows created without coordinates are located in the background.
+    """
+
+    def __init__(self, geocoder: Geocoder, cache_size: int):
+        self.geocoder = geocoder
+        self._cache: TTLCache[Optional[Coordinates]] = TTLCache(cache_size, float("inf"))
+        self._tasks: Set[asyncio.Task] = set()
+
+    @staticmethod
+    def _normalize(location: str) -> str:
+        return " ".join(location.lower().split())
+
+    async def geocode(self, location: str) -> Optional[Coordinates]:
+        query = self._normalize(location)
+        if not query or isinstance(self.geocoder, NullGeocoder):
+            return None
+        if query in self._cache:
+            return self._cache.get(query)
+
+        async with pool.connection() as conn:
+            cur = await conn.execute(CACHE_LOOKUP_QUERY, (query,))
+            row = await cur.fetchone()
+        if row is not None:
+            result = (row["latitude"], row["longitude"]) if row["latitude"] is not None else None
+            self._cache.set(query, result)
+            return result
+
+        result = await self.geocoder.lookup(query)
+        async with pool.connection() as conn:
+            await conn.execute(CACHE_STORE_QUERY, (query, *(result or (None, None))))
+        self._cache.set(query, result)
+        return result
+
+    async def _locate(self, kind: str, row_id: int, location: str) -> None:
+        try:
+            coordinates = await self.geocode(location)
+            if coordinates is None:
+                return
+            async with pool.connection() as conn:
+                async with conn.cursor() as cur:
+                    await set_coordinates(cur, kind, row_id, *coordinates)
+        except Exception as e:
+            logging.error(f"Error geocoding {kind} {row_id}:\n{e}")
+
+    def locate_later(self, kind: str, row_id: int, location: Optional[str]) -> None:
+        """Fill in a row's coordinates from its location text. Call after committing the row."""
+        if not location or isinstance(self.geocoder, NullGeocoder):
+            return
+        task = asyncio.create_task(self._locate(kind, row_id, location))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self.geocoder.close()
+
+
+def create_geocoder(name: str) -> Geocoder:
+    if name == "none":
+        return NullGeocoder()
+    if name == "nominatim":
+        return NominatimGeocoder(
+            settings.GEOCODER_URL,
+            settings.GEOCODER_USER_AGENT,
+            settings.GEOCODER_TIMEOUT,
+            settings.GEOCODER_MIN_INTERVAL,
+        )
+    raise ValueError(f"Unknown geocoder backend: {name!r}")
+
+
+geo_locator = GeoLocator(create_geocoder(settings.GEOCODER_BACKEND), settings.GEOCODE_CACHE_SIZE)
@@ -1,28 +1,113 @@
 import io
-import base64
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from PIL import Image
-from fastapi import UploadFile
-from typing import List
+from fastapi import HTTPException, UploadFile, status
+from typing import List, Optional
+from app.config import settings
+from app.utils.media import media_store
+
+# Decoding, resizing and encoding are CPU bound and hold the GIL, so they run
+# in a separate process pool. `_slots` bounds the number of images queued or
+# in flight; once it is exhausted new uploads wait (back-pressure) and give up
+# with a 503 after IMAGE_QUEUE_TIMEOUT seconds.
+_executor: Optional[ProcessPoolExecutor] = None
+_slots: Optional[asyncio.Semaphore] = None
+
+
+def resize_image(data: bytes) -> bytes:
+    """
+    Shrink an image to a third of its size and return it as JPEG bytes.
+    Runs inside a worker process, so it must stay a picklable top-level function.
+    """
+    img = Image.open(io.BytesIO(data))
+
+    # Let the JPEG decoder scale down while decoding instead of decoding the
+    # full-size image first. No-op for other formats.
+    target = (max(img.width // 3, 1), max(img.height // 3, 1))
+    img.draft("RGB", target)
+
+    # Convert image to RGB mode if it has an alpha channel
+    if img.mode == "RGBA":
+        img = img.convert("RGB")
+
+    # Resize the image
+    img = img.resize(target)
+
+    # Save resized image to an in-memory buffer
+    output = io.BytesIO()
+    img.save(output, format="JPEG")
+    return output.getvalue()
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.IMAGE_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _executor
+
+
+def _get_slots() -> asyncio.Semaphore:
+    global _slots
+    if _slots is None:
+        _slots = asyncio.Semaphore(settings.IMAGE_QUEUE_SIZE)
+    return _slots
+
+
+async def _run_in_pool(data: bytes) -> bytes:
+    global _executor
+    slots = _get_slots()
+    try:
+        await asyncio.wait_for(slots.acquire(), timeout=settings.IMAGE_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Image processing is busy, please retry",
+            headers={"Retry-After": "1"},
+        )
+
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_executor(), resize_image, data)
+    except BrokenProcessPool:
+        # A worker died (e.g. OOM on a huge image); start a fresh pool next time.
+        _executor = None
+        raise
+    finally:
+        slots.release()
+
+
+async def _process_image(data: bytes) -> str:
+    resized = await _run_in_pool(data)
+    return await media_store.put(resized, "jpg")
+
 
 async def process_images(images: List[UploadFile]) -> List[str]:
-    processed_images = []
-    for image in images:
-        # Read the image data
-        img = Image.open(io.BytesIO(await image.read()))
-        
-        # Convert image to RGB mode if it has an alpha channel
-        if img.mode == "RGBA":
-            img = img.convert("RGB")
-        
-        # Resize the image
-        img = img.resize((img.width // 3, img.height // 3))
-        
-        # Save resized image to an in-memory buffer
-        output = io.BytesIO()
-        img.save(output, format="JPEG")
-        
-        # Encode the image to base64
-        processed_images.append(base64.b64encode(output.getvalue()).decode("utf-8"))
-    
-    return processed_images
+    """
+    Resize the uploaded images and store them in the media store.
+    Returns the media keys, in upload order.
+    """
+    # Read the image data
+    payloads = [await image.read() for image in images]
+
+    # Process all images of the upload in parallel, preserving order
+    return list(await asyncio.gather(*(_process_image(data) for data in payloads)))
+
+
+async def warm_image_pool() -> None:
+    """Start the worker processes now rather than on the first upload."""
+    loop = asyncio.get_running_loop()
+    executor = _get_executor()
+    await asyncio.gather(*(loop.run_in_executor(executor, int) for _ in range(settings.IMAGE_WORKERS)))
+
 
+def shutdown_image_pool() -> None:
+    global _executor, _slots
+    if _executor is not None:
+        _executor.shutdown(wait=True, cancel_futures=True)
+    _executor, _slots = None, None
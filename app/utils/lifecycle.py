@@ -0,0 +1,133 @@
+import asyncio
+import enum
+import logging
+import signal
+import time
+from typing import Awaitable, Callable, List, Optional
+import httpx
+from psycopg import OperationalError
+from psycopg_pool import PoolTimeout
+from app.config import settings
+from app.database import pool
+from app.utils.metrics import http_in_flight
+
+logger = logging.getLogger(__name__)
+
+
+class State(enum.Enum):
+    STARTING = "starting"
+    READY = "ready"
+    DRAINING = "draining"
+
+
+class Lifecycle:
+    """
+    Readiness of this worker, for /readyz.
+
+    Startup doesn't wait for the database: the app begins serving (and
+    /healthz answers) at once, while a background warm-up connects the
+    pool, starts the worker pools and primes the response cache. Only then
+    does /readyz report ready, so a rolling deploy never routes traffic to a
+    cold worker.
+
+    On SIGTERM, /readyz reports draining for `drain_delay` seconds before the
+    server is told to stop, giving load balancers time to stop sending new
+    requests; shutdown then waits up to `drain_timeout` for requests in
+    flight.
+    """
+
+    def __init__(self, warmup_paths: List[str], drain_delay: float, drain_timeout: float):
+        self.warmup_paths = warmup_paths
+        self.drain_delay = drain_delay
+        self.drain_timeout = drain_timeout
+        self.state = State.STARTING
+        self._warmup: Optional[asyncio.Task] = None
+        self._previous_handler = None
+
+    async def _warm_up(self, app, steps: List[Callable[[], Awaitable[None]]]) -> None:
+        started = time.monotonic()
+        # Probe with a query rather than pool.wait(): wait() closes the pool
+        # when it times out, and a closed pool never reconnects.
+        while True:
+            try:
+                async with pool.connection(timeout=settings.STARTUP_DB_TIMEOUT) as conn:
+                    await conn.execute(b"SELECT 1")
+                break
+            except (PoolTimeout, OperationalError) as e:
+                logger.warning(f"Database not available yet, retrying: {e}")
+                await asyncio.sleep(1)
+
+        for step in steps:
+            try:
+                await step()
+            except Exception:
+                logger.exception("Warm-up step failed")
+
+        # Fill the response cache and prepare the hot queries through the app itself
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://warmup") as client:
+            for path in self.warmup_paths:
+                try:
+                    await client.get(path, headers={"X-Request-ID": "warmup"})
+                except Exception:
+                    logger.exception(f"Warm-up request to {path} failed")
+
+        if self.state is State.STARTING:
+            self.state = State.READY
+        logger.info(f"Ready after {time.monotonic() - started:.2f}s")
+
+    def start(self, app, steps: List[Callable[[], Awaitable[None]]]) -> None:
+        self._warmup = asyncio.create_task(self._warm_up(app, steps))
+        self._install_signal_handler()
+
+    def _install_signal_handler(self) -> None:
+        # Runs inside the server's own signal handling (uvicorn restores its
+        # handlers on exit), so chain to whatever handler is installed now.
+        try:
+            self._previous_handler = signal.getsignal(signal.SIGTERM)
+            signal.signal(signal.SIGTERM, self._on_sigterm)
+        except ValueError:
+            pass  # not the main thread, e.g. under a test client
+
+    def _on_sigterm(self, sig, frame) -> None:
+        previous = self._previous_handler
+        if self.state is State.DRAINING or not callable(previous):
+            self.state = State.DRAINING
+            if callable(previous):
+                previous(sig, frame)
+            return
+        self.state = State.DRAINING
+        loop = asyncio.get_event_loop()
+        loop.call_soon_threadsafe(loop.call_later, self.drain_delay, previous, sig, frame)
+
+    async def readiness(self) -> dict:
+        """State and, once warmed up, database reachability; `ready` only if both are fine."""
+        database = None
+        if self.state is State.READY:
+            try:
+                async with pool.connection(timeout=settings.READINESS_DB_TIMEOUT) as conn:
+                    await conn.execute(b"SELECT 1")
+                database = True
+            except Exception:
+                database = False
+        return {"ready": bool(database), "state": self.state.value, "database": database}
+
+    async def drain(self) -> None:
+        """Stop reporting ready and wait for requests in flight to finish."""
+        self.state = State.DRAINING
+        if self._warmup is not None and not self._warmup.done():
+            self._warmup.cancel()
+            await asyncio.gather(self._warmup, return_exceptions=True)
+
+        deadline = time.monotonic() + self.drain_timeout
+        while http_in_flight.value() > 0 and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        if http_in_flight.value() > 0:
+            logger.warning(f"Shutting down with {http_in_flight.value()} request(s) in flight")
+
+
+lifecycle = Lifecycle(
+    warmup_paths=settings.STARTUP_WARMUP_PATHS,
+    drain_delay=settings.SHUTDOWN_DRAIN_DELAY,
+    drain_timeout=settings.SHUTDOWN_DRAIN_TIMEOUT,
+)
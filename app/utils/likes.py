@@ -0,0 +1,92 @@
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Dict, Optional
+from app.config import settings
+from app.database import pool
+
+# One UPDATE per flush for every post that changed. The rows are locked in
+# id order first, in the same transaction, so concurrent flushes from
+# several workers can't deadlock: UPDATE ... FROM takes its row locks in
+# whatever order the join produces.
+LOCK_QUERY = b"SELECT id FROM posts WHERE id = ANY(%s) ORDER BY id FOR UPDATE"
+
+FLUSH_QUERY = b"""
+    UPDATE posts
+    SET likes = GREATEST(COALESCE(posts.likes, 0) + pending.delta, 0)
+    FROM (SELECT unnest(%s::int[]) AS id, unnest(%s::int[]) AS delta) AS pending
+    WHERE posts.id = pending.id
+"""
+
+
+class LikeCounter:
+    """
+    Write-behind aggregator for posts.likes.
+
+    Like/unlike requests record the per-user row right away and only add a
+    +1/-1 delta here. The deltas are summed in memory and applied in one
+    batched UPDATE every `interval` seconds, so a viral post costs one row
+    update per flush instead of one per like.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._pending: Dict[int, int] = defaultdict(int)
+        self._in_flight: Dict[int, int] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._stopping: Optional[asyncio.Event] = None
+
+    def add(self, post_id: int, delta: int) -> None:
+        self._pending[post_id] += delta
+
+    def pending(self, post_id: int) -> int:
+        """Delta not yet visible in posts.likes, including a flush in progress."""
+        return self._pending.get(post_id, 0) + self._in_flight.get(post_id, 0)
+
+    async def flush(self) -> None:
+        batch = {post_id: delta for post_id, delta in self._pending.items() if delta}
+        self._pending = defaultdict(int)
+        if not batch:
+            return
+
+        self._in_flight = batch
+        ids = sorted(batch)
+        try:
+            # Committed as one transaction when the connection goes back to the pool
+            async with pool.connection() as conn:
+                await conn.execute(LOCK_QUERY, (ids,))
+                await conn.execute(FLUSH_QUERY, (ids, [batch[post_id] for post_id in ids]))
+        except Exception as e:
+            # Keep the deltas for the next flush rather than losing them.
+            self._in_flight = {}
+            for post_id, delta in batch.items():
+                self._pending[post_id] += delta
+            logging.error(f"Error flushing like counters:\n{e}")
+        finally:
+            self._in_flight = {}
+
+    async def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            await self.flush()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._stopping = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        # Let the loop finish its current flush and do a final one, instead
+        # of cancelling it halfway through an UPDATE.
+        if self._task is not None:
+            self._stopping.set()
+            await self._task
+            self._task = None
+        else:
+            await self.flush()
+
+
+like_counter = LikeCounter(settings.LIKES_FLUSH_INTERVAL)
@@ -0,0 +1,167 @@
+import contextvars
+import json
+import logging
+import queue
+import random
+import re
+import sys
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+from app.config import settings
+
+# Logging goes through a bounded in-memory queue: on the request path a
+# record is only filtered, stamped with the request id and enqueued, and a
+# listener thread formats it as one JSON line and writes it to stdout. When
+# the queue is full, records are dropped (and counted) rather than blocking
+# the event loop.
+
+request_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+
+_REQUEST_ID = re.compile(r"^[\w.\-]{1,64}$")
+
+# LogRecord attributes that aren't user-supplied `extra` fields
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "request_id"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: time, level, logger, message, request id, `extra` fields and traceback."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        for key, value in vars(record).items():
+            if key not in _RESERVED:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class ContextFilter(logging.Filter):
+    """
+    Per-level sampling and request id stamping. Runs in the caller's
+    context, so it sees the current request's id.
+    """
+
+    def __init__(self, sample_rates: Dict[int, float]):
+        super().__init__()
+        self.sample_rates = sample_rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = self.sample_rates.get(record.levelno, 1.0)
+        if rate < 1.0 and random.random() >= rate:
+            return False
+        record.request_id = request_id.get()
+        return True
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that drops records instead of raising when the queue is full."""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Render the traceback now, while it exists; the rest is formatted by the listener
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg, record.args = record.getMessage(), None
+        record.exc_info = record.stack_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def parse_sample_rates(spec: str) -> Dict[int, float]:
+    """"DEBUG=0.01,INFO=0.5" -> {10: 0.01, 20: 0.5}"""
+    rates = {}
+    for part in spec.split(","):
+        if "=" in part:
+            level, rate = part.split("=", 1)
+            rates[logging.getLevelName(level.strip().upper())] = float(rate)
+    return rates
+
+
+class LogPipeline:
+    def __init__(self, level: str, queue_size: int, sample_rates: Dict[int, float]):
+        self.level = level
+        self.handler = DroppingQueueHandler(queue.Queue(queue_size))
+        self.handler.addFilter(ContextFilter(sample_rates))
+        output = logging.StreamHandler(sys.stdout)
+        output.setFormatter(JsonFormatter())
+        self._listener = QueueListener(self.handler.queue, output)
+        self._started = False
+
+    def stats(self) -> dict:
+        return {"queued": self.handler.queue.qsize(), "dropped": self.handler.dropped}
+
+    def start(self) -> None:
+        """Route the root logger through the queue and start the writer thread."""
+        if self._started:
+            return
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(self.handler)
+        root.setLevel(self.level)
+        self._listener.start()
+        self._started = True
+
+    def stop(self) -> None:
+        """Write out what is queued and stop the writer thread."""
+        if self._started:
+            self._listener.stop()
+            logging.getLogger().removeHandler(self.handler)
+            self._started = False
+
+
+log_pipeline = LogPipeline(
+    level=settings.LOG_LEVEL,
+    queue_size=settings.LOG_QUEUE_SIZE,
+    sample_rates=parse_sample_rates(settings.LOG_SAMPLE_RATES),
+)
+
+
+class RequestIdMiddleware:
+    """
+    ASGI middleware giving each request an id: the client's X-Request-ID if
+    it looks sane, else a new one. It is set for logging and echoed back in
+    the response's X-Request-ID header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = dict(scope["headers"]).get(b"x-request-id", b"").decode("latin-1")
+        current = incoming if _REQUEST_ID.match(incoming) else uuid.uuid4().hex
+        token = request_id.set(current)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), (b"x-request-id", current.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_id.reset(token)
@@ -0,0 +1,175 @@
+import os
+import re
+import hashlib
+import mimetypes
+import tempfile
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, Optional, Type
+import anyio
+from app.config import settings
+
+# Media keys are "<sha256 of the content>.<extension>". They are what gets
+# stored in posts.images, photo_path and document_path instead of the blob.
+KEY_PATTERN = re.compile(r"^[0-9a-f]{64}\.[a-z0-9]{1,8}$")
+
+CHUNK_SIZE = 64 * 1024
+
+
+@dataclass
+class MediaInfo:
+    key: str
+    size: int
+    content_type: str
+
+
+def make_key(data: bytes, extension: str) -> str:
+    return f"{hashlib.sha256(data).hexdigest()}.{extension.lstrip('.').lower()}"
+
+
+def is_media_key(value: Optional[str]) -> bool:
+    return bool(value) and KEY_PATTERN.match(value) is not None
+
+
+def content_type_for(key: str) -> str:
+    return mimetypes.guess_type(key)[0] or "application/octet-stream"
+
+
+class MediaBackend(ABC):
+    """
+    Storage for immutable, content-addressed blobs. Writing the same content
+    twice yields the same key and stores it once.
+    """
+
+    @abstractmethod
+    async def put(self, data: bytes, extension: str) -> str:
+        ...
+
+    @abstractmethod
+    async def put_stream(self, chunks: AsyncIterator[bytes], extension: str) -> str:
+        """Store a blob without holding it in memory; the key is computed while writing."""
+        ...
+
+    @abstractmethod
+    async def stat(self, key: str) -> Optional[MediaInfo]:
+        ...
+
+    def local_path(self, key: str) -> Optional[str]:
+        """Filesystem path of the blob, for backends that have one."""
+        return None
+
+    @abstractmethod
+    def iter_range(self, key: str, start: int, end: int) -> AsyncIterator[bytes]:
+        """Yield bytes `start`..`end` (inclusive) of the blob."""
+        ...
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        ...
+
+
+class LocalMediaBackend(MediaBackend):
+    """
+    Blobs on the local filesystem, fanned out as <root>/ab/cd/<key> so no
+    single directory grows too large.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, key: str) -> str:
+        if not is_media_key(key):
+            raise ValueError(f"Invalid media key: {key!r}")
+        return os.path.join(self.root, key[:2], key[2:4], key)
+
+    async def put(self, data: bytes, extension: str) -> str:
+        key = make_key(data, extension)
+        path = self._path(key)
+        await anyio.to_thread.run_sync(self._write, path, data)
+        return key
+
+    @staticmethod
+    def _write(path: str, data: bytes) -> None:
+        if os.path.exists(path):
+            return
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        # Write to a temp file and rename, so readers never see a partial blob.
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                tmp.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    async def put_stream(self, chunks: AsyncIterator[bytes], extension: str) -> str:
+        await anyio.to_thread.run_sync(lambda: os.makedirs(self.root, exist_ok=True))
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        digest = hashlib.sha256()
+        try:
+            async with await anyio.open_file(fd, "wb") as tmp:
+                async for chunk in chunks:
+                    digest.update(chunk)
+                    await tmp.write(chunk)
+            key = f"{digest.hexdigest()}.{extension.lstrip('.').lower()}"
+            await anyio.to_thread.run_sync(self._place, tmp_path, self._path(key))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        return key
+
+    @staticmethod
+    def _place(tmp_path: str, path: str) -> None:
+        if os.path.exists(path):
+            os.unlink(tmp_path)
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp_path, path)
+
+    def local_path(self, key: str) -> Optional[str]:
+        return self._path(key)
+
+    async def stat(self, key: str) -> Optional[MediaInfo]:
+        try:
+            path = self._path(key)
+            size = (await anyio.Path(path).stat()).st_size
+        except (ValueError, FileNotFoundError):
+            return None
+        return MediaInfo(key=key, size=size, content_type=content_type_for(key))
+
+    async def iter_range(self, key: str, start: int, end: int) -> AsyncIterator[bytes]:
+        remaining = end - start + 1
+        async with await anyio.open_file(self._path(key), "rb") as f:
+            await f.seek(start)
+            while remaining > 0:
+                chunk = await f.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+    async def delete(self, key: str) -> None:
+        try:
+            await anyio.Path(self._path(key)).unlink()
+        except FileNotFoundError:
+            pass
+
+
+BACKENDS: Dict[str, Type[MediaBackend]] = {
+    "local": LocalMediaBackend,
+}
+
+
+def create_backend(name: str) -> MediaBackend:
+    try:
+        backend_class = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown media backend: {name!r}")
+    return backend_class(settings.MEDIA_ROOT)
+
+
+media_store = create_backend(settings.MEDIA_BACKEND)
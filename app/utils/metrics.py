@@ -0,0 +1,222 @@
+import re
+import time
+from bisect import bisect_left
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Instrumentation in Prometheus text format, served at /metrics. Everything
+# is per process and updated from the event loop only, so plain dicts and
+# counters suffice: recording a request costs a few dict operations and a
+# bisect.
+
+PREFIX = "travelpoint"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0, 5.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = f"{PREFIX}_{name}"
+        self.help = help
+        self.labels = labels
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}", *self.samples()]
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self) -> Iterable[str]:
+        for labels, value in self._values.items():
+            yield f"{self.name}{_format_labels(self.labels, labels)} {_format_value(value)}"
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels: str, value: float) -> None:
+        self._values[labels] = value
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = buckets
+        # Per label set: count per bucket (non-cumulative, last is +Inf), sum
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        entry = self._values.get(labels)
+        if entry is None:
+            entry = self._values[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+        counts, total = entry
+        counts[bisect_left(self.buckets, value)] += 1
+        total[0] += value
+
+    def samples(self) -> Iterable[str]:
+        for labels, (counts, total) in self._values.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labels, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labels, labels)} {_format_value(total[0])}"
+            yield f"{self.name}_count{_format_labels(self.labels, labels)} {cumulative}"
+
+
+class Registry:
+    """
+    Metrics to expose, plus collectors: functions returning a component's
+    stats dict (e.g. EmailQueue.stats), read at scrape time and exposed as
+    gauges named `<prefix>_<component>_<key>`.
+    """
+
+    def __init__(self):
+        self._metrics: List[Metric] = []
+        self._collectors: List[Tuple[str, str, Callable[[], dict]]] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def collect(self, component: str, help: str, stats: Callable[[], dict]) -> None:
+        self._collectors.append((component, help, stats))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines += metric.render()
+        for component, help, stats in self._collectors:
+            try:
+                values = stats()
+            except Exception:
+                continue  # a component that can't report doesn't break the scrape
+            for key, value in values.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    name = f"{PREFIX}_{component}_{key}"
+                    lines += [f"# HELP {name} {help}: {key}", f"# TYPE {name} gauge", f"{name} {_format_value(value)}"]
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.register(Counter(
+    "http_requests_total", "HTTP responses by route, method and status", ("route", "method", "status"),
+))
+http_latency = registry.register(Histogram(
+    "http_request_duration_seconds", "Time until the last byte of the response was sent", ("route", "method"),
+))
+http_response_size = registry.register(Histogram(
+    "http_response_size_bytes", "Response body size", ("route", "method"), buckets=SIZE_BUCKETS,
+))
+http_in_flight = registry.register(Gauge(
+    "http_requests_in_flight", "Requests being handled",
+))
+db_query_latency = registry.register(Histogram(
+    "db_query_duration_seconds", "Query execution time by statement and table", ("query",), buckets=QUERY_BUCKETS,
+))
+
+
+_STATEMENT = re.compile(
+    r"^\s*(?:(select)\b.*?\bfrom\s+([\w.]+)|(insert)\s+into\s+([\w.]+)|(update)\s+([\w.]+)|(delete)\s+from\s+([\w.]+)|(\w+))",
+    re.IGNORECASE | re.DOTALL,
+)
+
+
+@lru_cache(maxsize=1024)
+def query_label(query: str) -> str:
+    """A low-cardinality label for a query: its statement and first table, e.g. "select posts"."""
+    match = _STATEMENT.match(query)
+    if match is None:
+        return "other"
+    words = [group for group in match.groups() if group]
+    return " ".join(words).lower()
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording latency, response size and status of every
+    HTTP request, labelled by route template (e.g. /posts/{post_id}) so
+    label cardinality stays bounded. Unrouted requests share one label.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._routes: Optional[Dict[Callable, str]] = None
+
+    def _route(self, scope) -> str:
+        if self._routes is None:
+            self._routes = {
+                route.endpoint: route.path
+                for route in scope["app"].routes
+                if hasattr(route, "endpoint") and hasattr(route, "path")
+            }
+        return self._routes.get(scope.get("endpoint"), "unmatched")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status, size = 500, 0
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        started = time.perf_counter()
+        http_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_in_flight.dec()
+            route, method = self._route(scope), scope["method"]
+            http_latency.observe(time.perf_counter() - started, route, method)
+            http_response_size.observe(size, route, method)
+            http_requests.inc(route, method, str(status))
@@ -1,12 +1,100 @@
+import hashlib
+import time
+from typing import Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from jose import JWTError
+from app.config import settings
+from app.database import pool
+from app.schemas.token import TokenData
+from app.schemas.user import CurrentUser
+from app.utils import token as jwt_token
+from app.utils.cache import TTLCache
+from app.utils.projection import reference
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
-def get_current_user(token: str = Depends(oauth2_scheme)):
-    credentials_exception = HTTPException(
+# Cached per worker, so profile_pic only when it is a media key or URL: legacy
+# rows hold whole base64 images
+USER_QUERY = f"""
+    SELECT id, email, username, type, {reference("users.profile_pic")} AS profile_pic
+    FROM users WHERE email = %s
+""".encode("utf-8")
+
+# Verified tokens, keyed by their sha256 so raw tokens are not kept in memory.
+# Each entry lives until the token's own `exp`, so an expired token is never
+# accepted from the cache.
+_tokens: TTLCache[TokenData] = TTLCache(settings.AUTH_TOKEN_CACHE_SIZE, 0)
+
+# Users by email. Kept short so profile changes made through other workers
+# show up quickly; this worker drops entries on update via `invalidate_user`.
+_users: TTLCache[CurrentUser] = TTLCache(settings.AUTH_USER_CACHE_SIZE, settings.AUTH_USER_CACHE_TTL)
+
+
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    return token.verify_token(token, credentials_exception)
+
+
+def verify_token_cached(token: str) -> TokenData:
+    key = hashlib.sha256(token.encode("utf-8")).digest()
+    token_data = _tokens.get(key)
+    if token_data is not None:
+        return token_data
+
+    try:
+        payload = jwt_token.decode_token(token)
+    except JWTError:
+        raise _credentials_exception()
+
+    email: Optional[str] = payload.get("sub")
+    if email is None:
+        raise _credentials_exception()
+
+    token_data = TokenData(email=email)
+    expires = payload.get("exp")
+    if expires is not None:
+        remaining = float(expires) - time.time()
+        if remaining > 0:
+            _tokens.set(key, token_data, ttl=remaining)
+    return token_data
+
+
+async def load_user(email: str) -> Optional[CurrentUser]:
+    user = _users.get(email)
+    if user is not None:
+        return user
+
+    # Only a cache miss checks out a connection
+    async with pool.connection() as conn:
+        cur = await conn.execute(USER_QUERY, (email,))
+        row = await cur.fetchone()
+    if row is None:
+        return None
+
+    user = CurrentUser(**row)
+    _users.set(email, user)
+    return user
+
+
+def invalidate_user(email: Optional[str]) -> None:
+    if email:
+        _users.pop(email)
+
+
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> CurrentUser:
+    token_data = verify_token_cached(token)
+    user = await load_user(token_data.email)  # type: ignore
+    if user is None:
+        raise _credentials_exception()
+    return user
+
+
+async def get_admin_user(current_user: CurrentUser = Depends(get_current_user)) -> CurrentUser:
+    """The current user, who must be listed in ADMIN_EMAILS."""
+    if current_user.email.lower() not in settings.ADMIN_EMAILS:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+    return current_user
@@ -0,0 +1,302 @@
+import asyncio
+import hashlib
+import hmac
+import logging
+import time
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from enum import Enum
+from typing import AsyncIterator, Dict, Optional, Tuple
+from psycopg import AsyncConnection
+from psycopg.types.json import Jsonb
+from app.config import settings
+from app.database import pool
+
+
+class OTPStatus(Enum):
+    OK = "ok"
+    INVALID = "invalid"
+    MISSING = "missing"  # never issued, expired, or already used
+    TOO_MANY_ATTEMPTS = "too_many_attempts"
+
+
+class OTPThrottled(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__(f"OTP resend throttled, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+def _hash_otp(email: str, otp: str) -> str:
+    # OTPs are short; key the hash so a leaked table can't be brute-forced offline.
+    message = f"{email.lower()}:{otp}".encode("utf-8")
+    return hmac.new(settings.SECRET_KEY.encode("utf-8"), message, hashlib.sha256).hexdigest()
+
+
+class OTPStore(ABC):
+    """
+    Pending one-time passwords, keyed by email, together with the payload to
+    act on once the OTP is verified (e.g. the registration form).
+
+    Entries expire after `ttl` seconds, allow `max_attempts` guesses, and a
+    new OTP for the same email can only be issued every `resend_interval`
+    seconds.
+    """
+
+    def __init__(self, ttl: int, max_attempts: int, resend_interval: int):
+        self.ttl = ttl
+        self.max_attempts = max_attempts
+        self.resend_interval = resend_interval
+
+    @abstractmethod
+    async def issue(self, email: str, otp: str, payload: Optional[dict] = None) -> None:
+        """Store a new OTP, replacing any previous one. Raises OTPThrottled."""
+        ...
+
+    @abstractmethod
+    async def retry_after(self, email: str) -> int:
+        """
+        Seconds until `issue` would accept a new OTP for `email`, 0 if now.
+        A cheap check before expensive work; `issue` still enforces the limit.
+        """
+        ...
+
+    @abstractmethod
+    async def verify(
+        self, email: str, otp: str, conn: Optional[AsyncConnection] = None
+    ) -> Tuple[OTPStatus, Optional[dict]]:
+        """
+        Check an OTP. On success the entry is consumed and its payload returned.
+        Backends that use the DB run on `conn` when given, so consuming the
+        OTP commits or rolls back together with the caller's transaction.
+        """
+        ...
+
+    @abstractmethod
+    async def discard(self, email: str) -> None:
+        ...
+
+    @abstractmethod
+    async def evict_expired(self) -> int:
+        ...
+
+
+@dataclass
+class _Entry:
+    otp_hash: str
+    payload: Optional[dict]
+    sent_at: float
+    expires_at: float
+    attempts: int = 0
+
+
+class MemoryOTPStore(OTPStore):
+    """
+    Per-process store. Only correct with a single worker, since /register
+    and /verify-otp must land on the same process.
+    """
+
+    def __init__(self, ttl: int, max_attempts: int, resend_interval: int, max_entries: int):
+        super().__init__(ttl, max_attempts, resend_interval)
+        self.max_entries = max_entries
+        self._entries: Dict[str, _Entry] = {}
+
+    async def issue(self, email: str, otp: str, payload: Optional[dict] = None) -> None:
+        now = time.monotonic()
+        entry = self._entries.get(email)
+        if entry and entry.expires_at > now and now - entry.sent_at < self.resend_interval:
+            raise OTPThrottled(int(self.resend_interval - (now - entry.sent_at)) + 1)
+
+        self._entries.pop(email, None)
+        if len(self._entries) >= self.max_entries:
+            await self.evict_expired()
+            if len(self._entries) >= self.max_entries:
+                # Dicts keep insertion order: drop the oldest pending entry.
+                self._entries.pop(next(iter(self._entries)))
+
+        self._entries[email] = _Entry(_hash_otp(email, otp), payload, now, now + self.ttl)
+
+    async def retry_after(self, email: str) -> int:
+        now = time.monotonic()
+        entry = self._entries.get(email)
+        if entry and entry.expires_at > now and now - entry.sent_at < self.resend_interval:
+            return int(self.resend_interval - (now - entry.sent_at)) + 1
+        return 0
+
+    async def verify(
+        self, email: str, otp: str, conn: Optional[AsyncConnection] = None
+    ) -> Tuple[OTPStatus, Optional[dict]]:
+        entry = self._entries.get(email)
+        if entry is None or entry.expires_at <= time.monotonic():
+            self._entries.pop(email, None)
+            return OTPStatus.MISSING, None
+
+        entry.attempts += 1
+        if entry.attempts > self.max_attempts:
+            del self._entries[email]
+            return OTPStatus.TOO_MANY_ATTEMPTS, None
+
+        if not hmac.compare_digest(entry.otp_hash, _hash_otp(email, otp)):
+            return OTPStatus.INVALID, None
+
+        del self._entries[email]
+        return OTPStatus.OK, entry.payload
+
+    async def discard(self, email: str) -> None:
+        self._entries.pop(email, None)
+
+    async def evict_expired(self) -> int:
+        now = time.monotonic()
+        expired = [email for email, entry in self._entries.items() if entry.expires_at <= now]
+        for email in expired:
+            del self._entries[email]
+        return len(expired)
+
+
+class PostgresOTPStore(OTPStore):
+    """
+    Store shared by all workers and hosts, in the otp_codes table
+    (migrations/004_otp_codes.sql). Issuing and consuming are each a single
+    conditional statement, so concurrent requests for the same email can't
+    both get past the throttle or both redeem the OTP.
+    """
+
+    ISSUE_QUERY = b"""
+        INSERT INTO otp_codes (email, otp_hash, payload, attempts, sent_at, expires_at)
+        VALUES (%(email)s, %(otp_hash)s, %(payload)s, 0, now(), now() + make_interval(secs => %(ttl)s))
+        ON CONFLICT (email) DO UPDATE
+        SET otp_hash = EXCLUDED.otp_hash,
+            payload = EXCLUDED.payload,
+            attempts = 0,
+            sent_at = EXCLUDED.sent_at,
+            expires_at = EXCLUDED.expires_at
+        WHERE otp_codes.expires_at <= now()
+           OR otp_codes.sent_at <= now() - make_interval(secs => %(resend_interval)s)
+        RETURNING email
+    """
+
+    RETRY_AFTER_QUERY = b"""
+        SELECT ceil(extract(epoch FROM sent_at + make_interval(secs => %(resend_interval)s) - now()))::int AS seconds
+        FROM otp_codes
+        WHERE email = %(email)s
+          AND expires_at > now()
+          AND sent_at > now() - make_interval(secs => %(resend_interval)s)
+    """
+
+    ATTEMPT_QUERY = b"""
+        UPDATE otp_codes SET attempts = attempts + 1
+        WHERE email = %s AND expires_at > now()
+        RETURNING otp_hash, attempts
+    """
+
+    CONSUME_QUERY = b"DELETE FROM otp_codes WHERE email = %s AND otp_hash = %s RETURNING payload"
+
+    DELETE_QUERY = b"DELETE FROM otp_codes WHERE email = %s"
+
+    EVICT_QUERY = b"DELETE FROM otp_codes WHERE expires_at <= now()"
+
+    @asynccontextmanager
+    async def _connection(self, conn: Optional[AsyncConnection]) -> AsyncIterator[AsyncConnection]:
+        if conn is not None:
+            yield conn
+        else:
+            async with pool.connection() as conn:
+                yield conn
+
+    async def issue(self, email: str, otp: str, payload: Optional[dict] = None) -> None:
+        params = {
+            "email": email,
+            "otp_hash": _hash_otp(email, otp),
+            "payload": Jsonb(payload) if payload is not None else None,
+            "ttl": self.ttl,
+            "resend_interval": self.resend_interval,
+        }
+        async with pool.connection() as conn:
+            cur = await conn.execute(self.ISSUE_QUERY, params)
+            if await cur.fetchone() is None:
+                raise OTPThrottled(self.resend_interval)
+
+    async def retry_after(self, email: str) -> int:
+        async with pool.connection() as conn:
+            cur = await conn.execute(
+                self.RETRY_AFTER_QUERY, {"email": email, "resend_interval": self.resend_interval}
+            )
+            row = await cur.fetchone()
+            return max(row["seconds"], 1) if row else 0
+
+    async def verify(
+        self, email: str, otp: str, conn: Optional[AsyncConnection] = None
+    ) -> Tuple[OTPStatus, Optional[dict]]:
+        async with self._connection(conn) as conn:
+            cur = await conn.execute(self.ATTEMPT_QUERY, (email,))
+            entry = await cur.fetchone()
+            if entry is None:
+                return OTPStatus.MISSING, None
+
+            if entry["attempts"] > self.max_attempts:
+                await conn.execute(self.DELETE_QUERY, (email,))
+                return OTPStatus.TOO_MANY_ATTEMPTS, None
+
+            otp_hash = _hash_otp(email, otp)
+            if not hmac.compare_digest(entry["otp_hash"], otp_hash):
+                return OTPStatus.INVALID, None
+
+            cur = await conn.execute(self.CONSUME_QUERY, (email, otp_hash))
+            consumed = await cur.fetchone()
+            if consumed is None:
+                return OTPStatus.MISSING, None
+            return OTPStatus.OK, consumed["payload"]
+
+    async def discard(self, email: str) -> None:
+        async with pool.connection() as conn:
+            await conn.execute(self.DELETE_QUERY, (email,))
+
+    async def evict_expired(self) -> int:
+        async with pool.connection() as conn:
+            cur = await conn.execute(self.EVICT_QUERY)
+            return cur.rowcount
+
+
+def create_otp_store(name: str) -> OTPStore:
+    args = (settings.OTP_TTL, settings.OTP_MAX_ATTEMPTS, settings.OTP_RESEND_INTERVAL)
+    if name == "memory":
+        return MemoryOTPStore(*args, max_entries=settings.OTP_MAX_ENTRIES)
+    if name == "postgres":
+        return PostgresOTPStore(*args)
+    raise ValueError(f"Unknown OTP backend: {name!r}")
+
+
+otp_store = create_otp_store(settings.OTP_BACKEND)
+
+
+class OTPEvictor:
+    """Background task that periodically drops expired OTPs."""
+
+    def __init__(self, store: OTPStore, interval: float):
+        self.store = store
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.store.evict_expired()
+            except Exception as e:
+                logging.error(f"Error evicting expired OTPs:\n{e}")
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+otp_evictor = OTPEvictor(otp_store, settings.OTP_EVICT_INTERVAL)
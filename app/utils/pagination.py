@@ -0,0 +1,40 @@
+import base64
+import json
+from typing import Any, List, Tuple
+from fastapi import HTTPException, status
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(*values: Any) -> str:
+    """
+    Pack the sort key of the last row of a page into an opaque, URL-safe token.
+    Values are stored as their JSON/ISO representation and handed back to
+    Postgres as-is, which casts them to the column type.
+    """
+    raw = json.dumps([v.isoformat() if hasattr(v, "isoformat") else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, types: Tuple[type, ...]) -> List[Any]:
+    """
+    Unpack a token produced by `encode_cursor`, checking it holds one value of
+    each of `types`. Tampered or malformed cursors are rejected with a 400.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except Exception:
+        values = None
+
+    if (
+        not isinstance(values, list)
+        or len(values) != len(types)
+        or not all(isinstance(v, t) for v, t in zip(values, types))
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor",
+        )
+    return values
@@ -1,19 +1,253 @@
-from typing import List
-from fastapi import UploadFile
-import PyPDF2
-import base64
+import asyncio
 import io
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import AsyncIterator, List, Optional, Set, Tuple, Union
+from fastapi import HTTPException, UploadFile, status
+import PyPDF2
+from app.config import settings
+from app.database import pool
+from app.utils.media import CHUNK_SIZE, media_store
+
+# Uploads are streamed into the media store and registered in pdf_documents
+# (migrations/005_pdf_documents.sql). Page count and text are extracted later
+# by PdfIndexer, once per distinct file, in a separate process pool: PyPDF2 is
+# pure Python and would otherwise hold the GIL for the whole parse.
+
+PDF_MAGIC = b"%PDF-"
+
+
+def extract_pdf(source: Union[str, bytes], max_chars: int) -> Tuple[int, str]:
+    """
+    Return the page count and text of a PDF, given its path or bytes.
+    Runs inside a worker process, so it must stay a picklable top-level function.
+    """
+    reader = PyPDF2.PdfReader(source if isinstance(source, str) else io.BytesIO(source))
+    parts, length = [], 0
+    for page in reader.pages:
+        if length >= max_chars:
+            break
+        text = page.extract_text() or ""
+        parts.append(text)
+        length += len(text) + 1
+    # Postgres text columns can't hold NUL characters
+    return len(reader.pages), "\n".join(parts)[:max_chars].replace("\x00", "")
+
+
+async def _read_upload(upload: UploadFile, max_size: int) -> AsyncIterator[bytes]:
+    """Yield the upload in chunks, rejecting non-PDFs and files over `max_size` bytes."""
+    header, size = b"", 0
+    while chunk := await upload.read(CHUNK_SIZE):
+        size += len(chunk)
+        if size > max_size:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"Document is larger than {max_size} bytes",
+            )
+        if len(header) < len(PDF_MAGIC):
+            header += chunk[: len(PDF_MAGIC) - len(header)]
+            if len(header) == len(PDF_MAGIC) and header != PDF_MAGIC:
+                break
+        yield chunk
+
+    if header != PDF_MAGIC:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Document must be a PDF",
+        )
+
+
+class PdfIndexer:
+    """
+    Parses registered documents in the background.
+
+    `register` records a new document and queues it; a document already
+    known (same content, same key) is not parsed again. Workers claim a row
+    before parsing it, so several API processes can run side by side, and a
+    periodic sweep picks up documents left unparsed by a full queue or a
+    restart.
+    """
+
+    REGISTER_QUERY = b"""
+        INSERT INTO pdf_documents (media_key, size) VALUES (%s, %s)
+        ON CONFLICT (media_key) DO NOTHING
+        RETURNING media_key
+    """
+
+    # A claim older than `parse_timeout` belongs to a worker that died
+    CLAIM_QUERY = b"""
+        UPDATE pdf_documents SET status = 'parsing', claimed_at = now()
+        WHERE media_key = %(key)s
+          AND (status = 'pending'
+               OR (status = 'parsing' AND claimed_at < now() - make_interval(secs => %(timeout)s)))
+        RETURNING media_key
+    """
+
+    UNPARSED_QUERY = b"""
+        SELECT media_key FROM pdf_documents
+        WHERE status IN ('pending', 'parsing')
+          AND (claimed_at IS NULL OR claimed_at < now() - make_interval(secs => %(timeout)s))
+        ORDER BY created_at
+        LIMIT %(limit)s
+    """
+
+    PARSED_QUERY = b"""
+        UPDATE pdf_documents
+        SET status = 'parsed', page_count = %s, text = %s, error = NULL, parsed_at = now()
+        WHERE media_key = %s
+    """
+
+    FAILED_QUERY = b"""
+        UPDATE pdf_documents SET status = 'failed', error = %s, parsed_at = now()
+        WHERE media_key = %s
+    """
+
+    INFO_QUERY = b"""
+        SELECT media_key, size, status, page_count, text, parsed_at
+        FROM pdf_documents WHERE media_key = %s
+    """
+
+    def __init__(self, workers: int, queue_size: int, max_chars: int, sweep_interval: float, parse_timeout: int):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.max_chars = max_chars
+        self.sweep_interval = sweep_interval
+        self.parse_timeout = parse_timeout
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._queued: Set[str] = set()
+        self._tasks: List[asyncio.Task] = []
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    def _get_queue(self) -> asyncio.Queue:
+        if self._queue is None:
+            self._queue = asyncio.Queue(self.queue_size)
+        return self._queue
+
+    def _submit(self, key: str) -> None:
+        if key in self._queued:
+            return
+        try:
+            self._get_queue().put_nowait(key)
+            self._queued.add(key)
+        except asyncio.QueueFull:
+            pass  # left pending; the next sweep queues it
+
+    async def register(self, key: str) -> None:
+        info = await media_store.stat(key)
+        async with pool.connection() as conn:
+            cur = await conn.execute(self.REGISTER_QUERY, (key, info.size if info else 0))
+            created = await cur.fetchone()
+        if created:
+            self._submit(key)
+
+    async def warm_up(self) -> None:
+        """Start the parser processes now rather than on the first document."""
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        await asyncio.gather(*(loop.run_in_executor(executor, int) for _ in range(self.workers)))
+
+    def stats(self) -> dict:
+        queued = self._queue.qsize() if self._queue is not None else 0
+        return {"workers": self.workers, "queued": queued, "parsing": len(self._queued) - queued}
+
+    async def info(self, key: str) -> Optional[dict]:
+        async with pool.connection() as conn:
+            cur = await conn.execute(self.INFO_QUERY, (key,))
+            return await cur.fetchone()
+
+    async def _parse(self, key: str) -> None:
+        async with pool.connection() as conn:
+            cur = await conn.execute(self.CLAIM_QUERY, {"key": key, "timeout": self.parse_timeout})
+            claimed = await cur.fetchone()
+        if not claimed:
+            return
+
+        try:
+            source = media_store.local_path(key)
+            if source is None:
+                info = await media_store.stat(key)
+                source = b"".join([chunk async for chunk in media_store.iter_range(key, 0, info.size - 1)])
+            loop = asyncio.get_running_loop()
+            page_count, text = await loop.run_in_executor(self._get_executor(), extract_pdf, source, self.max_chars)
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM); leave the claim to time out and use a fresh pool
+            self._executor = None
+            raise
+        except Exception as e:
+            async with pool.connection() as conn:
+                await conn.execute(self.FAILED_QUERY, (str(e)[:1000], key))
+            return
+
+        async with pool.connection() as conn:
+            await conn.execute(self.PARSED_QUERY, (page_count, text, key))
+
+    async def _worker(self) -> None:
+        queue = self._get_queue()
+        while True:
+            key = await queue.get()
+            try:
+                await self._parse(key)
+            except Exception as e:
+                logging.error(f"Error parsing PDF {key}:\n{e}")
+            finally:
+                self._queued.discard(key)
+                queue.task_done()
+
+    async def _sweep(self) -> None:
+        while True:
+            try:
+                free = self.queue_size - self._get_queue().qsize()
+                if free > 0:
+                    async with pool.connection() as conn:
+                        cur = await conn.execute(
+                            self.UNPARSED_QUERY, {"timeout": self.parse_timeout, "limit": free}
+                        )
+                        for row in await cur.fetchall():
+                            self._submit(row["media_key"])
+            except Exception as e:
+                logging.error(f"Error scanning for unparsed PDFs:\n{e}")
+            await asyncio.sleep(self.sweep_interval)
+
+    def start(self) -> None:
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+            self._tasks.append(asyncio.create_task(self._sweep()))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks, self._queue = [], None
+        self._queued.clear()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+
+pdf_indexer = PdfIndexer(
+    workers=settings.PDF_WORKERS,
+    queue_size=settings.PDF_QUEUE_SIZE,
+    max_chars=settings.PDF_MAX_TEXT_CHARS,
+    sweep_interval=settings.PDF_SWEEP_INTERVAL,
+    parse_timeout=settings.PDF_PARSE_TIMEOUT,
+)
+
 
-async def process_pdf(pdf: UploadFile) -> dict:
-    
-        pdf_data = await pdf.read()
-        pdf_file = io.BytesIO(pdf_data)
-        
-        reader = PyPDF2.PdfReader(pdf_file)
-        text = ""
-        for page in reader.pages:
-            text += page.extract_text() + "\n"
-        
-        encoded_pdf = base64.b64encode(pdf_data).decode("utf-8")
-
-        return encoded_pdf
+async def process_pdf(pdf: UploadFile) -> str:
+    """
+    Stream the uploaded PDF into the media store and return its media key.
+    Parsing happens in the background; see PdfIndexer.
+    """
+    key = await media_store.put_stream(_read_upload(pdf, settings.PDF_MAX_SIZE), "pdf")
+    await pdf_indexer.register(key)
+    return key
@@ -0,0 +1,99 @@
+from typing import Optional
+from psycopg import AsyncCursor
+from app.schemas.post import PostResponse, PostPage
+from app.utils.pagination import encode_cursor, decode_cursor
+from app.utils.projection import Projection, reference, reference_array
+
+# Feed query ordered newest first. The (created_at, id) keyset is served by
+# idx_posts_created_at; id only breaks ties between posts with equal timestamps.
+POSTS_PAGE_QUERY = """
+    SELECT 
+        posts.id, 
+        posts.poster_id, 
+        posts.caption, 
+        posts.images, 
+        posts.video_url, 
+        posts.location, 
+        posts.tagged_users, 
+        posts.created_at, 
+        posts.likes,
+        users.username, 
+        users.profile_pic
+    FROM posts
+    JOIN users ON posts.poster_id = users.id
+    {where}
+    ORDER BY posts.created_at DESC, posts.id DESC
+    LIMIT %s
+"""
+
+# Post listing fields, for `fields=` and the lean default (see
+# app/utils/projection.py). Keys match PostResponse.
+POST_FIELDS = Projection(
+    columns={
+        "id": "posts.id",
+        "poster_id": "posts.poster_id",
+        "username": "users.username",
+        "profile_pic": "users.profile_pic",
+        "caption": "posts.caption",
+        "images": "COALESCE(posts.images, '{}')",
+        "video_url": "posts.video_url",
+        "location": "posts.location",
+        "created_at": "posts.created_at",
+        "likes": "COALESCE(posts.likes, 0)",
+    },
+    references={
+        "profile_pic": reference("users.profile_pic"),
+        "images": reference_array("posts.images"),
+    },
+)
+
+
+def row_to_post(row: dict) -> PostResponse:
+    # Decode images if present
+    images = row["images"]
+    if images:
+        images = [img.decode("utf-8") if isinstance(img, bytes) else img for img in images]
+    else:
+        images = []
+
+    created_at = row["created_at"]
+    # Convert created_at to ISO string format
+    created_at_str = created_at.isoformat() if created_at else None
+
+    return PostResponse(
+        id=row["id"],
+        poster_id=row["poster_id"],
+        username=row.get("username"),
+        profile_pic=row.get("profile_pic"),
+        caption=row["caption"],
+        images=images,
+        video_url=row.get("video_url"),
+        location=row.get("location"),
+        created_at=created_at_str,
+        likes=row.get("likes") or 0,
+    )
+
+
+async def fetch_posts_page(cur: AsyncCursor, limit: int, cursor: Optional[str] = None) -> PostPage:
+    """
+    Return one page of the global feed, starting after `cursor`.
+    One extra row is fetched to know whether another page exists.
+    """
+    if cursor:
+        created_at, post_id = decode_cursor(cursor, (str, int))
+        query = POSTS_PAGE_QUERY.format(where="WHERE (posts.created_at, posts.id) < (%s, %s)")
+        params = (created_at, post_id, limit + 1)
+    else:
+        query = POSTS_PAGE_QUERY.format(where="")
+        params = (limit + 1,)
+
+    await cur.execute(query, params)
+    rows = await cur.fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last["created_at"], last["id"])
+
+    return PostPage(posts=[row_to_post(row) for row in rows], next_cursor=next_cursor)
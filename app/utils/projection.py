@@ -0,0 +1,70 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional
+from fastapi import HTTPException, Response, status
+from pydantic_core import to_json
+
+# Media keys and URLs are short; legacy rows hold whole base64 images. Up to
+# this size a blob column is treated as a reference and returned by default.
+REFERENCE_MAX_BYTES = 512
+
+# Arrays of references (posts.images) get a proportionally larger budget.
+REFERENCE_ARRAY_MAX_BYTES = 4096
+
+
+def reference(column: str) -> str:
+    """
+    `column` if it holds a reference, else NULL. octet_length reads the size
+    from the TOAST pointer, so large values are never fetched.
+    """
+    return f"CASE WHEN octet_length({column}) <= {REFERENCE_MAX_BYTES} THEN {column} END"
+
+
+def reference_array(column: str) -> str:
+    """Like `reference`, for a text[] column; an oversized array becomes empty."""
+    return f"CASE WHEN pg_column_size({column}) <= {REFERENCE_ARRAY_MAX_BYTES} THEN {column} ELSE '{{}}' END"
+
+
+@dataclass(frozen=True)
+class Selection:
+    output: List[str]  # fields in the response, in order
+    columns: str  # SQL select list, aliased to field names
+
+    def pick(self, row: dict) -> Dict[str, Any]:
+        return {name: row[name] for name in self.output}
+
+    def page(self, items_key: str, rows: List[dict], next_cursor: Optional[str]) -> Response:
+        # Rendered directly: sparse items don't satisfy the full response models
+        content = {items_key: [self.pick(row) for row in rows], "next_cursor": next_cursor}
+        return Response(content=to_json(content), media_type="application/json")
+
+
+@dataclass(frozen=True)
+class Projection:
+    """
+    Response fields of a listing and the SQL expression for each.
+
+    Without `fields`, every field is returned, but blob fields listed in
+    `references` use their lean expression (see `reference`). With
+    `fields`, exactly those fields are selected and returned, blobs in full.
+    """
+    columns: Dict[str, str]
+    references: Dict[str, str] = field(default_factory=dict)
+
+    def select(self, fields: Optional[str], required: Iterable[str] = ("id",)) -> Selection:
+        if fields:
+            output = list(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+            unknown = [name for name in output if name not in self.columns]
+            if unknown:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Unknown field {unknown[0]!r}, expected any of: {', '.join(self.columns)}",
+                )
+            expressions = dict(self.columns)
+        else:
+            output = list(self.columns)
+            expressions = {**self.columns, **self.references}
+
+        # Keyset pagination needs the sort key even when it isn't returned
+        selected = output + [name for name in required if name not in output]
+        columns = ", ".join(f"{expressions[name]} AS {name}" for name in selected)
+        return Selection(output=output, columns=columns)
@@ -0,0 +1,160 @@
+import asyncio
+import contextvars
+import logging
+import random
+import re
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Deque, List, Optional, Set
+from psycopg import AsyncCursor
+from app.config import settings
+from app.utils.metrics import db_query_latency, query_label
+
+# Every statement run on a pooled connection goes through TimedCursor
+# (app/database.py). Statements slower than SLOW_QUERY_MS are logged with
+# their literals and parameters stripped, and kept in a ring buffer served
+# by /admin/slow-queries. A sample of the slow SELECTs is re-run under
+# EXPLAIN (ANALYZE, BUFFERS) to attach a plan to the entry.
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_LISTS = re.compile(r"\(\s*(?:\?|%s)(?:\s*,\s*(?:\?|%s))+\s*\)")
+_SPACE = re.compile(r"\s+")
+
+# Set while a plan is being captured, so EXPLAIN itself isn't logged
+_explaining: contextvars.ContextVar[bool] = contextvars.ContextVar("explaining", default=False)
+
+
+def normalize_sql(query: str) -> str:
+    """
+    One line of SQL with string and number literals replaced by `?` and
+    placeholder lists collapsed, so equal statements log identically and no
+    values leak into the logs.
+    """
+    query = _LITERALS.sub("?", query)
+    query = _LISTS.sub("(...)", query)
+    return _SPACE.sub(" ", query).strip()
+
+
+def _query_text(query: Any) -> Optional[str]:
+    if isinstance(query, bytes):
+        return query.decode("utf-8", "replace")
+    if isinstance(query, str):
+        return query
+    return None
+
+
+def describe_params(params: Any) -> str:
+    """Parameter types only, never values, e.g. "(int, str)"."""
+    if params is None:
+        return "()"
+    if isinstance(params, dict):
+        return "{" + ", ".join(f"{key}: {type(value).__name__}" for key, value in params.items()) + "}"
+    return "(" + ", ".join(type(value).__name__ for value in params) + ")"
+
+
+class SlowQueryLog:
+    """
+    Recent slow statements, newest last. Capturing a plan runs the SELECT
+    again, read-only, on its own connection: at most one at a time and one
+    per `explain_interval` seconds, for a fraction `explain_rate` of slow
+    SELECTs.
+    """
+
+    def __init__(self, threshold_ms: float, size: int, explain_rate: float, explain_interval: float):
+        self.threshold = threshold_ms / 1000
+        self.explain_rate = explain_rate
+        self.explain_interval = explain_interval
+        self._entries: Deque[dict] = deque(maxlen=size)
+        self._last_explain = 0.0
+        self._explain_task: Optional[asyncio.Task] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    def record(self, query: Any, params: Any, elapsed: float) -> None:
+        if elapsed < self.threshold or _explaining.get():
+            return
+        text = _query_text(query)
+        normalized = normalize_sql(text) if text is not None else "<composed>"
+        entry = {
+            "at": datetime.now(timezone.utc).isoformat(),
+            "duration_ms": round(elapsed * 1000, 3),
+            "query": normalized,
+            "params": describe_params(params),
+            "plan": None,
+        }
+        self._entries.append(entry)
+        logging.warning(f"Slow query ({entry['duration_ms']} ms): {normalized} {entry['params']}")
+
+        if text is not None and self._should_explain(text):
+            self._last_explain = time.monotonic()
+            self._explain_task = asyncio.create_task(self._explain(entry, text, params))
+            self._tasks.add(self._explain_task)
+            self._explain_task.add_done_callback(self._tasks.discard)
+
+    def _should_explain(self, text: str) -> bool:
+        return (
+            self.explain_rate > 0
+            and query_label(text).startswith("select ")
+            and (self._explain_task is None or self._explain_task.done())
+            and time.monotonic() - self._last_explain >= self.explain_interval
+            and random.random() < self.explain_rate
+        )
+
+    async def _explain(self, entry: dict, text: str, params: Any) -> None:
+        from app.database import pool  # app.database builds its pool with TimedCursor
+
+        _explaining.set(True)
+        try:
+            async with pool.connection() as conn:
+                async with conn.transaction(force_rollback=True):
+                    await conn.execute(b"SET TRANSACTION READ ONLY")
+                    cur = await conn.execute("EXPLAIN (ANALYZE, BUFFERS) " + text, params)
+                    entry["plan"] = "\n".join(row["QUERY PLAN"] for row in await cur.fetchall())
+        except Exception as e:
+            entry["plan"] = f"EXPLAIN failed: {e}"
+
+    def entries(self) -> List[dict]:
+        return list(self._entries)
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+slow_query_log = SlowQueryLog(
+    threshold_ms=settings.SLOW_QUERY_MS,
+    size=settings.SLOW_QUERY_BUFFER_SIZE,
+    explain_rate=settings.SLOW_QUERY_EXPLAIN_RATE,
+    explain_interval=settings.SLOW_QUERY_EXPLAIN_INTERVAL,
+)
+
+
+def _label(query: Any) -> str:
+    text = _query_text(query)
+    return query_label(text) if text is not None else "composed"
+
+
+class TimedCursor(AsyncCursor):
+    """
+    Cursor recording each statement's execution time in
+    db_query_duration_seconds and reporting slow ones to slow_query_log.
+    """
+
+    async def execute(self, query, params=None, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await super().execute(query, params, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - started
+            db_query_latency.observe(elapsed, _label(query))
+            slow_query_log.record(query, params, elapsed)
+
+    async def executemany(self, query, params_seq, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await super().executemany(query, params_seq, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - started
+            db_query_latency.observe(elapsed, _label(query))
+            slow_query_log.record(query, None, elapsed)
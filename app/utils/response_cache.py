@@ -0,0 +1,113 @@
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, Hashable, Optional, Tuple
+from fastapi import Response
+from fastapi.responses import StreamingResponse
+from app.config import settings
+from app.utils.cache import TTLCache
+from app.utils.etag import conditional_response, strong_etag
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    body: bytes
+    media_type: str
+    etag: str
+
+    def to_response(self, if_none_match: Optional[str] = None) -> Response:
+        return conditional_response(self.body, self.etag, if_none_match, self.media_type, {"X-Cache": "HIT"})
+
+
+class ResponseCache:
+    """
+    Rendered response bodies for read-mostly endpoints, in a TTL + LRU cache.
+
+    Entries belong to a namespace (e.g. "vehicles") and optionally to one
+    item in it. Keys embed a generation counter for the namespace's listings
+    and for the item, so `invalidate` is O(1): bumping the counter makes the
+    old entries unreachable and LRU eviction reclaims them. A response that
+    was being computed while its data changed is stored under the old
+    generation and is therefore never served.
+
+    Per process: other workers see changes after at most `ttl` seconds.
+
+    Entries carry a strong ETag of their body, so hits answer If-None-Match
+    with a 304. A streamed miss has no ETag, as its headers are sent before
+    the body is known.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, max_body: int):
+        self.max_body = max_body
+        self._entries: TTLCache[CachedResponse] = TTLCache(maxsize, ttl)
+        self._generations: Dict[Hashable, int] = {}
+        self._epoch = 0  # bumped by `clear`
+
+    def key(self, namespace: str, route: str, item_id: Optional[int] = None, **params) -> Tuple:
+        """Cache key for `route` with `params`, under the current generation."""
+        generation = (
+            self._generations.get(namespace, 0)
+            if item_id is None
+            else self._generations.get((namespace, item_id), 0)
+        )
+        return (self._epoch, namespace, route, item_id, generation, tuple(sorted(params.items())))
+
+    def get(self, key: Tuple, if_none_match: Optional[str] = None) -> Optional[Response]:
+        cached = self._entries.get(key)
+        return cached.to_response(if_none_match) if cached is not None else None
+
+    def store(
+        self, key: Tuple, body: bytes, media_type: str = "application/json", if_none_match: Optional[str] = None
+    ) -> Response:
+        etag = strong_etag(body)
+        if len(body) <= self.max_body:
+            self._entries.set(key, CachedResponse(body, media_type, etag))
+        return conditional_response(body, etag, if_none_match, media_type, {"X-Cache": "MISS"})
+
+    def store_stream(self, key: Tuple, response: StreamingResponse) -> StreamingResponse:
+        """
+        Pass a streaming response through, keeping a copy of the body. It is
+        cached once fully sent, unless it outgrows `max_body` or the client
+        disconnects first.
+        """
+        source = response.body_iterator
+
+        async def tee() -> AsyncIterator[bytes]:
+            parts: Optional[list] = []
+            size = 0
+            async for chunk in source:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode("utf-8")
+                if parts is not None:
+                    size += len(chunk)
+                    if size <= self.max_body:
+                        parts.append(chunk)
+                    else:
+                        parts = None
+                yield chunk
+            if parts is not None:
+                body = b"".join(parts)
+                self._entries.set(key, CachedResponse(body, response.media_type, strong_etag(body)))
+
+        response.body_iterator = tee()
+        response.headers["X-Cache"] = "MISS"
+        return response
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "hits": self._entries.hits, "misses": self._entries.misses}
+
+    def invalidate(self, namespace: str, item_id: Optional[int] = None) -> None:
+        """Drop the namespace's listings and, if given, the item's own entries."""
+        self._generations[namespace] = self._generations.get(namespace, 0) + 1
+        if item_id is not None:
+            self._generations[(namespace, item_id)] = self._generations.get((namespace, item_id), 0) + 1
+
+    def clear(self) -> None:
+        """Drop everything, e.g. when data shared by all namespaces changes."""
+        self._epoch += 1
+        self._entries.clear()
+
+
+response_cache = ResponseCache(
+    settings.RESPONSE_CACHE_SIZE,
+    settings.RESPONSE_CACHE_TTL,
+    settings.RESPONSE_CACHE_MAX_BODY,
+)
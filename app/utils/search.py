@@ -0,0 +1,101 @@
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+from fastapi import HTTPException, status
+from psycopg import AsyncCursor
+from app.utils.pagination import encode_cursor, decode_cursor
+
+
+@dataclass(frozen=True)
+class SortOption:
+    """
+    A keyset ordering: by `column` (then `id` as tie-breaker), or by `id`
+    alone when `column` is None. Sorting by a column skips rows where it is
+    NULL, since NULLs can't take part in the keyset comparison.
+    """
+    column: Optional[str]
+    descending: bool
+    type: type = float
+
+    @property
+    def field(self) -> Optional[str]:
+        """Name of the sort column in result rows."""
+        return self.column.rsplit(".", 1)[-1] if self.column else None
+
+
+def build_search_query(
+    select: str,
+    id_column: str,
+    filters: List[Tuple[str, Any]],
+    sorts: Dict[str, SortOption],
+    sort: str,
+    cursor: Optional[str],
+    limit: int,
+) -> Tuple[str, List[Any]]:
+    """
+    Add WHERE, ORDER BY and LIMIT to `select` for one page of results.
+
+    `filters` are (condition, value) pairs, each condition holding one `%s`;
+    pairs whose value is None are left out. Reads `limit + 1` rows so the
+    caller can tell whether there is a next page.
+    """
+    option = sorts.get(sort)
+    if option is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown sort, expected one of: {', '.join(sorts)}",
+        )
+
+    conditions = [condition for condition, value in filters if value is not None]
+    params = [value for _, value in filters if value is not None]
+    direction, comparison = ("DESC", "<") if option.descending else ("ASC", ">")
+
+    if option.column is None:
+        order = f"{id_column} {direction}"
+        if cursor:
+            conditions.append(f"{id_column} {comparison} %s")
+            params += _decode(cursor, sort, (int,))
+    else:
+        order = f"{option.column} {direction}, {id_column} {direction}"
+        conditions.append(f"{option.column} IS NOT NULL")
+        if cursor:
+            conditions.append(f"({option.column}, {id_column}) {comparison} (%s, %s)")
+            params += _decode(cursor, sort, (option.type, int))
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return f"{select} {where} ORDER BY {order} LIMIT %s", params + [limit + 1]
+
+
+def _decode(cursor: str, sort: str, types: Tuple[type, ...]) -> List[Any]:
+    # Cursors start with the sort they were made for
+    values = decode_cursor(cursor, (str, *types))
+    if values[0] != sort:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor",
+        )
+    return values[1:]
+
+
+async def fetch_search_page(
+    cur: AsyncCursor, query: str, params: List[Any], limit: int, sorts: Dict[str, SortOption], sort: str
+) -> Tuple[List[dict], Optional[str]]:
+    """Run a query from `build_search_query`; returns the rows and the next page's cursor."""
+    await cur.execute(query, params)
+    rows = await cur.fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        field = sorts[sort].field
+        if field is None:
+            next_cursor = encode_cursor(sort, last["id"])
+        else:
+            next_cursor = encode_cursor(sort, last[field], last["id"])
+    return rows, next_cursor
+
+
+def sort_fields(sorts: Dict[str, SortOption], sort: str) -> Tuple[str, ...]:
+    """Fields a page must select to build its cursor."""
+    option = sorts.get(sort)
+    return ("id", option.field) if option and option.field else ("id",)
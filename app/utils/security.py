@@ -1,9 +1,133 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional, Tuple
+from fastapi import HTTPException, status
 from passlib.context import CryptContext
+from app.config import settings
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Pinning min/max to the configured cost makes `needs_update` true for any
+# hash made with a different cost, so changing BCRYPT_ROUNDS upgrades (or
+# downgrades) stored hashes as users log in.
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.BCRYPT_ROUNDS,
+)
 
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
+
+
+class PasswordService:
+    """
+    Runs bcrypt on a dedicated, bounded thread pool so hashing never blocks
+    the event loop. bcrypt releases the GIL, so throughput scales with the
+    number of threads up to the core count.
+
+    At most `queue_size` operations may be queued or running; beyond that
+    callers wait up to `queue_timeout` seconds and then get a 503.
+    """
+
+    def __init__(self, context: CryptContext, workers: int, queue_size: int, queue_timeout: float):
+        self.context = context
+        self.workers = workers
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+
+        # Queue wait metrics: time between submission and a worker picking the job up
+        self._lock = threading.Lock()
+        self._completed = 0
+        self._waiting = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    def _get_slots(self) -> asyncio.Semaphore:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.queue_size)
+        return self._slots
+
+    def _record_wait(self, waited: float) -> None:
+        with self._lock:
+            self._waiting -= 1
+            self._completed += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+
+    async def _run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        slots = self._get_slots()
+        try:
+            await asyncio.wait_for(slots.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, please retry",
+                headers={"Retry-After": "1"},
+            )
+
+        submitted = time.perf_counter()
+        with self._lock:
+            self._waiting += 1
+
+        def job() -> Any:
+            self._record_wait(time.perf_counter() - submitted)
+            return fn(*args)
+
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), job)
+        finally:
+            slots.release()
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.context.hash, password)
+
+    async def verify(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """
+        Check a password. Returns (valid, new_hash): `new_hash` is set when the
+        stored hash was made with outdated parameters and should be replaced.
+        """
+        return await self._run(self.context.verify_and_update, password, hashed_password)
+
+    async def warm_up(self) -> None:
+        """Start the hashing threads now rather than on the first login."""
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        await asyncio.gather(*(loop.run_in_executor(executor, int) for _ in range(self.workers)))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "waiting": self._waiting,
+                "completed": self._completed,
+                "wait_seconds_total": self._wait_total,
+                "wait_seconds_max": self._wait_max,
+                "wait_seconds_avg": self._wait_total / self._completed if self._completed else 0.0,
+            }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+        self._executor, self._slots = None, None
+
+
+password_service = PasswordService(
+    pwd_context,
+    workers=settings.PASSWORD_WORKERS,
+    queue_size=settings.PASSWORD_QUEUE_SIZE,
+    queue_timeout=settings.PASSWORD_QUEUE_TIMEOUT,
+)
@@ -0,0 +1,77 @@
+import uuid
+from typing import Any, AsyncIterator, Callable, Optional, Sequence, Union
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from pydantic_core import to_json
+from app.config import settings
+from app.database import pool
+
+
+def _encode(item: Union[BaseModel, dict]) -> bytes:
+    # Sparse listings serialize rows to plain dicts (see app/utils/projection.py)
+    if isinstance(item, BaseModel):
+        return item.model_dump_json().encode("utf-8")
+    return to_json(item)
+
+
+async def _json_array(
+    query: Any,
+    params: Optional[Sequence[Any]],
+    serialize: Callable[[dict], Union[BaseModel, dict]],
+    batch_size: int,
+) -> AsyncIterator[bytes]:
+    # The connection is checked out here rather than through a request
+    # dependency, because dependencies are torn down before the body is sent.
+    async with pool.connection() as conn:
+        # A named cursor lives on the server: rows are pulled `batch_size` at a
+        # time instead of the whole result set being buffered client side.
+        async with conn.cursor(name=f"stream_{uuid.uuid4().hex}") as cur:
+            cur.itersize = batch_size
+            await cur.execute(query, params)
+            yield b"["
+
+            first = True
+            while True:
+                rows = await cur.fetchmany(batch_size)
+                if not rows:
+                    break
+                items = b",".join(_encode(serialize(row)) for row in rows)
+                yield items if first else b"," + items
+                first = False
+
+            yield b"]"
+
+
+async def stream_json_array(
+    query: Any,
+    params: Optional[Sequence[Any]] = None,
+    *,
+    serialize: Callable[[dict], Union[BaseModel, dict]],
+    batch_size: Optional[int] = None,
+    status_code: int = 200,
+) -> StreamingResponse:
+    """
+    Run `query` on a server-side cursor and stream the rows as a JSON array,
+    serializing one batch at a time, so memory stays bounded by the batch
+    size rather than the table size.
+
+    The query is executed before this returns, so DB errors still surface in
+    the caller's try/except and can become a normal 500 response.
+    """
+    body = _json_array(query, params, serialize, batch_size or settings.STREAM_BATCH_SIZE)
+    try:
+        opening = await body.__anext__()
+    except BaseException:
+        await body.aclose()
+        raise
+
+    async def content() -> AsyncIterator[bytes]:
+        try:
+            yield opening
+            async for chunk in body:
+                yield chunk
+        finally:
+            # Release the connection promptly if the client goes away mid-stream.
+            await body.aclose()
+
+    return StreamingResponse(content(), status_code=status_code, media_type="application/json")
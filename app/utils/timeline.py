@@ -0,0 +1,137 @@
+from typing import FrozenSet, Optional
+from psycopg import AsyncCursor
+from app.config import settings
+from app.schemas.post import PostPage
+from app.utils.cache import TTLCache
+from app.utils.follow_graph import follow_graph
+from app.utils.pagination import encode_cursor, decode_cursor
+from app.utils.posts import row_to_post
+
+# Per-user timelines hold (user_id, post_id) pairs, newest post id first.
+# Posts are written into the timeline of every follower when they are
+# created (fan-out-on-write). Accounts with more than
+# FEED_FANOUT_MAX_FOLLOWERS followers are skipped at write time and their
+# posts are merged in when a feed is read (fan-out-on-read).
+
+POST_COLUMNS = """
+        posts.id,
+        posts.poster_id,
+        posts.caption,
+        posts.images,
+        posts.video_url,
+        posts.location,
+        posts.tagged_users,
+        posts.created_at,
+        posts.likes,
+        users.username,
+        users.profile_pic
+"""
+
+FAN_OUT_QUERY = b"""
+    INSERT INTO timeline (user_id, post_id)
+    SELECT user_id, %(post_id)s FROM follow WHERE follower_id = %(poster_id)s AND is_followed = TRUE
+    UNION
+    SELECT %(poster_id)s, %(post_id)s
+    ON CONFLICT DO NOTHING
+"""
+
+BACKFILL_QUERY = b"""
+    INSERT INTO timeline (user_id, post_id)
+    SELECT %s, id FROM posts WHERE poster_id = %s ORDER BY id DESC LIMIT %s
+    ON CONFLICT DO NOTHING
+"""
+
+REMOVE_FOLLOWEE_QUERY = b"""
+    DELETE FROM timeline
+    USING posts
+    WHERE timeline.user_id = %s AND timeline.post_id = posts.id AND posts.poster_id = %s
+"""
+
+CELEBRITIES_QUERY = b"""
+    SELECT follower_id FROM follow
+    WHERE is_followed = TRUE
+    GROUP BY follower_id
+    HAVING count(*) > %s
+"""
+
+TIMELINE_QUERY = f"""
+    SELECT {POST_COLUMNS}
+    FROM timeline
+    JOIN posts ON posts.id = timeline.post_id
+    JOIN users ON posts.poster_id = users.id
+    WHERE timeline.user_id = %s AND timeline.post_id < %s
+    ORDER BY timeline.post_id DESC
+    LIMIT %s
+"""
+
+FAN_OUT_ON_READ_QUERY = f"""
+    SELECT {POST_COLUMNS}
+    FROM posts
+    JOIN users ON posts.poster_id = users.id
+    WHERE posts.poster_id = ANY(%s) AND posts.id < %s
+    ORDER BY posts.id DESC
+    LIMIT %s
+"""
+
+# Larger than any serial id; used as the upper bound of the first page.
+FIRST_PAGE = 2**31
+
+_celebrities: TTLCache[FrozenSet[int]] = TTLCache(1, settings.FEED_CELEBRITY_TTL)
+
+
+async def celebrities(cur: AsyncCursor) -> FrozenSet[int]:
+    """Users whose posts are not fanned out on write."""
+    result = _celebrities.get("all")
+    if result is None:
+        await cur.execute(CELEBRITIES_QUERY, (settings.FEED_FANOUT_MAX_FOLLOWERS,))
+        result = frozenset(row["follower_id"] for row in await cur.fetchall())
+        _celebrities.set("all", result)
+    return result
+
+
+async def fan_out_post(cur: AsyncCursor, post_id: int, poster_id: int) -> None:
+    """
+    Add a new post to its author's and followers' timelines, unless the
+    author has too many followers; their posts are pulled in on read.
+    Runs in the caller's transaction.
+    """
+    followers = await follow_graph.followers(cur, poster_id)
+    if len(followers) > settings.FEED_FANOUT_MAX_FOLLOWERS:
+        return
+    await cur.execute(FAN_OUT_QUERY, {"post_id": post_id, "poster_id": poster_id})
+
+
+async def backfill_timeline(cur: AsyncCursor, user_id: int, followee_id: int) -> None:
+    """Copy a newly followed user's recent posts into the follower's timeline."""
+    await cur.execute(BACKFILL_QUERY, (user_id, followee_id, settings.FEED_BACKFILL_POSTS))
+
+
+async def remove_followee(cur: AsyncCursor, user_id: int, followee_id: int) -> None:
+    """Drop an unfollowed user's posts from the follower's timeline."""
+    await cur.execute(REMOVE_FOLLOWEE_QUERY, (user_id, followee_id))
+
+
+async def fetch_feed_page(cur: AsyncCursor, user_id: int, limit: int, cursor: Optional[str] = None) -> PostPage:
+    """
+    One page of `user_id`'s following feed, newest first. Reads at most
+    `limit + 1` rows from the timeline and, if the user follows any
+    high-follower accounts, `limit + 1` rows from their posts.
+    """
+    before = decode_cursor(cursor, (int,))[0] if cursor else FIRST_PAGE
+
+    await cur.execute(TIMELINE_QUERY, (user_id, before, limit + 1))
+    rows = await cur.fetchall()
+
+    pulled = (await follow_graph.following(cur, user_id)) & (await celebrities(cur))
+    if pulled:
+        await cur.execute(FAN_OUT_ON_READ_QUERY, (list(pulled), before, limit + 1))
+        seen = {row["id"] for row in rows}
+        rows += [row for row in await cur.fetchall() if row["id"] not in seen]
+        rows.sort(key=lambda row: row["id"], reverse=True)
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["id"])
+
+    return PostPage(posts=[row_to_post(row) for row in rows], next_cursor=next_cursor)
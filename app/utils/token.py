@@ -19,9 +19,14 @@ def create_access_token(data: dict):
     return encoded_jwt
 
 
+def decode_token(token: str) -> dict:
+    """Decode and validate a token, including `exp`. Raises JWTError."""
+    return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+
+
 def verify_token(token: str, credentials_exception):
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_token(token)
         email: str = payload.get("sub")
         if email is None:
             raise credentials_exception
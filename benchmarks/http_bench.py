@@ -0,0 +1,266 @@
+"""
+End-to-end HTTP benchmark of app.main:app.
+
+Requests go through httpx's in-process ASGI transport, so the numbers cover
+routing, validation, database round trips and serialization but not the
+network or the ASGI server. The app runs its normal lifespan against the
+database named by the DB_* environment variables.
+
+    # once: restore db-dump.sql into a local Postgres and add synthetic data
+    DB_HOST=localhost DB_PASSWORD=... python -m benchmarks.http_bench --seed-db --output base.json
+
+    # later, e.g. on another commit
+    DB_HOST=localhost DB_PASSWORD=... python -m benchmarks.http_bench --output new.json --compare base.json
+
+Each endpoint is first measured on its own (throughput and latency
+percentiles at the given concurrency), then once more, sequentially, under
+tracemalloc for memory allocated per request. Finally all endpoints run
+together as a weighted mix. Results are written as JSON; `--compare`
+reports the endpoints that got slower than a previous run and exits with
+status 1 if any did by more than `--threshold`.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, List
+
+# No geocoding lookups during a run; set before the app reads its settings
+os.environ.setdefault("GEOCODER_BACKEND", "none")
+
+import httpx  # noqa: E402
+from benchmarks.scenarios import Context, Endpoint, load_context, select  # noqa: E402
+from benchmarks.seed import PASSWORD, populate, restore  # noqa: E402
+
+SCHEMA_VERSION = 1
+
+
+def percentile(ordered: List[float], q: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    if not ordered:
+        return 0.0
+    rank = max(1, round(q / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> dict:
+    ordered = sorted(latencies)
+    return {
+        "requests": len(ordered),
+        "errors": errors,
+        "throughput_rps": round(len(ordered) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "mean": round(sum(ordered) / len(ordered), 3) if ordered else 0.0,
+            "p50": round(percentile(ordered, 50), 3),
+            "p95": round(percentile(ordered, 95), 3),
+            "p99": round(percentile(ordered, 99), 3),
+            "max": round(ordered[-1], 3) if ordered else 0.0,
+        },
+    }
+
+
+class Runner:
+    def __init__(self, client: httpx.AsyncClient, ctx: Context, seed: int):
+        self.client = client
+        self.ctx = ctx
+        self.rng = random.Random(seed)
+        self.unexpected: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+
+    async def send(self, endpoint: Endpoint) -> bool:
+        request = endpoint.build(self.rng, self.ctx)
+        response = await self.client.request(request.method, request.url, json=request.json, headers=request.headers)
+        await response.aread()
+        if response.status_code in endpoint.expected:
+            return True
+        self.unexpected[endpoint.name][response.status_code] += 1
+        return False
+
+    async def load(self, pick, total: int, concurrency: int) -> Dict[str, dict]:
+        """Send `total` requests from `concurrency` tasks; `pick()` chooses each endpoint."""
+        latencies: Dict[str, List[float]] = defaultdict(list)
+        errors: Dict[str, int] = defaultdict(int)
+        remaining = total
+
+        async def worker() -> None:
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                endpoint = pick()
+                started = time.perf_counter()
+                ok = await self.send(endpoint)
+                latencies[endpoint.name].append((time.perf_counter() - started) * 1000)
+                if not ok:
+                    errors[endpoint.name] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        return {name: summarize(values, errors[name], elapsed) for name, values in latencies.items()}
+
+    async def allocations(self, endpoint: Endpoint, count: int) -> dict:
+        """Python memory allocated per request, sequentially, under tracemalloc."""
+        peaks, retained = [], []
+        tracemalloc.start()
+        try:
+            for _ in range(count):
+                tracemalloc.reset_peak()
+                before, _ = tracemalloc.get_traced_memory()
+                await self.send(endpoint)
+                after, peak = tracemalloc.get_traced_memory()
+                peaks.append(peak - before)
+                retained.append(after - before)
+        finally:
+            tracemalloc.stop()
+        return {
+            "samples": count,
+            "peak_bytes_mean": round(sum(peaks) / count),
+            "retained_bytes_mean": round(sum(retained) / count),
+        }
+
+
+async def run(args) -> dict:
+    from app.database import pool
+    from app.main import app
+
+    async with app.router.lifespan_context(app):
+        await pool.wait(timeout=30)
+        async with pool.connection() as conn:
+            ctx = await load_context(conn)
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            runner = Runner(client, ctx, args.seed)
+            login = await client.post("/login", json={"email": ctx.emails[ctx.users[0]], "password": PASSWORD})
+            ctx.token = login.json().get("access_token")
+
+            endpoints = select(args.endpoints)
+            results: Dict[str, dict] = {}
+            for endpoint in endpoints:
+                await runner.load(lambda: endpoint, args.warmup, args.concurrency)
+                stats = await runner.load(lambda: endpoint, args.requests, args.concurrency)
+                results[endpoint.name] = stats[endpoint.name]
+                results[endpoint.name]["allocations"] = await runner.allocations(endpoint, args.alloc_samples)
+                print(f"{endpoint.name:28} {_line(results[endpoint.name])}", file=sys.stderr)
+
+            # In the mix, an endpoint's throughput is its share of the total
+            mix = {}
+            if args.mix_requests:
+                rng = random.Random(args.seed)
+                weights = [e.weight for e in endpoints]
+                mix = await runner.load(
+                    lambda: rng.choices(endpoints, weights)[0], args.mix_requests, args.concurrency
+                )
+                total = sum(stats["requests"] for stats in mix.values())
+                print(f"{'mix':28} {total} requests", file=sys.stderr)
+
+    return {
+        "schema": SCHEMA_VERSION,
+        "meta": _meta(args),
+        "endpoints": results,
+        "mix": mix,
+        "unexpected_status": {name: dict(codes) for name, codes in runner.unexpected.items()},
+    }
+
+
+def _line(stats: dict) -> str:
+    latency = stats["latency_ms"]
+    return (
+        f"{stats['throughput_rps']:>9.1f} rps  p50 {latency['p50']:>8.2f}  p95 {latency['p95']:>8.2f}"
+        f"  p99 {latency['p99']:>8.2f} ms  errors {stats['errors']}"
+    )
+
+
+def _meta(args) -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "config": {
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "concurrency": args.concurrency,
+            "alloc_samples": args.alloc_samples,
+            "mix_requests": args.mix_requests,
+            "seed": args.seed,
+        },
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> bool:
+    """Print per-endpoint changes against `baseline`; True if any regressed beyond `threshold`."""
+    regressed = False
+    if current["meta"]["config"] != baseline["meta"]["config"]:
+        print("warning: runs used different settings", file=sys.stderr)
+    for name, stats in current["endpoints"].items():
+        old = baseline["endpoints"].get(name)
+        if old is None:
+            continue
+        changes = {
+            "p50": stats["latency_ms"]["p50"] / old["latency_ms"]["p50"] - 1 if old["latency_ms"]["p50"] else 0,
+            "p95": stats["latency_ms"]["p95"] / old["latency_ms"]["p95"] - 1 if old["latency_ms"]["p95"] else 0,
+            "rps": old["throughput_rps"] / stats["throughput_rps"] - 1 if stats["throughput_rps"] else 0,
+        }
+        # Slowdowns are positive for all three: latency up, or throughput down
+        worst = max(changes.values())
+        flag = "REGRESSION" if worst > threshold else ""
+        regressed |= worst > threshold
+        print(
+            f"{name:28} p50 {changes['p50']:+7.1%}  p95 {changes['p95']:+7.1%}  time/req {changes['rps']:+7.1%}  {flag}",
+            file=sys.stderr,
+        )
+    return regressed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed-db", dest="seed_db", action="store_true", help="restore db-dump.sql and add synthetic data first")
+    parser.add_argument("--seed", type=int, default=42, help="random seed for data and requests")
+    parser.add_argument("--allow-remote", action="store_true", help="allow --seed-db on a non-local DB_HOST")
+    parser.add_argument("--endpoints", nargs="*", help="only endpoints whose name starts with one of these")
+    parser.add_argument("--requests", type=int, default=500, help="measured requests per endpoint")
+    parser.add_argument("--warmup", type=int, default=50, help="unmeasured requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--alloc-samples", type=int, default=20, help="requests per endpoint under tracemalloc")
+    parser.add_argument("--mix-requests", type=int, default=2000, help="requests in the weighted mix (0 to skip)")
+    parser.add_argument("--output", help="write results here instead of stdout")
+    parser.add_argument("--compare", help="results of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative slowdown counted as a regression")
+    args = parser.parse_args()
+
+    if args.seed_db:
+        restore(allow_remote=args.allow_remote)
+        print(f"seeded: {populate(args.seed)}", file=sys.stderr)
+
+    results = asyncio.run(run(args))
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
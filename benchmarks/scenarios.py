@@ -0,0 +1,165 @@
+"""
+The requests the benchmark sends. Each Endpoint builds one request from a
+shared random generator and the ids found in the database, so a run is
+reproducible for a given seed. Weights set how often an endpoint appears in
+the mixed workload and roughly follow how the mobile app uses the API: feeds
+and listings dominate, writes are rare. Registration is left out: it sends
+email.
+"""
+import random
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Any, Callable, Dict, FrozenSet, List, Optional
+from benchmarks.seed import BOOKINGS_FROM, LOCATIONS, PASSWORD
+
+
+@dataclass
+class Context:
+    """Ids of seeded rows, loaded once before the run."""
+    users: List[int]
+    emails: Dict[int, str]
+    posts: List[int]
+    vehicles: List[int]
+    equipments: List[int]
+    guides: List[int]
+    bookings: List[int]
+    token: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class Request:
+    method: str
+    url: str
+    json: Any = None
+    headers: Dict[str, str] = field(default_factory=dict)
+
+
+@dataclass(frozen=True)
+class Endpoint:
+    name: str
+    weight: int
+    build: Callable[[random.Random, Context], Request]
+    expected: FrozenSet[int] = frozenset({200})
+
+
+def _user(rng: random.Random, ctx: Context) -> int:
+    return rng.choice(ctx.users)
+
+
+def _book(rng: random.Random, ctx: Context) -> Request:
+    # Random dates, so some attempts collide with existing bookings (409)
+    kind, items = rng.choice([("vehicle", ctx.vehicles), ("equipment", ctx.equipments), ("guide", ctx.guides)])
+    start = BOOKINGS_FROM + timedelta(days=rng.randint(0, 720))
+    return Request("POST", "/book", json={
+        "type": kind,
+        "provider_id": _user(rng, ctx),
+        "customer_id": _user(rng, ctx),
+        "item_id": rng.choice(items),
+        "book_date": BOOKINGS_FROM.isoformat(),
+        "book_time": "09:00:00+00:00",
+        "service_date": start.isoformat(),
+        "service_time": "09:00:00+00:00",
+        "deliver_date": (start + timedelta(days=rng.randint(0, 3))).isoformat(),
+        "deliver_time": "17:00:00+00:00",
+        "quantity": 1,
+        "status": "confirmed",
+    })
+
+
+def _availability(rng: random.Random, ctx: Context) -> Request:
+    kind, items = rng.choice([("vehicle", ctx.vehicles), ("equipment", ctx.equipments), ("guide", ctx.guides)])
+    start = BOOKINGS_FROM + timedelta(days=rng.randint(0, 300))
+    end = start + timedelta(days=60)
+    return Request("GET", f"/availability/{kind}/{rng.choice(items)}?from={start}&to={end}")
+
+
+ENDPOINTS: List[Endpoint] = [
+    # auth
+    Endpoint("auth.login", 1, lambda rng, ctx: Request(
+        "POST", "/login", json={"email": ctx.emails[_user(rng, ctx)], "password": PASSWORD},
+    )),
+    Endpoint("auth.secure_endpoint", 2, lambda rng, ctx: Request(
+        "GET", "/secure-endpoint", headers={"Authorization": f"Bearer {ctx.token}"},
+    )),
+    # home and feed
+    Endpoint("home.get_all_posts", 8, lambda rng, ctx: Request("GET", "/get_all_posts?limit=20")),
+    Endpoint("feed.get_feed", 8, lambda rng, ctx: Request("GET", f"/feed/{_user(rng, ctx)}?limit=20")),
+    # posts
+    Endpoint("posts.get_all", 3, lambda rng, ctx: Request("GET", "/posts/get_all?limit=20")),
+    Endpoint("posts.get_post", 4, lambda rng, ctx: Request("GET", f"/posts/{rng.choice(ctx.posts)}")),
+    Endpoint("posts.like", 3, lambda rng, ctx: Request(
+        "POST", "/posts/like", json={"post_id": rng.choice(ctx.posts), "user_id": _user(rng, ctx)},
+    )),
+    Endpoint("posts.unlike", 1, lambda rng, ctx: Request(
+        "POST", "/posts/unlike", json={"post_id": rng.choice(ctx.posts), "user_id": _user(rng, ctx)},
+    )),
+    # profile
+    Endpoint("profile.get_profile", 4, lambda rng, ctx: Request("GET", f"/profile/{_user(rng, ctx)}")),
+    Endpoint("profile.get_posts", 3, lambda rng, ctx: Request("GET", f"/profile/posts/{_user(rng, ctx)}")),
+    # follow
+    Endpoint("follow.follow", 1, lambda rng, ctx: Request(
+        "POST", "/follow", json={"user_id": _user(rng, ctx), "follower_id": _user(rng, ctx)},
+    ), expected=frozenset({200, 201})),
+    Endpoint("follow.unfollow", 1, lambda rng, ctx: Request(
+        "POST", "/unfollow", json={"user_id": _user(rng, ctx), "follower_id": _user(rng, ctx)},
+    ), expected=frozenset({200, 404})),
+    Endpoint("follow.counts", 2, lambda rng, ctx: Request("GET", f"/follow/counts/{_user(rng, ctx)}")),
+    Endpoint("follow.followers", 1, lambda rng, ctx: Request("GET", f"/followers/{_user(rng, ctx)}")),
+    Endpoint("follow.check", 2, lambda rng, ctx: Request(
+        "POST", "/follow/check", json={"user_id": _user(rng, ctx), "target_ids": rng.sample(ctx.users, 20)},
+    )),
+    # booking
+    Endpoint("booking.book", 1, _book, expected=frozenset({201, 409})),
+    Endpoint("booking.availability", 2, _availability),
+    Endpoint("booking.get_booking", 1, lambda rng, ctx: Request("GET", f"/bookings/{rng.choice(ctx.bookings)}")),
+    # services
+    Endpoint("vehicles.all", 2, lambda rng, ctx: Request("GET", "/vehicles/all")),
+    Endpoint("vehicles.search", 3, lambda rng, ctx: Request(
+        "GET", f"/vehicles/search?location={rng.choice(LOCATIONS)}&sort=price_asc&limit=20",
+    )),
+    Endpoint("vehicles.get", 3, lambda rng, ctx: Request("GET", f"/vehicles/{rng.choice(ctx.vehicles)}")),
+    Endpoint("equipment.all", 1, lambda rng, ctx: Request("GET", "/equipment/all")),
+    Endpoint("equipment.search", 2, lambda rng, ctx: Request(
+        "GET", f"/equipment/search?location={rng.choice(LOCATIONS)}&sort=price_asc&limit=20",
+    )),
+    Endpoint("equipment.get", 2, lambda rng, ctx: Request("GET", f"/equipment/{rng.choice(ctx.equipments)}")),
+    Endpoint("guides.all", 1, lambda rng, ctx: Request("GET", "/guides_all")),
+    Endpoint("guides.search", 2, lambda rng, ctx: Request(
+        "GET", f"/guides/search?location={rng.choice(LOCATIONS)}&sort=price_asc&limit=20",
+    )),
+    Endpoint("guides.get", 2, lambda rng, ctx: Request("GET", f"/guides/{rng.choice(ctx.guides)}")),
+    Endpoint("nearby.get_nearby", 2, lambda rng, ctx: Request(
+        "GET", f"/nearby?lat={rng.uniform(5.9, 9.8):.5f}&lon={rng.uniform(79.7, 81.9):.5f}&radius_km=25",
+    )),
+]
+
+CONTEXT_QUERIES: Dict[str, str] = {
+    "posts": "SELECT id FROM posts ORDER BY id",
+    "vehicles": "SELECT id FROM vehicles ORDER BY id",
+    "equipments": "SELECT id FROM equipments ORDER BY id",
+    "guides": "SELECT id FROM guides ORDER BY id",
+    "bookings": "SELECT id FROM booking ORDER BY id",
+}
+
+
+async def load_context(conn) -> Context:
+    """Ids of the seeded rows. Only seeded users are used, as only their password is known."""
+    cur = await conn.execute("SELECT id, email FROM users WHERE email LIKE %s ORDER BY id", ("%@bench.travelpoint",))
+    emails = {row["id"]: row["email"] for row in await cur.fetchall()}
+    if not emails:
+        raise SystemExit("No benchmark users found; run with --seed-db first")
+    ids: Dict[str, List[int]] = {}
+    for name, query in CONTEXT_QUERIES.items():
+        cur = await conn.execute(query)
+        ids[name] = [row["id"] for row in await cur.fetchall()]
+    return Context(users=list(emails), emails=emails, **ids)
+
+
+def select(names: Optional[List[str]]) -> List[Endpoint]:
+    """Endpoints whose name starts with any of `names` (all if None)."""
+    if not names:
+        return ENDPOINTS
+    chosen = [e for e in ENDPOINTS if any(e.name.startswith(name) for name in names)]
+    if not chosen:
+        raise SystemExit(f"No endpoints match {names}; known: {', '.join(e.name for e in ENDPOINTS)}")
+    return chosen
@@ -0,0 +1,171 @@
+"""
+Benchmark database: db-dump.sql restored into an empty public schema and
+the migrations applied on top, as deployment/Dockerfile.db does for a new
+database, then a deterministic synthetic data set so every run (and every
+commit) sees the same rows.
+
+Reads the same DB_* environment variables as the app. Refuses to touch
+anything but a local server unless told otherwise, since it drops and
+recreates every table.
+"""
+import os
+import random
+import subprocess
+from datetime import date, time, timedelta
+from pathlib import Path
+from typing import Dict
+import psycopg
+from app.config import settings
+
+ROOT = Path(__file__).resolve().parent.parent
+DUMP = ROOT / "db-dump.sql"
+MIGRATIONS = ROOT / "migrations"
+
+LOCAL_HOSTS = {"localhost", "127.0.0.1", "::1", ""}
+
+# Every seeded user logs in with this password
+PASSWORD = "benchmark-password"
+
+SIZES = {
+    "users": 500,
+    "posts_per_user": 10,
+    "follows_per_user": 20,
+    "vehicles": 300,
+    "equipments": 300,
+    "guides": 150,
+    "bookings": 1000,
+}
+
+# Seeded bookings start on this day
+BOOKINGS_FROM = date(2025, 1, 1)
+
+LOCATIONS = ["Colombo", "Kandy", "Galle", "Ella", "Jaffna", "Trincomalee", "Nuwara Eliya", "Sigiriya"]
+VEHICLE_TYPES = ["car", "van", "bus", "tuk-tuk", "jeep"]
+EQUIPMENT_TYPES = ["tent", "backpack", "kayak", "bicycle", "camera"]
+LANGUAGES = ["English", "Sinhala", "Tamil", "German", "French"]
+
+
+def _run(*command: str) -> None:
+    subprocess.run(command, check=True, env={**os.environ, "PGPASSWORD": settings.DB_PASSWORD})
+
+
+def restore(allow_remote: bool = False) -> None:
+    """Restore db-dump.sql into the configured database and apply the migrations in order."""
+    if settings.DB_HOST not in LOCAL_HOSTS and not allow_remote:
+        raise SystemExit(f"Refusing to seed non-local database host {settings.DB_HOST!r}")
+
+    connection = ["-h", settings.DB_HOST, "-p", settings.DB_PORT, "-U", settings.DB_USER, "-d", settings.DB_NAME]
+    # pg_restore --clean can't drop the dumped tables while tables added by
+    # the migrations reference them, so start from an empty schema instead
+    _run("psql", "-q", "-v", "ON_ERROR_STOP=1", *connection, "-c", "DROP SCHEMA IF EXISTS public CASCADE; CREATE SCHEMA public;")
+    _run("pg_restore", "--no-owner", *connection, str(DUMP))
+    for migration in sorted(MIGRATIONS.glob("*.sql")):
+        _run("psql", "-q", "-v", "ON_ERROR_STOP=1", *connection, "-f", str(migration))
+
+
+def _coordinates(rng: random.Random):
+    # Sri Lanka's bounding box
+    return round(rng.uniform(5.9, 9.8), 6), round(rng.uniform(79.7, 81.9), 6)
+
+
+def populate(seed: int = 42) -> Dict[str, int]:
+    """Insert the synthetic data set; returns the number of rows per table."""
+    from app.utils.security import hash_password
+
+    rng = random.Random(seed)
+    password = hash_password(PASSWORD)
+    counts: Dict[str, int] = {}
+
+    with psycopg.connect(settings.DSN) as conn, conn.cursor() as cur:
+        with cur.copy(
+            "COPY users (first_name, last_name, username, phone_number, location, password, nic_passport, email) FROM STDIN"
+        ) as copy:
+            for i in range(SIZES["users"]):
+                copy.write_row((
+                    f"First{i}", f"Last{i}", f"user{i}", 770000000 + i, rng.choice(LOCATIONS),
+                    password, f"NIC{i:08d}", f"user{i}@bench.travelpoint",
+                ))
+        cur.execute("SELECT id FROM users WHERE email LIKE %s ORDER BY id", ("%@bench.travelpoint",))
+        users = [row[0] for row in cur.fetchall()]
+        counts["users"] = len(users)
+
+        with cur.copy(
+            "COPY posts (poster_id, caption, images, video_url, location, latitude, longitude) FROM STDIN"
+        ) as copy:
+            for user_id in users:
+                for n in range(SIZES["posts_per_user"]):
+                    images = [f"{rng.getrandbits(64):016x}.jpg" for _ in range(rng.randint(0, 3))]
+                    copy.write_row((
+                        user_id, f"Post {n} by user {user_id}", images, None,
+                        rng.choice(LOCATIONS), *_coordinates(rng),
+                    ))
+        counts["posts"] = len(users) * SIZES["posts_per_user"]
+
+        with cur.copy("COPY follow (user_id, follower_id, is_followed) FROM STDIN") as copy:
+            for user_id in users:
+                for followed in rng.sample(users, SIZES["follows_per_user"]):
+                    if followed != user_id:
+                        copy.write_row((user_id, followed, True))
+        # Same rows as fan-out on write (app/utils/timeline.py) would have produced
+        cur.execute("""
+            INSERT INTO timeline (user_id, post_id)
+            SELECT follow.user_id, posts.id FROM follow JOIN posts ON posts.poster_id = follow.follower_id
+            WHERE follow.is_followed
+            UNION
+            SELECT poster_id, id FROM posts
+            ON CONFLICT DO NOTHING
+        """)
+        counts["timeline"] = cur.rowcount
+
+        with cur.copy(
+            "COPY vehicles (owner_id, type, capacity, milage, price, description, photo_path, location, latitude, longitude) FROM STDIN"
+        ) as copy:
+            for i in range(SIZES["vehicles"]):
+                copy.write_row((
+                    rng.choice(users), rng.choice(VEHICLE_TYPES), rng.randint(2, 40), rng.uniform(0, 200000),
+                    round(rng.uniform(20, 400), 2), f"Vehicle {i}", f"{rng.getrandbits(64):016x}.jpg",
+                    rng.choice(LOCATIONS), *_coordinates(rng),
+                ))
+        with cur.copy(
+            "COPY equipments (owner_id, type, description, price_per_day, photo_path, location, latitude, longitude) FROM STDIN"
+        ) as copy:
+            for i in range(SIZES["equipments"]):
+                copy.write_row((
+                    rng.choice(users), rng.choice(EQUIPMENT_TYPES), f"Equipment {i}", round(rng.uniform(2, 80), 2),
+                    f"{rng.getrandbits(64):016x}.jpg", rng.choice(LOCATIONS), *_coordinates(rng),
+                ))
+        with cur.copy(
+            "COPY guides (user_id, language, location, preference, about, price, latitude, longitude) FROM STDIN"
+        ) as copy:
+            for user_id in rng.sample(users, SIZES["guides"]):
+                copy.write_row((
+                    user_id, rng.choice(LANGUAGES), rng.choice(LOCATIONS), "Hiking", f"Guide {user_id}",
+                    round(rng.uniform(10, 150), 2), *_coordinates(rng),
+                ))
+        counts.update(vehicles=SIZES["vehicles"], equipments=SIZES["equipments"], guides=SIZES["guides"])
+
+        # Back-to-back, non-overlapping bookings per item
+        items = {}
+        for kind, table in (("vehicle", "vehicles"), ("equipment", "equipments"), ("guide", "guides")):
+            cur.execute(f"SELECT id FROM {table} ORDER BY id")
+            items[kind] = [row[0] for row in cur.fetchall()]
+        next_free: Dict[tuple, date] = {}
+        today = BOOKINGS_FROM
+        with cur.copy(
+            "COPY booking (type, provider_id, customer_id, item_id, book_date, book_time, service_date, service_time, "
+            "deliver_date, deliver_time, quantity, status) FROM STDIN"
+        ) as copy:
+            for _ in range(SIZES["bookings"]):
+                kind = rng.choice(list(items))
+                item_id = rng.choice(items[kind])
+                start = next_free.get((kind, item_id), today) + timedelta(days=rng.randint(0, 10))
+                end = start + timedelta(days=rng.randint(0, 6))
+                next_free[(kind, item_id)] = end + timedelta(days=1)
+                copy.write_row((
+                    kind, rng.choice(users), rng.choice(users), item_id, today, time(9, 0),
+                    start, time(9, 0), end, time(17, 0), 1, "confirmed",
+                ))
+        counts["booking"] = SIZES["bookings"]
+
+        cur.execute("ANALYZE")
+    return counts
@@ -0,0 +1,70 @@
+-- Brings the tables restored from db-dump.sql up to the schema the API
+-- queries: columns the dump predates, a few renamed ones, and the authority
+-- table it lacks. Runs before every other migration, which build on these
+-- columns. Safe on a database that already has them.
+
+-- Renames: copy the dump's names over only where the new column is missing
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM information_schema.columns
+               WHERE table_schema = 'public' AND table_name = 'guides' AND column_name = 'description')
+       AND NOT EXISTS (SELECT 1 FROM information_schema.columns
+                       WHERE table_schema = 'public' AND table_name = 'guides' AND column_name = 'about') THEN
+        ALTER TABLE public.guides RENAME COLUMN description TO about;
+    END IF;
+
+    IF EXISTS (SELECT 1 FROM information_schema.columns
+               WHERE table_schema = 'public' AND table_name = 'booking' AND column_name = 'booked_date')
+       AND NOT EXISTS (SELECT 1 FROM information_schema.columns
+                       WHERE table_schema = 'public' AND table_name = 'booking' AND column_name = 'book_date') THEN
+        ALTER TABLE public.booking RENAME COLUMN booked_date TO book_date;
+        ALTER TABLE public.booking RENAME COLUMN booked_time TO book_time;
+    END IF;
+
+    -- follow.status was the "is following" flag
+    IF NOT EXISTS (SELECT 1 FROM information_schema.columns
+                   WHERE table_schema = 'public' AND table_name = 'follow' AND column_name = 'is_followed') THEN
+        ALTER TABLE public.follow ADD COLUMN is_followed boolean NOT NULL DEFAULT false;
+        IF EXISTS (SELECT 1 FROM information_schema.columns
+                   WHERE table_schema = 'public' AND table_name = 'follow' AND column_name = 'status') THEN
+            UPDATE public.follow SET is_followed = COALESCE(status, false);
+        END IF;
+    END IF;
+END $$;
+
+ALTER TABLE public.vehicles
+    ADD COLUMN IF NOT EXISTS location character varying(100),
+    ADD COLUMN IF NOT EXISTS wishlist integer[],
+    ADD COLUMN IF NOT EXISTS status integer NOT NULL DEFAULT 0;
+
+ALTER TABLE public.equipments
+    ADD COLUMN IF NOT EXISTS location character varying(100),
+    ADD COLUMN IF NOT EXISTS quantity integer,
+    ADD COLUMN IF NOT EXISTS wishlist integer[],
+    ADD COLUMN IF NOT EXISTS availability boolean,
+    ADD COLUMN IF NOT EXISTS status integer NOT NULL DEFAULT 0;
+
+ALTER TABLE public.guides
+    ADD COLUMN IF NOT EXISTS about text,
+    ADD COLUMN IF NOT EXISTS price double precision NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS wishlist integer[],
+    ADD COLUMN IF NOT EXISTS availability boolean,
+    ADD COLUMN IF NOT EXISTS status integer NOT NULL DEFAULT 0;
+
+-- status is checked by booking_no_overlap (008_booking_availability.sql)
+ALTER TABLE public.booking
+    ADD COLUMN IF NOT EXISTS book_date date,
+    ADD COLUMN IF NOT EXISTS book_time time with time zone,
+    ADD COLUMN IF NOT EXISTS quantity integer NOT NULL DEFAULT 1,
+    ADD COLUMN IF NOT EXISTS status character varying(20) NOT NULL DEFAULT 'pending';
+
+CREATE TABLE IF NOT EXISTS public.authority (
+    id serial PRIMARY KEY,
+    user_id integer REFERENCES public.users(id) ON DELETE CASCADE,
+    name character varying(100),
+    location character varying(100),
+    description text,
+    document_path character varying(255),
+    photo_path text,
+    created_at timestamp without time zone DEFAULT CURRENT_TIMESTAMP
+);
@@ -0,0 +1,10 @@
+-- Who liked which post. The primary key makes liking idempotent;
+-- posts.likes stays the denormalized counter read by the feed.
+CREATE TABLE IF NOT EXISTS public.post_likes (
+    post_id integer NOT NULL REFERENCES public.posts(id) ON DELETE CASCADE,
+    user_id integer NOT NULL REFERENCES public.users(id) ON DELETE CASCADE,
+    created_at timestamp with time zone NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (post_id, user_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_post_likes_user_id ON public.post_likes USING btree (user_id);
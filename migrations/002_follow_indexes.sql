@@ -0,0 +1,4 @@
+-- "Who does X follow" and "who follows X" lookups, and the existence
+-- check in /follow, all filter on one side of the edge.
+CREATE INDEX IF NOT EXISTS idx_follow_user_id_follower_id ON public.follow USING btree (user_id, follower_id);
+CREATE INDEX IF NOT EXISTS idx_follow_follower_id_user_id ON public.follow USING btree (follower_id, user_id);
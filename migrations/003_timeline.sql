@@ -0,0 +1,13 @@
+-- Precomputed following-feed: one row per (reader, post), filled when a
+-- post is created. Feed pages are backward range scans of the primary key.
+CREATE TABLE IF NOT EXISTS public.timeline (
+    user_id integer NOT NULL,
+    post_id integer NOT NULL REFERENCES public.posts(id) ON DELETE CASCADE,
+    PRIMARY KEY (user_id, post_id)
+);
+
+-- Cascading deletes from posts
+CREATE INDEX IF NOT EXISTS idx_timeline_post_id ON public.timeline USING btree (post_id);
+
+-- Fan-out-on-read of high-follower accounts and follow backfill
+CREATE INDEX IF NOT EXISTS idx_posts_poster_id_id ON public.posts USING btree (poster_id, id);
@@ -0,0 +1,11 @@
+-- Pending OTPs shared by all API workers; see app/utils/otp_store.py.
+CREATE TABLE IF NOT EXISTS public.otp_codes (
+    email character varying(255) PRIMARY KEY,
+    otp_hash character(64) NOT NULL,
+    payload jsonb,
+    attempts integer NOT NULL DEFAULT 0,
+    sent_at timestamp with time zone NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    expires_at timestamp with time zone NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_otp_codes_expires_at ON public.otp_codes USING btree (expires_at);
@@ -0,0 +1,20 @@
+-- Metadata of uploaded PDFs, one row per media key; see app/utils/pdf_processing.py.
+-- Documents are parsed once in the background and the results kept here.
+CREATE TABLE IF NOT EXISTS public.pdf_documents (
+    media_key character varying(80) PRIMARY KEY,
+    size bigint NOT NULL,
+    status character varying(16) NOT NULL DEFAULT 'pending',
+    page_count integer,
+    text text,
+    error text,
+    created_at timestamp with time zone NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    claimed_at timestamp with time zone,
+    parsed_at timestamp with time zone
+);
+
+-- Sweeps for unparsed documents only look at the few rows still in progress.
+CREATE INDEX IF NOT EXISTS idx_pdf_documents_unparsed ON public.pdf_documents USING btree (created_at)
+    WHERE status IN ('pending', 'parsing');
+
+CREATE INDEX IF NOT EXISTS idx_pdf_documents_text ON public.pdf_documents
+    USING gin (to_tsvector('simple', coalesce(text, '')));
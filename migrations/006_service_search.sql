@@ -0,0 +1,16 @@
+-- Keyset search over services (/vehicles/search, /equipment/search,
+-- /guides/search). Equality filters lead, then the sort column and id, so a
+-- filtered, price-sorted page is one range scan. Sorting by newest walks the
+-- primary key.
+CREATE INDEX IF NOT EXISTS idx_vehicles_location_price_id ON public.vehicles USING btree (location, price, id);
+CREATE INDEX IF NOT EXISTS idx_vehicles_type_price_id ON public.vehicles USING btree (type, price, id);
+CREATE INDEX IF NOT EXISTS idx_vehicles_price_id ON public.vehicles USING btree (price, id);
+CREATE INDEX IF NOT EXISTS idx_vehicles_capacity_id ON public.vehicles USING btree (capacity, id);
+
+CREATE INDEX IF NOT EXISTS idx_equipments_location_price_id ON public.equipments USING btree (location, price_per_day, id);
+CREATE INDEX IF NOT EXISTS idx_equipments_type_price_id ON public.equipments USING btree (type, price_per_day, id);
+CREATE INDEX IF NOT EXISTS idx_equipments_price_id ON public.equipments USING btree (price_per_day, id);
+
+CREATE INDEX IF NOT EXISTS idx_guides_location_price_id ON public.guides USING btree (location, price, id);
+CREATE INDEX IF NOT EXISTS idx_guides_language_price_id ON public.guides USING btree (language, price, id);
+CREATE INDEX IF NOT EXISTS idx_guides_price_id ON public.guides USING btree (price, id);
@@ -0,0 +1,34 @@
+-- Coordinates for "near me" lookups (/nearby); see app/utils/geo.py.
+-- earthdistance maps latitude/longitude onto a 3-D point (ll_to_earth), and
+-- the GiST index on that point serves both the radius box and the
+-- nearest-first (<->) ordering.
+CREATE EXTENSION IF NOT EXISTS cube;
+CREATE EXTENSION IF NOT EXISTS earthdistance;
+
+ALTER TABLE public.vehicles ADD COLUMN IF NOT EXISTS latitude double precision, ADD COLUMN IF NOT EXISTS longitude double precision;
+ALTER TABLE public.equipments ADD COLUMN IF NOT EXISTS latitude double precision, ADD COLUMN IF NOT EXISTS longitude double precision;
+ALTER TABLE public.guides ADD COLUMN IF NOT EXISTS latitude double precision, ADD COLUMN IF NOT EXISTS longitude double precision;
+ALTER TABLE public.posts ADD COLUMN IF NOT EXISTS latitude double precision, ADD COLUMN IF NOT EXISTS longitude double precision;
+
+CREATE INDEX IF NOT EXISTS idx_vehicles_earth ON public.vehicles USING gist (ll_to_earth(latitude, longitude));
+CREATE INDEX IF NOT EXISTS idx_equipments_earth ON public.equipments USING gist (ll_to_earth(latitude, longitude));
+CREATE INDEX IF NOT EXISTS idx_guides_earth ON public.guides USING gist (ll_to_earth(latitude, longitude));
+CREATE INDEX IF NOT EXISTS idx_posts_earth ON public.posts USING gist (ll_to_earth(latitude, longitude));
+
+-- authority is not part of every dump
+DO $$
+BEGIN
+    IF to_regclass('public.authority') IS NOT NULL THEN
+        ALTER TABLE public.authority ADD COLUMN IF NOT EXISTS latitude double precision, ADD COLUMN IF NOT EXISTS longitude double precision;
+        CREATE INDEX IF NOT EXISTS idx_authority_earth ON public.authority USING gist (ll_to_earth(latitude, longitude));
+    END IF;
+END $$;
+
+-- Geocoder results by normalized location text; NULL coordinates record a
+-- failed lookup so it isn't repeated.
+CREATE TABLE IF NOT EXISTS public.geocode_cache (
+    query text PRIMARY KEY,
+    latitude double precision,
+    longitude double precision,
+    created_at timestamp with time zone NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
@@ -0,0 +1,19 @@
+-- No two live bookings of the same item may overlap; see
+-- app/utils/availability.py. A booking holds its item for every day from
+-- service_date through deliver_date (or just service_date). The exclusion
+-- constraint checks this atomically, including between concurrent inserts,
+-- and its GiST index serves the /availability range lookups.
+-- Adding it fails if the table already holds overlapping bookings: resolve
+-- those first.
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'booking_no_overlap') THEN
+        ALTER TABLE public.booking ADD CONSTRAINT booking_no_overlap EXCLUDE USING gist (
+            type WITH =,
+            item_id WITH =,
+            daterange(service_date, COALESCE(deliver_date, service_date), '[]') WITH &&
+        ) WHERE (service_date IS NOT NULL AND COALESCE(status, '') NOT IN ('cancelled', 'rejected'));
+    END IF;
+END $$;